@@ -0,0 +1,91 @@
+"""
+Runs one sfyaml command against the fake connector and writes its measurements.
+
+Started by run_bench.py in a fresh process per command, from the generated tree,
+so every measurement includes imports and YAML loading like a real invocation.
+The fake account's catalog is read from and written back to `--account-file`
+so consecutive commands (apply, then rollback) see each other's objects.
+"""
+import os
+import sys
+import json
+import time
+import resource
+from contextlib import redirect_stdout, redirect_stderr
+import click
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+@click.command(context_settings={"ignore_unknown_options": True})
+@click.option("--account-file", required=True, type=click.Path(dir_okay=False))
+@click.option("--result-file", required=True, type=click.Path(dir_okay=False))
+@click.option("--latency", default=0.0, type=float)
+@click.option("--query-time", default=0.0, type=float)
+@click.option("--login-latency", default=0.0, type=float)
+@click.option("--fail-pattern", default=None)
+@click.option("--fail-rate", default=0.0, type=float)
+@click.option("--transient-rate", default=0.0, type=float)
+@click.option("--warehouse-resume", default=0.0, type=float)
+@click.option("--show-output", is_flag=True)
+@click.argument("command", nargs=-1, type=click.UNPROCESSED)
+def main(account_file, result_file, latency, query_time, login_latency, fail_pattern, fail_rate, transient_rate,
+         warehouse_resume, show_output, command):
+    sys.path.insert(0, BENCH_DIR)
+    sys.path.insert(0, REPO_DIR)
+    import fake_connector
+    account = fake_connector.install(fake_connector.FakeAccount(
+        latency=latency,
+        query_time=query_time,
+        login_latency=login_latency,
+        fail_pattern=fail_pattern,
+        fail_rate=fail_rate,
+        transient_rate=transient_rate,
+        warehouse_resume=warehouse_resume
+    ))
+    if os.path.exists(account_file):
+        account.load(account_file)
+
+    started = time.perf_counter()
+    import cli
+    import config_loader
+    imported = time.perf_counter()
+    error = None
+    output = sys.stdout if show_output else open(os.devnull, "w")
+    with redirect_stdout(output), redirect_stderr(output):
+        try:
+            # Without standalone mode, ctx.exit() codes are returned rather than raised.
+            code = cli.cli(["--no-daemon"] + list(command), standalone_mode=False)
+            if code:
+                error = f"exit code {code}"
+        except SystemExit as e:
+            if e.code:
+                error = f"exit code {e.code}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        # Flush what atexit would write so its cost is part of the command.
+        config_loader.save_cache()
+    finished = time.perf_counter()
+
+    account.save(account_file)
+    result = {
+        "command": " ".join(command),
+        "import_seconds": imported - started,
+        "command_seconds": finished - imported,
+        # How long the command took to send its first CREATE or DROP.
+        "first_ddl_seconds": account.first_ddl_at - imported if account.first_ddl_at else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "yaml": config_loader.get_load_timings(),
+        "error": error
+    }
+    result.update(account.counters())
+    with open(result_file, "w") as f:
+        json.dump(result, f)
+
+if __name__ == "__main__":
+    main()
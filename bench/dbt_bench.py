@@ -0,0 +1,131 @@
+"""
+Times `dbt-run` repository handling against local git repositories and a stand-in
+dbt executable, and checks the worktree cache behaves:
+
+- cold: every repository is cloned and every worktree created;
+- warm: the same connections again, only fetching and checking out;
+- switched: a connection's git_url changes, so dbt must run in the new repository;
+- shared: connections with the same name, branch and repository run under -j without
+  ever using their worktree at the same time.
+
+    python bench/dbt_bench.py
+    python bench/dbt_bench.py --connections 16 --jobs 4
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+import click
+import yaml
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stands in for dbt: records which repository it ran in, and fails if another run
+# holds the same worktree.
+FAKE_DBT = """import os, sys, time
+marker = os.path.join(os.getcwd(), ".running")
+try:
+    fd = os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+except FileExistsError:
+    print("worktree in use by another run")
+    sys.exit(3)
+try:
+    with open("repo.txt") as f:
+        repo = f.read().strip()
+    with open(os.environ["FAKE_DBT_LOG"], "a") as log:
+        log.write(f"{repo} {os.getcwd()}\\n")
+    time.sleep(float(os.environ.get("FAKE_DBT_SECONDS", "0.1")))
+finally:
+    os.close(fd)
+    os.remove(marker)
+"""
+
+def make_repo(path, label):
+    os.makedirs(path)
+    for args in (["init", "--quiet", "--initial-branch", "main"], ["config", "user.email", "bench@example.com"],
+                 ["config", "user.name", "bench"]):
+        subprocess.run(["git"] + args, cwd=path, check=True)
+    with open(os.path.join(path, "repo.txt"), "w") as f:
+        f.write(label)
+    subprocess.run(["git", "add", "repo.txt"], cwd=path, check=True)
+    subprocess.run(["git", "commit", "--quiet", "-m", label], cwd=path, check=True)
+    return "file://" + path
+
+def write_master(workdir, connections):
+    os.makedirs(os.path.join(workdir, "config"), exist_ok=True)
+    with open(os.path.join(workdir, "config", "master_sf_objects.yaml"), "w") as f:
+        yaml.safe_dump({"airbyte_connections": connections}, f)
+
+def run(workdir, dbt, jobs, env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(REPO_DIR, "cli.py"), "--no-daemon", "dbt-run", "-j", str(jobs),
+                             "--dbt-executable", dbt], cwd=workdir, env=env, capture_output=True, text=True)
+    return time.perf_counter() - started, result
+
+def logged(log_path):
+    with open(log_path) as f:
+        lines = [line.split() for line in f if line.strip()]
+    os.remove(log_path)
+    return lines
+
+@click.command()
+@click.option("--connections", default=8, show_default=True, type=click.IntRange(min=2), help="dbt connections.")
+@click.option("--jobs", "-j", default=4, show_default=True, type=click.IntRange(min=1), help="dbt-run --jobs.")
+@click.option("--keep", is_flag=True, help="Keep the generated directory and print where it is.")
+def main(connections, jobs, keep):
+    """Time and check dbt-run's repository and worktree cache."""
+    workdir = tempfile.mkdtemp(prefix="sfyaml-dbt-")
+    repo_a = make_repo(os.path.join(workdir, "origin", "a"), "A")
+    repo_b = make_repo(os.path.join(workdir, "origin", "b"), "B")
+    dbt = os.path.join(workdir, "fake_dbt")
+    with open(dbt, "w") as f:
+        f.write(f"#!{sys.executable}\n{FAKE_DBT}")
+    os.chmod(dbt, 0o755)
+    log_path = os.path.join(workdir, "dbt.log")
+    env = dict(os.environ, FAKE_DBT_LOG=log_path, SFYAML_NO_DAEMON="1")
+    project = os.path.join(workdir, "project")
+    entries = [{"name": f"conn_{i}", "dbt": {"git_url": repo_a, "branch": "main"}} for i in range(connections)]
+
+    failures = []
+
+    def check(label, ok, detail=""):
+        click.secho(f"  {'PASS' if ok else 'FAIL'}  {label}{f' ({detail})' if detail and not ok else ''}",
+                    fg="green" if ok else "red")
+        if not ok:
+            failures.append(label)
+
+    click.secho(f"{'scenario':<10}  {'wall s':>7}", bold=True)
+    try:
+        write_master(project, entries)
+        for scenario in ("cold", "warm"):
+            seconds, result = run(project, dbt, jobs, env)
+            click.echo(f"{scenario:<10}  {seconds:>7.2f}")
+            ran = logged(log_path)
+            check(f"{scenario}: every connection ran in repository A",
+                  result.returncode == 0 and len(ran) == connections and all(repo == "A" for repo, _ in ran),
+                  result.stdout[-500:])
+
+        entries[0]["dbt"]["git_url"] = repo_b
+        write_master(project, entries)
+        seconds, result = run(project, dbt, jobs, env)
+        click.echo(f"{'switched':<10}  {seconds:>7.2f}")
+        repos = sorted(repo for repo, _ in logged(log_path))
+        check("switched: the connection moved to repository B runs there", repos.count("B") == 1, str(repos))
+
+        write_master(project, [{"dbt": {"git_url": repo_a}} for _ in range(max(2, jobs))])
+        seconds, result = run(project, dbt, jobs, env)
+        click.echo(f"{'shared':<10}  {seconds:>7.2f}")
+        ran = logged(log_path)
+        check("shared: unnamed connections never used their worktree at once",
+              result.returncode == 0 and len(ran) == max(2, jobs), result.stdout[-500:])
+    finally:
+        if keep:
+            click.echo(f"  kept {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
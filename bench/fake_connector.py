@@ -0,0 +1,560 @@
+"""
+In-process stand-in for `snowflake.connector`, used by the benchmarks.
+
+It keeps a catalog of the objects created through it and answers the statements
+sfyaml sends: CREATE/DROP, SHOW <TYPE> [LIKE '...'] [IN SCHEMA ...] [LIMIT n [FROM '...']]
+(sorted by name and capped at 10,000 rows like Snowflake's), SELECT 1,
+SELECT CURRENT_DATABASE(), CURRENT_SCHEMA(), INFORMATION_SCHEMA.TABLES listings,
+GET_DDL, SHOW WAREHOUSES, ALTER WAREHOUSE ... SUSPEND, schema CLONE, SWAP WITH and
+SHOW SCHEMAS IN DATABASE, multi-statement requests and async queries. Every round trip can be slowed down and statements matching a pattern can
+be made to fail, so the tool's behaviour can be measured without a live account.
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import types
+import random
+import threading
+
+SHOW_KINDS = {
+    "TABLES": "TABLE",
+    "VIEWS": "VIEW",
+    "TASKS": "TASK",
+    "PIPES": "PIPE",
+    "STAGES": "STAGE",
+    "SCHEMAS": "SCHEMA"
+}
+
+CREATE_PATTERN = re.compile(
+    r"CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:SECURE|MATERIALIZED|TRANSIENT|TEMPORARY|TEMP)\s+)*"
+    r"(TABLE|VIEW|TASK|PIPE|STAGE|SCHEMA)\s+(IF\s+NOT\s+EXISTS\s+)?([\w\"$.]+)",
+    re.IGNORECASE
+)
+DROP_PATTERN = re.compile(r"DROP\s+(TABLE|VIEW|TASK|PIPE|STAGE|SCHEMA)\s+(IF\s+EXISTS\s+)?([\w\"$.]+)", re.IGNORECASE)
+SHOW_PATTERN = re.compile(
+    r"SHOW\s+(\w+)(?:\s+LIKE\s+'([^']*)')?(?:\s+IN\s+(?:SCHEMA\s+)?([\w\"$.]+))?"
+    r"(?:\s+LIMIT\s+(\d+)(?:\s+FROM\s+'((?:[^']|'')*)')?)?\s*$",
+    re.IGNORECASE
+)
+# Rows a SHOW returns at most, as in Snowflake; LIMIT ... FROM pages past it.
+SHOW_ROW_CAP = 10000
+TABLES_PATTERN = re.compile(
+    r"SELECT\s+TABLE_NAME,\s*TABLE_TYPE,\s*LAST_ALTERED\s+FROM\s+([\w\"$]+)\.INFORMATION_SCHEMA\.TABLES\s+"
+    r"WHERE\s+TABLE_SCHEMA\s*=\s*'([^']*)'",
+    re.IGNORECASE
+)
+GET_DDL_PATTERN = re.compile(r"SELECT\s+GET_DDL\('(\w+)',\s*'([^']*)'\)", re.IGNORECASE)
+CLONE_PATTERN = re.compile(r"CREATE\s+SCHEMA\s+([\w\"$]+)\.([\w\"$]+)\s+CLONE\s+([\w\"$]+)\.([\w\"$]+)\s*$",
+                           re.IGNORECASE)
+SWAP_PATTERN = re.compile(r"ALTER\s+SCHEMA\s+([\w\"$]+)\.([\w\"$]+)\s+SWAP\s+WITH\s+([\w\"$]+)\.([\w\"$]+)\s*$",
+                          re.IGNORECASE)
+SCHEMAS_PATTERN = re.compile(r"SHOW\s+SCHEMAS(?:\s+LIKE\s+'([^']*)')?\s+IN\s+DATABASE\s+([\w\"$]+)\s*$", re.IGNORECASE)
+DROP_SCHEMA_PATTERN = re.compile(r"DROP\s+SCHEMA\s+(IF\s+EXISTS\s+)?([\w\"$]+)\.([\w\"$]+)\s*$", re.IGNORECASE)
+WAREHOUSES_PATTERN = re.compile(r"SHOW\s+WAREHOUSES(?:\s+LIKE\s+'([^']*)')?\s*$", re.IGNORECASE)
+SUSPEND_PATTERN = re.compile(r"ALTER\s+WAREHOUSE\s+([\w\"$]+)\s+SUSPEND\s*$", re.IGNORECASE)
+# Statements that need the warehouse running; the rest are served without it.
+HISTORY_PATTERN = re.compile(r"SELECT\s+QUERY_ID\s*,\s*EXECUTION_STATUS\s+FROM\s+TABLE\(\s*INFORMATION_SCHEMA\."
+                             r"QUERY_HISTORY_BY_SESSION\(.*\)\s*\)\s+WHERE\s+QUERY_ID\s+IN\s*\((.*)\)\s*$",
+                             re.IGNORECASE | re.DOTALL)
+COMPUTE_PATTERN = re.compile(r"\bSELECT\b.*\bFROM\b", re.IGNORECASE | re.DOTALL)
+# How long a session's master token is valid (the connector's default).
+MASTER_VALIDITY = 4 * 3600
+
+DDL_KINDS = {"PIPE": "PIPE", "TABLE": "TABLE", "VIEW": "VIEW", "TASK": "TASK", "STAGE": "STAGE"}
+
+class Error(Exception):
+    def __init__(self, msg=None, errno=None, sqlstate=None, sfqid=None):
+        super().__init__(msg)
+        self.msg = msg
+        self.errno = errno
+        self.sqlstate = sqlstate
+        self.sfqid = sfqid
+
+class DatabaseError(Error):
+    pass
+
+class ProgrammingError(DatabaseError):
+    pass
+
+class OperationalError(DatabaseError):
+    pass
+
+class QueryStatus:
+    RUNNING = "RUNNING"
+    SUCCESS = "SUCCESS"
+    FAILED_WITH_ERROR = "FAILED_WITH_ERROR"
+
+def normalize_identifier(identifier):
+    identifier = identifier.strip()
+    if len(identifier) >= 2 and identifier.startswith('"') and identifier.endswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier.upper()
+
+def like_to_regex(pattern):
+    regex = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern)
+    return re.compile(f"^{regex}$", re.IGNORECASE | re.DOTALL)
+
+def render_ddl(kind, name, sql):
+    """Formats stored DDL roughly the way GET_DDL does: unqualified name, explicit type sizes."""
+    body = CREATE_PATTERN.sub("", sql.strip().rstrip(";").strip(), count=1)
+    if kind == "TABLE":
+        body = re.sub(r"\bVARCHAR\b(?!\s*\()", "VARCHAR(16777216)", body, flags=re.IGNORECASE)
+        body = re.sub(r"\bNUMBER\b(?!\s*\()", "NUMBER(38,0)", body, flags=re.IGNORECASE)
+    return f"create or replace {kind.lower() if kind != 'TABLE' else kind} {name}{body};"
+
+def split_statements(text):
+    # Good enough for generated DDL: statements end with ';' at the end of a line.
+    return [s for s in re.split(r";\s*(?:\n|$)", text) if s.strip()]
+
+class FakeAccount:
+    """
+    The server side: the catalog and the knobs and counters of a benchmark run.
+
+    `latency` is paid by every round trip (each execute, async submit, status poll
+    and multi-statement request) and `query_time` by every statement executed.
+    Statements matching `fail_pattern`, or a random `fail_rate` share of them,
+    raise ProgrammingError. A random `transient_rate` share raise OperationalError
+    as a dropped connection would: half of them before running, half after.
+    With `warehouse_resume`, the warehouse starts suspended and the first statement
+    that needs it waits that long for it to resume.
+
+    Every login opens a session with a session and a master token; a connection made
+    with both tokens of a live session resumes it without logging in, as the real
+    connector does. Sessions end on close() unless server_session_keep_alive is set.
+    """
+
+    def __init__(self, latency=0.0, query_time=0.0, login_latency=0.0, fail_pattern=None, fail_rate=0.0, seed=0,
+                 transient_rate=0.0, warehouse_resume=0.0):
+        self.latency = latency
+        self.query_time = query_time
+        self.login_latency = login_latency
+        self.fail_pattern = re.compile(fail_pattern, re.IGNORECASE) if fail_pattern else None
+        self.fail_rate = fail_rate
+        self.transient_rate = transient_rate
+        self.warehouse_resume = warehouse_resume
+        self.warehouse_state = "SUSPENDED" if warehouse_resume else "STARTED"
+        self.master_validity = MASTER_VALIDITY
+        self.sessions = {}
+        self.random = random.Random(seed)
+        self.objects = {}
+        self.altered = {}
+        self.lock = threading.Lock()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.round_trips = 0
+        self.statements = 0
+        self.logins = 0
+        self.resumed_sessions = 0
+        self.failures = 0
+        self.transient_failures = 0
+        self.statement_counts = {}
+        self.first_ddl_at = None
+
+    def counters(self):
+        return {
+            "round_trips": self.round_trips,
+            "statements": self.statements,
+            "logins": self.logins,
+            "resumed_sessions": self.resumed_sessions,
+            "failures": self.failures,
+            "transient_failures": self.transient_failures,
+            "statement_counts": dict(self.statement_counts)
+        }
+
+    def round_trip(self):
+        with self.lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def schemas(self, database):
+        """Schemas of a database: those holding objects and those created empty by CLONE or SWAP."""
+        return {key[3] if key[0] == "SCHEMA" and key[2] == "" else key[2] for key in self.objects if key[1] == database}
+
+    def add(self, kind, database, schema, name, ddl=""):
+        key = (kind.upper(), database, schema, name)
+        self.objects[key] = ddl
+        self.altered[key] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "objects": [list(key) + [ddl, self.altered.get(key, "")] for key, ddl in self.objects.items()],
+                "sessions": self.sessions
+            }, f)
+
+    def load(self, path):
+        with open(path) as f:
+            saved = json.load(f)
+        # A plain list is the catalog alone, as run_bench.py seeds it.
+        if isinstance(saved, list):
+            saved = {"objects": saved}
+        for kind, database, schema, name, ddl, *altered in saved["objects"]:
+            self.objects[(kind, database, schema, name)] = ddl
+            self.altered[(kind, database, schema, name)] = altered[0] if altered else "2024-01-01 00:00:00"
+        self.sessions.update(saved.get("sessions") or {})
+
+    def login(self):
+        """Opens a session; returns its (session token, master token)."""
+        session_token, master_token = str(uuid.uuid4()), str(uuid.uuid4())
+        with self.lock:
+            self.logins += 1
+            self.sessions[session_token] = {"master_token": master_token, "expires_at": time.time() + self.master_validity}
+        if self.login_latency:
+            time.sleep(self.login_latency)
+        return session_token, master_token
+
+    def resume_session(self, session_token, master_token):
+        """Checks the tokens with one heartbeat, like the connector does before reusing a session."""
+        self.round_trip()
+        with self.lock:
+            session = self.sessions.get(session_token)
+            if not session or session["master_token"] != master_token or session["expires_at"] < time.time():
+                raise ProgrammingError("Session and master tokens invalid", errno=251005)
+            self.resumed_sessions += 1
+
+    def end_session(self, session_token):
+        with self.lock:
+            self.sessions.pop(session_token, None)
+
+    def qualify(self, name, database, schema):
+        parts = [normalize_identifier(part) for part in name.split(".")]
+        if len(parts) == 1:
+            return database, schema, parts[0]
+        if len(parts) == 2:
+            return database, parts[0], parts[1]
+        return tuple(parts[-3:])
+
+    def run(self, sql, database, schema, session=None):
+        """
+        Executes one statement against the catalog and returns (description, rows).
+        `session` is the connection running it, for its query history.
+        """
+        statement = sql.strip().rstrip(";").strip()
+        verb = statement.split(None, 1)[0].upper() if statement else ""
+        with self.lock:
+            self.statements += 1
+            self.statement_counts[verb] = self.statement_counts.get(verb, 0) + 1
+            if verb in ("CREATE", "DROP") and self.first_ddl_at is None:
+                self.first_ddl_at = time.perf_counter()
+            failing = bool(self.fail_pattern and self.fail_pattern.search(statement)) or (
+                self.fail_rate and self.random.random() < self.fail_rate
+            )
+            if failing:
+                self.failures += 1
+            transient = bool(self.transient_rate) and self.random.random() < self.transient_rate
+            lost = transient and self.random.random() < 0.5
+            if transient:
+                self.transient_failures += 1
+        if self.warehouse_resume and COMPUTE_PATTERN.match(statement):
+            with self.lock:
+                resuming = self.warehouse_state != "STARTED"
+                self.warehouse_state = "STARTED"
+            if resuming:
+                time.sleep(self.warehouse_resume)
+        if self.query_time:
+            time.sleep(self.query_time)
+        if failing:
+            raise ProgrammingError(f"Injected failure for: {statement[:80]}", errno=2003, sqlstate="42S02")
+        if transient and not lost:
+            raise OperationalError("Injected transient failure: connection reset by peer", errno=250003)
+        result = self._execute(sql, statement, verb, database, schema, session)
+        if lost:
+            raise OperationalError("Injected transient failure: response lost after the statement ran", errno=250003)
+        return result
+
+    def _execute(self, sql, statement, verb, database, schema, session=None):
+        match = HISTORY_PATTERN.match(statement)
+        if match and session is not None:
+            ids = re.findall(r"'([^']*)'", match.group(1))
+            return [("QUERY_ID",), ("EXECUTION_STATUS",)], [
+                (query_id, session.query_status(query_id)) for query_id in ids if query_id in session._queries
+            ]
+        if re.match(r"SELECT\s+CURRENT_DATABASE\(\)\s*,\s*CURRENT_SCHEMA\(\)", statement, re.IGNORECASE):
+            return [("CURRENT_DATABASE()",), ("CURRENT_SCHEMA()",)], [(database, schema)]
+        match = CLONE_PATTERN.match(statement) or SWAP_PATTERN.match(statement)
+        if match:
+            target_db, target, source_db, source = (normalize_identifier(part) for part in match.groups())
+            with self.lock:
+                schemas = self.schemas(target_db)
+                if match.re is CLONE_PATTERN and target in schemas:
+                    raise ProgrammingError(f"Schema '{target}' already exists.", errno=2002)
+                for name in ([target] if match.re is SWAP_PATTERN else []) + [source]:
+                    if name not in schemas:
+                        raise ProgrammingError(f"Schema '{name}' does not exist or not authorized.", errno=2003)
+                moved = {}
+                for key in list(self.objects):
+                    if match.re is SWAP_PATTERN and key[1:3] == (target_db, target):
+                        moved[key[:2] + (source,) + key[3:]] = (self.objects.pop(key), self.altered.pop(key, ""))
+                    if key[1:3] == (source_db, source):
+                        if match.re is SWAP_PATTERN:
+                            moved[key[:2] + (target,) + key[3:]] = (self.objects.pop(key), self.altered.pop(key, ""))
+                        else:
+                            moved[key[:2] + (target,) + key[3:]] = (self.objects[key], self.altered.get(key, ""))
+                for key, (ddl, altered) in moved.items():
+                    self.objects[key], self.altered[key] = ddl, altered
+                self.objects[("SCHEMA", target_db, "", target)] = ""
+                self.objects[("SCHEMA", target_db, "", source)] = ""
+            return [("status",)], [("Statement executed successfully.",)]
+        match = SCHEMAS_PATTERN.match(statement)
+        if match:
+            like = like_to_regex(match.group(1)) if match.group(1) is not None else None
+            with self.lock:
+                names = sorted(self.schemas(normalize_identifier(match.group(2))))
+            return [("name",)], [(name,) for name in names if like is None or like.match(name)]
+        match = DROP_SCHEMA_PATTERN.match(statement)
+        if match:
+            scope_database, name = normalize_identifier(match.group(2)), normalize_identifier(match.group(3))
+            with self.lock:
+                if name not in self.schemas(scope_database) and match.group(1) is None:
+                    raise ProgrammingError(f"Schema '{name}' does not exist.", errno=2003)
+                for key in [key for key in self.objects if key[1:3] == (scope_database, name)
+                            or key == ("SCHEMA", scope_database, "", name)]:
+                    self.objects.pop(key)
+                    self.altered.pop(key, None)
+            return [("status",)], [(f"{name} successfully dropped.",)]
+        match = WAREHOUSES_PATTERN.match(statement)
+        if match:
+            # One warehouse, named after whatever the session asks for.
+            name = match.group(1).upper() if match.group(1) else "BENCH_WH"
+            return [("name",), ("state",)], [(name, self.warehouse_state)]
+        match = SUSPEND_PATTERN.match(statement)
+        if match:
+            with self.lock:
+                self.warehouse_state = "SUSPENDED"
+            return [("status",)], [("Statement executed successfully.",)]
+        match = SHOW_PATTERN.match(statement)
+        if match:
+            kind = SHOW_KINDS.get(match.group(1).upper())
+            if kind is None:
+                raise ProgrammingError(f"Unsupported SHOW statement: {statement}")
+            like = like_to_regex(match.group(2)) if match.group(2) is not None else None
+            scope_database, scope_schema = database, schema
+            if match.group(3):
+                scope_database, scope_schema, _ = self.qualify(match.group(3) + ".x", database, schema)
+            limit = min(int(match.group(4)), SHOW_ROW_CAP) if match.group(4) else SHOW_ROW_CAP
+            after = match.group(5).replace("''", "'") if match.group(5) is not None else None
+            with self.lock:
+                rows = sorted(
+                    ((self.altered.get(key, ""), key[3], key[1], key[2])
+                     for key in self.objects
+                     if key[0] == kind and key[1] == scope_database and key[2] == scope_schema
+                     and (like is None or like.match(key[3])) and (after is None or key[3] > after)),
+                    key=lambda row: row[1]
+                )
+            return [("created_on",), ("name",), ("database_name",), ("schema_name",)], rows[:limit]
+        match = TABLES_PATTERN.match(statement)
+        if match:
+            scope_database, scope_schema = normalize_identifier(match.group(1)), match.group(2)
+            with self.lock:
+                rows = [
+                    (key[3], "VIEW" if key[0] == "VIEW" else "BASE TABLE", self.altered.get(key, ""))
+                    for key in self.objects
+                    if key[0] in ("TABLE", "VIEW") and key[1] == scope_database and key[2] == scope_schema
+                ]
+            return [("TABLE_NAME",), ("TABLE_TYPE",), ("LAST_ALTERED",)], rows
+        match = GET_DDL_PATTERN.match(statement)
+        if match:
+            kind = match.group(1).upper()
+            with self.lock:
+                if kind == "SCHEMA":
+                    scope_database, scope_schema, _ = self.qualify(match.group(2) + ".x", database, schema)
+                    ddl = f"create or replace schema {scope_schema};\n\n" + "\n\n".join(
+                        render_ddl(key[0], key[3], sql) for key, sql in sorted(self.objects.items())
+                        if key[1:3] == (scope_database, scope_schema) and key[0] in DDL_KINDS
+                    )
+                else:
+                    key = (kind,) + self.qualify(match.group(2), database, schema)
+                    if key not in self.objects:
+                        raise ProgrammingError(f"Object '{match.group(2)}' does not exist or not authorized.", errno=2003)
+                    ddl = render_ddl(kind, key[3], self.objects[key])
+            return [("GET_DDL",)], [(ddl,)]
+        match = CREATE_PATTERN.match(statement)
+        if match:
+            key = (match.group(1).upper(),) + self.qualify(match.group(3), database, schema)
+            with self.lock:
+                if key in self.objects and match.group(2) is None and "REPLACE" not in statement[:30].upper():
+                    raise ProgrammingError(f"Object '{key[3]}' already exists.", errno=2002, sqlstate="42710")
+                self.objects[key] = sql
+                self.altered[key] = time.strftime("%Y-%m-%d %H:%M:%S") + f".{time.time_ns() % 10**9:09d}"
+            return [("status",)], [(f"{key[0].title()} {key[3]} successfully created.",)]
+        match = DROP_PATTERN.match(statement)
+        if match:
+            key = (match.group(1).upper(),) + self.qualify(match.group(3), database, schema)
+            with self.lock:
+                if key not in self.objects and match.group(2) is None:
+                    raise ProgrammingError(f"Object '{key[3]}' does not exist.", errno=2003, sqlstate="02000")
+                self.objects.pop(key, None)
+                self.altered.pop(key, None)
+            return [("status",)], [(f"{key[3]} successfully dropped.",)]
+        if verb == "SELECT":
+            return [("1",)], [(1,)]
+        return [("status",)], [("Statement executed successfully.",)]
+
+ACCOUNT = FakeAccount()
+
+class SnowflakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.sfqid = None
+        self.rowcount = None
+        self._rows = []
+        self._results = []
+
+    def _set_result(self, result):
+        self.description, rows = result
+        self._rows = list(rows)
+        self.rowcount = len(self._rows)
+        self.sfqid = str(uuid.uuid4())
+
+    def execute(self, command, params=None, num_statements=None, **kwargs):
+        server = self.connection.server
+        server.round_trip()
+        if num_statements:
+            statements = split_statements(command)
+            if len(statements) != num_statements:
+                raise ProgrammingError(
+                    f"Actual statement count {len(statements)} did not match the desired statement count {num_statements}."
+                )
+            results = [server.run(s, self.connection.database, self.connection.schema) for s in statements]
+            self._set_result(results[0])
+            self._results = results[1:]
+            return self
+        self._set_result(server.run(command, self.connection.database, self.connection.schema, self.connection))
+        return self
+
+    def execute_async(self, command, params=None, **kwargs):
+        server = self.connection.server
+        server.round_trip()
+        query_id = str(uuid.uuid4())
+        try:
+            server.run(command, self.connection.database, self.connection.schema)
+            error = None
+        except Error as e:
+            error = e
+        # The statement "runs" for query_time on the server; status polls see it RUNNING until then.
+        self.connection._queries[query_id] = (time.monotonic() + server.query_time, error)
+        self.sfqid = query_id
+        return {"queryId": query_id}
+
+    def nextset(self):
+        if not self._results:
+            return None
+        self._set_result(self._results.pop(0))
+        return self
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        return True
+
+class FakeRest:
+    """The connection's `rest` attribute, as far as sessions go."""
+
+    def __init__(self, server, token, master_token):
+        self.server = server
+        self.token = token
+        self.master_token = master_token
+        self.master_validity_in_seconds = server.master_validity
+
+    def delete_session(self, retry=True):
+        self.server.end_session(self.token)
+
+class SnowflakeConnection:
+    def __init__(self, **kwargs):
+        self.server = ACCOUNT
+        if kwargs.get("session_token") and kwargs.get("master_token"):
+            self.server.resume_session(kwargs["session_token"], kwargs["master_token"])
+            self.rest = FakeRest(self.server, kwargs["session_token"], kwargs["master_token"])
+        else:
+            self.rest = FakeRest(self.server, *self.server.login())
+        self.kwargs = kwargs
+        self.database = normalize_identifier(kwargs.get("database") or "BENCH")
+        self.schema = normalize_identifier(kwargs.get("schema") or "PUBLIC")
+        self._closed = False
+        self._queries = {}
+
+    def cursor(self):
+        return SnowflakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        if not self._closed and not self.kwargs.get("server_session_keep_alive"):
+            self.rest.delete_session()
+        self._closed = True
+
+    def is_closed(self):
+        return self._closed
+
+    def execute_string(self, sql_text, remove_comments=False, return_cursors=True, **kwargs):
+        cursors = []
+        for statement in split_statements(sql_text):
+            cursor = self.cursor()
+            cursor.execute(statement)
+            cursors.append(cursor)
+        return cursors
+
+    def get_query_status(self, query_id):
+        self.server.round_trip()
+        return self.query_status(query_id)
+
+    def query_status(self, query_id):
+        done_at, error = self._queries[query_id]
+        if time.monotonic() < done_at:
+            return QueryStatus.RUNNING
+        return QueryStatus.FAILED_WITH_ERROR if error else QueryStatus.SUCCESS
+
+    def get_query_status_throw_if_error(self, query_id):
+        status = self.get_query_status(query_id)
+        error = self._queries[query_id][1]
+        if status == QueryStatus.FAILED_WITH_ERROR:
+            raise error
+        return status
+
+    @staticmethod
+    def is_still_running(status):
+        return status == QueryStatus.RUNNING
+
+    @staticmethod
+    def is_an_error(status):
+        return status == QueryStatus.FAILED_WITH_ERROR
+
+def connect(**kwargs):
+    return SnowflakeConnection(**kwargs)
+
+def install(account=None):
+    """
+    Registers this module as `snowflake.connector` (and its errors module) in sys.modules.
+    Must run before anything imports the real connector. Returns the account in use.
+    """
+    global ACCOUNT
+    if account is not None:
+        ACCOUNT = account
+    errors = types.ModuleType("snowflake.connector.errors")
+    for error in (Error, DatabaseError, ProgrammingError, OperationalError):
+        setattr(errors, error.__name__, error)
+    connector = sys.modules[__name__]
+    connector.errors = errors
+    package = types.ModuleType("snowflake")
+    package.connector = connector
+    package.__path__ = []
+    sys.modules.update({
+        "snowflake": package,
+        "snowflake.connector": connector,
+        "snowflake.connector.errors": errors
+    })
+    return ACCOUNT
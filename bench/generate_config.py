@@ -0,0 +1,144 @@
+"""
+Writes a synthetic sfyaml `config/` tree for benchmarks.
+
+Half of the objects are tables, 30% views reading one or two tables (or an earlier
+view), 10% tasks loading a table from a view, some chained with AFTER, and 10%
+snowpipes copying into a table from the BENCH_STAGE stage. Definitions are spread
+over files of `per_file` objects, listed in the master file by folder. `padding`
+adds that many bytes of SQL comments to every query, to test large configurations.
+
+    python bench/generate_config.py /tmp/bench --objects 5000
+"""
+import os
+import random
+import click
+
+MIN_OBJECTS = 100
+MAX_OBJECTS = 50000
+STAGE_NAME = "bench_stage"
+
+MASTER_TEMPLATE = """snowflake:
+  user: "${env:SF_USER}"
+  password: "${env:SF_PASSWORD}"
+  account: "${env:SF_ACCOUNT}"
+  warehouse: "${env:SF_WAREHOUSE}"
+  database: "${env:SF_DATABASE}"
+  schema: "${env:SF_SCHEMA}"
+"""
+
+def split_counts(objects):
+    tables = objects // 2
+    views = objects * 3 // 10
+    tasks = objects // 10
+    return {"tables": tables, "views": views, "tasks": tasks, "snowpipes": objects - tables - views - tasks}
+
+def table_definition(i):
+    return {
+        "name": f"bench_table_{i}",
+        "query": (
+            f"CREATE TABLE bench_table_{i} (\n"
+            "  id NUMBER,\n"
+            "  name VARCHAR,\n"
+            "  amount NUMBER(12, 2),\n"
+            "  loaded_at TIMESTAMP_NTZ\n"
+            ");"
+        )
+    }
+
+def view_definition(i, counts, rng):
+    source = f"bench_table_{rng.randrange(counts['tables'])}"
+    if i > 0 and rng.random() < 0.2:
+        source = f"bench_view_{rng.randrange(i)}"
+    query = f"CREATE OR REPLACE VIEW bench_view_{i} AS\nSELECT s.id, s.name, s.amount\nFROM {source} s"
+    if rng.random() < 0.3:
+        other = f"bench_table_{rng.randrange(counts['tables'])}"
+        query += f"\nJOIN {other} o ON o.id = s.id"
+    return {"name": f"bench_view_{i}", "query": query + ";"}
+
+def task_definition(i, counts, rng):
+    target = f"bench_table_{rng.randrange(counts['tables'])}"
+    source = f"bench_view_{rng.randrange(counts['views'])}"
+    schedule = "SCHEDULE = '60 MINUTE'"
+    if i > 0 and rng.random() < 0.3:
+        schedule = f"AFTER bench_task_{rng.randrange(i)}"
+    return {
+        "name": f"bench_task_{i}",
+        "query": (
+            f"CREATE TASK bench_task_{i}\n"
+            "WAREHOUSE = COMPUTE_WH\n"
+            f"{schedule}\n"
+            "AS\n"
+            f"INSERT INTO {target} SELECT id, name, amount, CURRENT_TIMESTAMP() FROM {source};"
+        )
+    }
+
+def pipe_definition(i, counts, rng):
+    target = f"bench_table_{rng.randrange(counts['tables'])}"
+    return {
+        "name": f"bench_pipe_{i}",
+        "query": (
+            f"CREATE PIPE bench_pipe_{i}\n"
+            "AUTO_INGEST = TRUE\n"
+            f"AS COPY INTO {target} FROM @{STAGE_NAME}/pipe_{i}/;"
+        )
+    }
+
+# One line of a query's padding comment.
+PADDING_LINE = "-- " + "x" * 97
+
+def write_yaml(path, obj_type, definitions, padding=0):
+    # Written by hand rather than with yaml.dump so the files look like hand-written configs.
+    with open(path, "w") as f:
+        f.write(f"{obj_type}:\n")
+        for obj in definitions:
+            f.write(f'  - name: "{obj["name"]}"\n')
+            f.write("    query: |\n")
+            for _ in range(padding // (len(PADDING_LINE) + 1)):
+                f.write(f"      {PADDING_LINE}\n")
+            for line in obj["query"].splitlines():
+                f.write(f"      {line}\n")
+
+def generate_config(root, objects, per_file=100, seed=0, padding=0):
+    """
+    Writes `root`/config with `objects` definitions and returns the counts per type.
+    The same seed always produces the same tree.
+    """
+    rng = random.Random(seed)
+    counts = split_counts(objects)
+    builders = {
+        "tables": table_definition,
+        "views": lambda i: view_definition(i, counts, rng),
+        "tasks": lambda i: task_definition(i, counts, rng),
+        "snowpipes": lambda i: pipe_definition(i, counts, rng)
+    }
+    config_dir = os.path.join(root, "config")
+    master = [MASTER_TEMPLATE]
+    for obj_type, count in counts.items():
+        folder = os.path.join(config_dir, obj_type)
+        os.makedirs(folder, exist_ok=True)
+        for start in range(0, count, per_file):
+            definitions = [builders[obj_type](i) for i in range(start, min(start + per_file, count))]
+            write_yaml(os.path.join(folder, f"{obj_type}_{start // per_file:05d}.yaml"), obj_type, definitions, padding)
+        if count:
+            master.append(f'{obj_type}:\n  - folder: "{obj_type}"\n')
+    with open(os.path.join(config_dir, "master_sf_objects.yaml"), "w") as f:
+        f.write("\n".join(master))
+    return counts
+
+@click.command()
+@click.argument("root", type=click.Path(file_okay=False))
+@click.option("--objects", default=1000, show_default=True, type=click.IntRange(MIN_OBJECTS, MAX_OBJECTS),
+              help="Total number of object definitions.")
+@click.option("--per-file", default=100, show_default=True, type=click.IntRange(min=1),
+              help="Definitions per YAML file.")
+@click.option("--seed", default=0, show_default=True, help="Random seed for dependencies.")
+@click.option("--padding", default=0, show_default=True, type=click.IntRange(min=0),
+              help="Bytes of SQL comments added to every query.")
+def main(root, objects, per_file, seed, padding):
+    """Write a synthetic config/ tree under ROOT."""
+    counts = generate_config(root, objects, per_file, seed, padding)
+    summary = ", ".join(f"{count} {obj_type}" for obj_type, count in counts.items())
+    click.secho(f"Wrote {objects} definitions ({summary}) to {os.path.join(root, 'config')}.", fg="green")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmarks sfyaml commands against the fake connector on synthetic configs.
+
+For every --objects size a config tree is generated in a temporary directory and
+the --command list is run in order, each in its own process, against one fake
+account (so `apply` creates what `rollback` later drops). Each row reports wall
+time, the time spent importing, round trips and statements sent, logins, peak
+RSS and YAML parse time.
+
+    python bench/run_bench.py --objects 100 --objects 5000 --latency 0.02
+    python bench/run_bench.py --command "apply -j 8" --command "rollback --confirm -j 8" --json out.json
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import shutil
+import tempfile
+import subprocess
+import click
+from generate_config import generate_config, MIN_OBJECTS, MAX_OBJECTS, STAGE_NAME
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE = "BENCH"
+SCHEMA = "PUBLIC"
+
+DEFAULT_COMMANDS = [
+    "validate",
+    "apply",
+    "apply --incremental",
+    "rollback --confirm"
+]
+
+COLUMNS = [
+    ("objects", "objects", "{:>8}"),
+    ("command", "command", "{:<28}"),
+    ("wall_seconds", "wall s", "{:>8.2f}"),
+    ("import_seconds", "import s", "{:>8.2f}"),
+    ("round_trips", "trips", "{:>7}"),
+    ("statements", "stmts", "{:>7}"),
+    ("logins", "logins", "{:>6}"),
+    ("first_ddl_seconds", "1st DDL s", "{:>9.2f}"),
+    ("peak_rss_mb", "peak MB", "{:>8.1f}"),
+    ("yaml_parse_seconds", "yaml s", "{:>7.2f}")
+]
+
+def seed_account(account_file):
+    """Creates the stage the generated pipes load from."""
+    with open(account_file, "w") as f:
+        json.dump([["STAGE", DATABASE, SCHEMA, STAGE_NAME.upper(), ""]], f)
+
+def run_one(workdir, account_file, command, options):
+    result_file = os.path.join(workdir, "result.json")
+    args = [
+        sys.executable, os.path.join(BENCH_DIR, "bench_command.py"),
+        "--account-file", account_file,
+        "--result-file", result_file,
+        "--latency", str(options["latency"]),
+        "--query-time", str(options["query_time"]),
+        "--login-latency", str(options["login_latency"]),
+        "--fail-rate", str(options["fail_rate"]),
+        "--transient-rate", str(options["transient_rate"]),
+        "--warehouse-resume", str(options["warehouse_resume"])
+    ]
+    if options["fail_pattern"]:
+        args += ["--fail-pattern", options["fail_pattern"]]
+    if options["show_output"]:
+        args.append("--show-output")
+    env = dict(os.environ, SF_USER="bench", SF_PASSWORD="bench", SF_ACCOUNT="bench",
+               SF_WAREHOUSE="COMPUTE_WH", SF_DATABASE=DATABASE, SF_SCHEMA=SCHEMA, SFYAML_NO_DAEMON="1")
+    started = time.perf_counter()
+    subprocess.run(args + ["--"] + shlex.split(command), cwd=workdir, env=env, check=True)
+    wall = time.perf_counter() - started
+    with open(result_file) as f:
+        result = json.load(f)
+    result["wall_seconds"] = wall
+    yaml = result.pop("yaml")
+    result["yaml_files"] = yaml["files"]
+    result["yaml_cache_hits"] = yaml["cache_hits"]
+    result["yaml_parse_seconds"] = yaml["read_seconds"] + yaml["parse_seconds"] + yaml["substitute_seconds"]
+    return result
+
+def print_row(values):
+    click.echo("  ".join(
+        fmt.format(values[key]) if values[key] is not None else fmt.replace(".2f", "").replace(".1f", "").format("-")
+        for key, _, fmt in COLUMNS
+    ))
+
+@click.command()
+@click.option("--objects", "sizes", multiple=True, type=click.IntRange(MIN_OBJECTS, MAX_OBJECTS),
+              help="Config size to benchmark (repeatable). Default: 100 and 1000.")
+@click.option("--command", "commands", multiple=True,
+              help="sfyaml command line to run, in order (repeatable). Default: validate, apply, "
+                   "apply --incremental, rollback --confirm.")
+@click.option("--per-file", default=100, show_default=True, type=click.IntRange(min=1), help="Definitions per YAML file.")
+@click.option("--padding", default=0, show_default=True, type=click.IntRange(min=0),
+              help="Bytes of SQL comments added to every query (for large configurations).")
+@click.option("--latency", default=0.0, show_default=True, type=float, help="Seconds added to every round trip.")
+@click.option("--query-time", default=0.0, show_default=True, type=float, help="Seconds every statement runs on the server.")
+@click.option("--login-latency", default=0.0, show_default=True, type=float, help="Seconds every login takes.")
+@click.option("--fail-pattern", default=None, help="Regex; matching statements fail.")
+@click.option("--fail-rate", default=0.0, show_default=True, type=click.FloatRange(0, 1), help="Share of statements that fail at random.")
+@click.option("--transient-rate", default=0.0, show_default=True, type=click.FloatRange(0, 1),
+              help="Share of statements that fail like a dropped connection (retried by sfyaml).")
+@click.option("--warehouse-resume", default=0.0, show_default=True, type=float,
+              help="Seconds the suspended warehouse takes to resume for its first query.")
+@click.option("--keep", is_flag=True, help="Keep the generated trees and print where they are.")
+@click.option("--show-output", is_flag=True, help="Show the commands' own output.")
+@click.option("--json", "json_path", default=None, type=click.Path(dir_okay=False), help="Also write all results to this JSON file.")
+def main(sizes, commands, per_file, padding, latency, query_time, login_latency, fail_pattern, fail_rate, transient_rate,
+         warehouse_resume, keep, show_output, json_path):
+    """Benchmark sfyaml commands against an in-process fake Snowflake."""
+    options = {
+        "latency": latency,
+        "query_time": query_time,
+        "login_latency": login_latency,
+        "fail_pattern": fail_pattern,
+        "fail_rate": fail_rate,
+        "transient_rate": transient_rate,
+        "warehouse_resume": warehouse_resume,
+        "show_output": show_output
+    }
+    results = []
+    click.secho("  ".join(fmt.replace(".2f", "").replace(".1f", "").format(title) for _, title, fmt in COLUMNS), bold=True)
+    for size in sizes or (100, 1000):
+        workdir = tempfile.mkdtemp(prefix=f"sfyaml-bench-{size}-")
+        generate_config(workdir, size, per_file, padding=padding)
+        account_file = os.path.join(workdir, "account.json")
+        seed_account(account_file)
+        for command in commands or DEFAULT_COMMANDS:
+            result = run_one(workdir, account_file, command, options)
+            result["objects"] = size
+            results.append(result)
+            print_row(result)
+            if result["error"]:
+                click.secho(f"  {command} failed: {result['error']}", fg="red")
+        if keep:
+            click.secho(f"  kept {workdir}", fg="blue")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Checks the session cache behind `session_cache: true` across processes, against the
+fake connector:
+
+- cold / resume: the first process logs in, the next one resumes its session;
+- exit: a process that never closes its connection gives the session back at exit;
+- sigterm / sigkill: a process stopped while it holds a session does not lose it,
+  whether it can clean up (SIGTERM) or not (SIGKILL, its claim is released later);
+- busy: a session held by a running process is never handed to another one;
+- idle / expired: sessions unused for too long or about to expire are not resumed;
+- private: the cache is created 0600 in a 0700 directory, and a readable one is ignored.
+
+    python bench/session_bench.py
+"""
+import os
+import sys
+import json
+import time
+import signal
+import shutil
+import tempfile
+import subprocess
+import click
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# One sfyaml process: opens a cached connection, then closes it, exits without closing
+# it ("exit") or holds it until it is signalled ("hold").
+CHILD = """import os, sys, json, time
+sys.path[:0] = [{bench!r}, {repo!r}]
+import fake_connector
+account = fake_connector.install(fake_connector.FakeAccount())
+if os.path.exists({account!r}):
+    account.load({account!r})
+from sessions import ConnectionFactory, SessionCache
+conn = ConnectionFactory(fake_connector.connect, SessionCache({cache!r}))(
+    user="bench", password="bench", account="bench", warehouse="BENCH", database="BENCH", schema="PUBLIC")
+# Saved before the process may be killed, so the next one sees this login's session.
+account.save({account!r})
+print(json.dumps(dict(account.counters(), master_token=conn.rest.master_token)), flush=True)
+if sys.argv[1] == "close":
+    conn.close()
+elif sys.argv[1] == "hold":
+    time.sleep(60)
+"""
+
+def start(workdir, mode):
+    script = CHILD.format(bench=BENCH_DIR, repo=REPO_DIR, account=os.path.join(workdir, "account.json"),
+                          cache=os.path.join(workdir, "cache", "sessions.json"))
+    return subprocess.Popen([sys.executable, "-c", script, mode], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True)
+
+def counters(process):
+    line = process.stdout.readline()
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise click.ClickException(f"Child failed: {line}{process.stdout.read()}")
+
+def run(workdir, mode="close"):
+    process = start(workdir, mode)
+    counted = counters(process)
+    process.wait()
+    return counted
+
+def edit_cache(workdir, change):
+    """Replaces every login's cached entries with change(entries)."""
+    path = os.path.join(workdir, "cache", "sessions.json")
+    with open(path) as f:
+        sessions = json.load(f)
+    with open(path, "w") as f:
+        json.dump({login: change(entries) for login, entries in sessions.items()}, f)
+
+def updated(**fields):
+    return lambda entries: [dict(entry, **fields) for entry in entries]
+
+@click.command()
+@click.option("--keep", is_flag=True, help="Keep the generated directory and print where it is.")
+def main(keep):
+    """Check the session cache across processes."""
+    sys.path.insert(0, REPO_DIR)
+    from sessions import MAX_IDLE_SECONDS
+    workdir = tempfile.mkdtemp(prefix="sfyaml-sessions-")
+    cache_path = os.path.join(workdir, "cache", "sessions.json")
+    failures = []
+
+    def check(label, ok, detail=""):
+        click.secho(f"  {'PASS' if ok else 'FAIL'}  {label}{f' ({detail})' if detail and not ok else ''}",
+                    fg="green" if ok else "red")
+        if not ok:
+            failures.append(label)
+
+    def resumed(counted):
+        return counted["logins"] == 0 and counted["resumed_sessions"] == 1
+
+    try:
+        counted = run(workdir)
+        check("cold: the first process logs in", counted["logins"] == 1, str(counted))
+        counted = run(workdir)
+        check("resume: the next process resumes the session", resumed(counted), str(counted))
+
+        run(workdir, "exit")
+        counted = run(workdir)
+        check("exit: a connection left open is given back at exit", resumed(counted), str(counted))
+
+        for signum in (signal.SIGTERM, signal.SIGKILL):
+            holder = start(workdir, "hold")
+            held = counters(holder)["master_token"]
+            busy = run(workdir)
+            # Only the holder's session may be left to resume.
+            edit_cache(workdir, lambda entries: [entry for entry in entries if entry["master_token"] == held])
+            holder.send_signal(signum)
+            holder.wait()
+            counted = run(workdir)
+            name = signal.Signals(signum).name.lower()
+            check(f"{name}: a process holding the session does not share it", busy["master_token"] != held)
+            check(f"{name}: the session is resumed after the holder stopped",
+                  resumed(counted) and counted["master_token"] == held, str(counted))
+
+        edit_cache(workdir, updated(cached_at=time.time() - MAX_IDLE_SECONDS - 1))
+        counted = run(workdir)
+        check("idle: sessions unused for too long are not resumed", counted["logins"] == 1, str(counted))
+        edit_cache(workdir, updated(expires_at=time.time() + 60))
+        counted = run(workdir)
+        check("expired: sessions about to expire are not resumed", counted["logins"] == 1, str(counted))
+
+        mode = os.stat(cache_path).st_mode & 0o777
+        directory_mode = os.stat(os.path.dirname(cache_path)).st_mode & 0o777
+        check("private: the cache is 0600 in a 0700 directory", (mode, directory_mode) == (0o600, 0o700),
+              f"{mode:o} in {directory_mode:o}")
+        os.chmod(cache_path, 0o644)
+        counted = run(workdir)
+        check("private: a cache others can read is ignored and replaced",
+              counted["logins"] == 1 and os.stat(cache_path).st_mode & 0o777 == 0o600, str(counted))
+    finally:
+        if keep:
+            click.echo(f"  kept {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
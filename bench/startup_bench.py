@@ -0,0 +1,101 @@
+"""
+Measures how long sfyaml takes to start: `--help` and `validate` wall time over
+several runs, and whether the Snowflake connector and PyYAML get imported at all.
+
+Commands run from a generated config tree (see generate_config.py) with a fresh
+YAML cache per run, so `validate` does its usual work. Pass --against with another
+sfyaml checkout (e.g. one made with `git worktree add /tmp/sfyaml-old <ref>`) to
+compare both side by side.
+
+    python bench/startup_bench.py
+    python bench/startup_bench.py --objects 1000 --runs 20 --against /tmp/sfyaml-old
+"""
+import os
+import sys
+import shlex
+import shutil
+import tempfile
+import statistics
+import subprocess
+import time
+import click
+from generate_config import generate_config, MIN_OBJECTS, MAX_OBJECTS
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_COMMANDS = ["--help", "validate"]
+
+# Imports worth knowing about: what each command should only load when it needs it.
+WATCHED_MODULES = ["snowflake.connector", "yaml", "concurrent.futures.process", "subprocess", "socketserver"]
+
+def checked(result, repo, args):
+    """A run that failed would time its error instead of the command, so it stops the bench."""
+    if result.returncode:
+        raise click.ClickException(f"sfyaml {shlex.join(args)} exited with {result.returncode} in {repo}:\n"
+                                   f"{result.stderr.strip()[-2000:]}")
+    return result
+
+def run_once(repo, workdir, args, env):
+    shutil.rmtree(os.path.join(workdir, ".sfyaml"), ignore_errors=True)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(repo, "cli.py")] + args, cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+    took = time.perf_counter() - started
+    checked(result, repo, args)
+    return took
+
+def imported_modules(repo, workdir, args, env):
+    """Runs the command once with -X importtime and returns the names of the modules it imported."""
+    shutil.rmtree(os.path.join(workdir, ".sfyaml"), ignore_errors=True)
+    result = subprocess.run([sys.executable, "-X", "importtime", os.path.join(repo, "cli.py")] + args, cwd=workdir,
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=False)
+    checked(result, repo, args)
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return modules
+
+def measure(repo, workdir, command, runs, env):
+    # SFYAML_NO_DAEMON in env keeps the daemon out of it; older checkouts lack --no-daemon.
+    args = shlex.split(command)
+    times = sorted(run_once(repo, workdir, args, env) for _ in range(runs))
+    modules = imported_modules(repo, workdir, args, env)
+    return {
+        "median": statistics.median(times),
+        "min": times[0],
+        "modules": len(modules),
+        "loaded": [name for name in WATCHED_MODULES if name in modules]
+    }
+
+@click.command()
+@click.option("--objects", default=100, show_default=True, type=click.IntRange(MIN_OBJECTS, MAX_OBJECTS),
+              help="Size of the generated config tree.")
+@click.option("--command", "commands", multiple=True, help="sfyaml command line to time (repeatable). Default: --help and validate.")
+@click.option("--runs", default=10, show_default=True, type=click.IntRange(min=1), help="Runs per command.")
+@click.option("--against", type=click.Path(exists=True, file_okay=False),
+              help="Another sfyaml checkout to time the same commands with.")
+def main(objects, commands, runs, against):
+    """Time sfyaml startup for --help and validate."""
+    workdir = tempfile.mkdtemp(prefix="sfyaml-startup-")
+    generate_config(workdir, objects)
+    env = dict(os.environ, SF_USER="bench", SF_PASSWORD="bench", SF_ACCOUNT="bench", SF_WAREHOUSE="COMPUTE_WH",
+               SF_DATABASE="BENCH", SF_SCHEMA="PUBLIC", SFYAML_NO_DAEMON="1")
+    repos = [("this", REPO_DIR)] + ([("against", os.path.abspath(against))] if against else [])
+    click.secho(f"{'checkout':<8}  {'command':<12}  {'median s':>8}  {'min s':>6}  {'modules':>7}  loaded", bold=True)
+    try:
+        results = {}
+        for command in commands or DEFAULT_COMMANDS:
+            for label, repo in repos:
+                result = measure(repo, workdir, command, runs, env)
+                results[(label, command)] = result
+                click.echo(f"{label:<8}  {command[:12]:<12}  {result['median']:>8.3f}  {result['min']:>6.3f}  "
+                           f"{result['modules']:>7}  {', '.join(result['loaded']) or '-'}")
+            if against:
+                ratio = results[("this", command)]["median"] / results[("against", command)]["median"]
+                click.secho(f"{command}: {ratio:.0%} of the time of {against}.", fg="blue")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import threading
+import output
+import tracing
+
+# SHOW command noun for every object type the tool looks up in Snowflake.
+SHOW_NOUNS = {
+    "table": "TABLES",
+    "view": "VIEWS",
+    "task": "TASKS",
+    "snowpipe": "PIPES",
+    "stage": "STAGES"
+}
+
+# SHOW returns at most this many rows; longer listings are paged with LIMIT ... FROM.
+SHOW_PAGE_SIZE = 10000
+
+def show_all(cursor, statement):
+    """
+    Runs a SHOW statement and returns every row as a dict keyed by lower-cased column
+    name, with the number of queries it took. Rows come sorted by name, so past
+    SHOW_PAGE_SIZE rows the next page starts from the last name listed.
+    """
+    rows = []
+    queries = 0
+    after = None
+    while True:
+        page_from = ""
+        if after is not None:
+            literal = after.replace("'", "''")
+            page_from = f" FROM '{literal}'"
+        cursor.execute(f"{statement} LIMIT {SHOW_PAGE_SIZE}{page_from}")
+        queries += 1
+        columns = [col[0].lower() for col in cursor.description]
+        page = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        # The row named in FROM is not listed again, but do not count on it.
+        rows.extend(row for row in page if row["name"] != after)
+        if len(page) < SHOW_PAGE_SIZE:
+            return rows, queries
+        after = page[-1]["name"]
+
+def normalize_identifier(identifier):
+    """
+    Normalizes a single identifier the way Snowflake resolves it:
+    unquoted identifiers are upper-cased, quoted identifiers keep their case.
+    """
+    identifier = identifier.strip()
+    if len(identifier) >= 2 and identifier.startswith('"') and identifier.endswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier.upper()
+
+def quote_identifier(identifier):
+    """Quotes an already normalized identifier for use in SQL."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+def split_object_name(name):
+    """Splits a dotted object name into its parts, ignoring dots inside quotes."""
+    parts = []
+    current = ""
+    in_quotes = False
+    for char in name.strip():
+        if char == '"':
+            in_quotes = not in_quotes
+        if char == "." and not in_quotes:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return parts
+
+def qualify_name(name, database, schema):
+    """
+    Returns the normalized (database, schema, name) key for an object name.
+    Missing database/schema parts are taken from the given defaults.
+    """
+    parts = split_object_name(name)
+    if len(parts) >= 3:
+        database, schema, object_name = parts[-3], parts[-2], parts[-1]
+    elif len(parts) == 2:
+        schema, object_name = parts
+    else:
+        object_name = parts[0]
+    return (
+        normalize_identifier(database or ""),
+        normalize_identifier(schema or ""),
+        normalize_identifier(object_name)
+    )
+
+class CatalogSnapshot:
+    """
+    In-memory index of the objects that exist in Snowflake.
+
+    Each object type is loaded with a single 'SHOW <TYPE> IN SCHEMA' per schema
+    the first time it is needed, instead of one 'SHOW ... LIKE' per object.
+    Objects created during the run are added to the index so later lookups see them.
+    """
+
+    def __init__(self, cursor, database=None, schema=None):
+        self.cursor = cursor
+        if database is None or schema is None:
+            cursor.execute("SELECT CURRENT_DATABASE(), CURRENT_SCHEMA()")
+            current_database, current_schema = cursor.fetchone()
+            database = database or current_database
+            schema = schema or current_schema
+        self.database = normalize_identifier(database or "")
+        self.schema = normalize_identifier(schema or "")
+        self.queries = 0
+        self._objects = {obj_type: set() for obj_type in SHOW_NOUNS}
+        self._loaded = set()
+        # Scopes whose bulk SHOW failed; their objects are only known from lookup() and this run.
+        self._unavailable = set()
+        self._lock = threading.RLock()
+
+    def key(self, name):
+        """Returns the normalized (database, schema, name) key for an object name."""
+        return qualify_name(name, self.database, self.schema)
+
+    def load(self, obj_types, database=None, schema=None):
+        """Bulk-loads the given object types for a schema (default: the session schema)."""
+        database = database or self.database
+        schema = schema or self.schema
+        for obj_type in obj_types:
+            self._ensure_loaded(obj_type, database, schema)
+
+    def _show(self, obj_type, database, schema, like=None):
+        """Runs one SHOW for the schema and returns the (database, schema, name) keys it lists."""
+        noun = SHOW_NOUNS[obj_type]
+        pattern = f" LIKE '{like}'" if like is not None else ""
+        query = f"SHOW {noun}{pattern} IN SCHEMA {quote_identifier(database)}.{quote_identifier(schema)}"
+        with tracing.span(f"show {noun.lower()}", "catalog", schema=f"{database}.{schema}") as span:
+            rows, queries = show_all(self.cursor, query)
+            span["query_id"] = self.cursor.sfqid
+            span["pages"] = queries
+            self.queries += queries
+        return {(row.get("database_name", database), row.get("schema_name", schema), row["name"]) for row in rows}
+
+    def _ensure_loaded(self, obj_type, database, schema):
+        scope = (obj_type, database, schema)
+        with self._lock:
+            if scope in self._loaded or scope in self._unavailable:
+                return
+            if not database or not schema:
+                self._loaded.add(scope)
+                return
+            try:
+                listed = self._show(obj_type, database, schema)
+            except Exception as e:
+                # Not marked as loaded: exists() answers None for it rather than from an empty listing.
+                self._unavailable.add(scope)
+                output.error(f"[{obj_type.upper()}] ERR: Loading catalog for {database}.{schema} failed: {e}")
+                return
+            self._objects[obj_type] |= listed
+            self._loaded.add(scope)
+
+    def reload(self, obj_types=None):
+        """
+        Re-runs the bulk SHOW for every loaded or unavailable scope (optionally only for
+        some types). A scope whose SHOW fails keeps what it listed before.
+        """
+        with self._lock:
+            scopes = [scope for scope in self._loaded | self._unavailable
+                      if obj_types is None or scope[0] in obj_types]
+            for obj_type, database, schema in scopes:
+                if not database or not schema:
+                    continue
+                try:
+                    listed = self._show(obj_type, database, schema)
+                except Exception as e:
+                    output.warn(f"[{obj_type.upper()}] WARN: Reloading catalog for {database}.{schema} failed, "
+                                f"keeping the previous listing: {e}")
+                    continue
+                self._objects[obj_type] = {
+                    key for key in self._objects[obj_type] if (key[0], key[1]) != (database, schema)
+                } | listed
+                self._unavailable.discard((obj_type, database, schema))
+                self._loaded.add((obj_type, database, schema))
+
+    def exists(self, obj_type, name):
+        """
+        Checks the index for an object, loading its schema on first use. Returns None
+        when the schema's listing could not be loaded, so callers do not mistake it for absent.
+        """
+        if obj_type not in SHOW_NOUNS:
+            return False
+        key = self.key(name)
+        self._ensure_loaded(obj_type, key[0], key[1])
+        with self._lock:
+            if key in self._objects[obj_type]:
+                return True
+            return None if (obj_type, key[0], key[1]) in self._unavailable else False
+
+    def lookup(self, obj_type, name):
+        """
+        Checks one object with a SHOW ... LIKE and updates the index with the answer.
+        Raises if the SHOW fails; the index is then left as it was.
+        """
+        if obj_type not in SHOW_NOUNS:
+            return False
+        key = self.key(name)
+        if not key[0] or not key[1]:
+            return self.exists(obj_type, name)
+        # '_' and '%' are wildcards in LIKE, so the listed names are compared exactly.
+        like = key[2].replace("'", "''")
+        with self._lock:
+            found = key in self._show(obj_type, key[0], key[1], like=like)
+            if found:
+                self._objects[obj_type].add(key)
+            else:
+                self._objects[obj_type].discard(key)
+        return found
+
+    def check(self, obj_type, name):
+        """Like exists(), but asks about the object alone (lookup()) when its schema's listing is unavailable."""
+        exists = self.exists(obj_type, name)
+        return self.lookup(obj_type, name) if exists is None else exists
+
+    def add(self, obj_type, name):
+        """Records an object created during this run."""
+        key = self.key(name)
+        self._ensure_loaded(obj_type, key[0], key[1])
+        with self._lock:
+            self._objects[obj_type].add(key)
+
+    def remove(self, obj_type, name):
+        """Records an object dropped during this run."""
+        key = self.key(name)
+        self._ensure_loaded(obj_type, key[0], key[1])
+        with self._lock:
+            self._objects[obj_type].discard(key)
@@ -1,60 +1,334 @@
 import click
-from commands.create import create_snowflake_objects
-from commands.dbt import run_dbt_command
-from commands.check import check_connectivity
-from commands.validate import validate as validate_config
-from commands.rollback import rollback as rollback_config
+import output
+import tracing
+
+# Command implementations (and through them the Snowflake connector, PyYAML and the
+# process pools) are imported when a command runs, not when the CLI starts, so
+# --help and validate never pay for what they do not use.
 
 @click.group()
-def cli():
+@click.option('--no-daemon', is_flag=True, envvar='SFYAML_NO_DAEMON',
+              help='Run locally even if an `serve` daemon is running for this directory.')
+@click.option('--profile', is_flag=True, help='Trace the command and print its slowest spans.')
+@click.option('--profile-top', default=20, show_default=True, type=click.IntRange(min=1),
+              help='Number of spans in the --profile table.')
+@click.option('--trace-file', type=click.Path(dir_okay=False), help='Write every span of the command to this file.')
+@click.option('--trace-format', type=click.Choice(['chrome', 'json']), default='chrome', show_default=True,
+              help='Format of --trace-file: Chrome trace events or a plain JSON list of spans.')
+@click.option('--quiet', '-q', is_flag=True, help='Only print errors and the final summary.')
+@click.option('--verbose', '-v', is_flag=True, help='Also print every executed query and other details.')
+@click.option('--log-format', type=click.Choice(['text', 'json']), default='text', show_default=True,
+              help='Print plain text lines or one JSON event per line (one per object outcome).')
+@click.pass_context
+def cli(ctx, no_daemon, profile, profile_top, trace_file, trace_format, quiet, verbose, log_format):
     """Snowflake & DBT CLI Tool
 
     Commands:
+      plan            Work out what apply would do and save it for later.
       apply           Create Snowflake objects as per YAML configuration.
       validate        Validate your configuration files.
       rollback        Drop objects defined in the configuration (use with caution).
+      restore         Swap the schema back to a snapshot taken by apply --snapshot.
+      diff            Compare the configuration with the objects in Snowflake.
       dbt_run         Run DBT transformations.
       check           Test connectivity to Snowflake.
+      serve           Keep warm connections and run forwarded commands.
+    """
+    ctx.obj = {"no_daemon": no_daemon}
+    if profile or trace_file:
+        # Spans are collected in this process, so traced commands are never forwarded to the daemon.
+        ctx.obj["no_daemon"] = True
+        tracing.enable()
+
+        def report():
+            if profile:
+                tracing.print_profile(profile_top)
+            if trace_file:
+                tracing.write_trace(trace_file, trace_format)
+
+        ctx.call_on_close(report)
+
+    if quiet and verbose:
+        raise click.UsageError("--quiet and --verbose cannot be combined.")
+    output.configure(output.QUIET if quiet else output.VERBOSE if verbose else output.NORMAL, log_format)
+    # Registered last so it runs first: the summary comes before any profile.
+    ctx.call_on_close(output.finish)
+
+def target_options(func):
+    """--target and --target-jobs, for the commands that fan out over the master file's targets: section."""
+    func = click.option('--target-jobs', default=4, show_default=True, type=click.IntRange(min=1),
+                        help='Number of targets to run concurrently.')(func)
+    return click.option('--target', 'targets', multiple=True,
+                        help='Only run against this target of the targets: section (repeatable). Default: all.')(func)
+
+def stream_options(func):
+    """--eager and --window, for the commands that can apply definitions while files are still being read."""
+    func = click.option('--window', default=16, show_default=True, type=click.IntRange(min=1),
+                        help='Files parsed ahead of the definitions being executed.')(func)
+    return click.option('--eager', is_flag=True,
+                        help='Load every definition before executing any, instead of streaming them.')(func)
+
+def check_selectors(ctx, param, values):
+    from selection import parse_selector
+    for value in values:
+        try:
+            parse_selector(value)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+    return values
+
+def selection_options(func):
+    """--select and --exclude, for the commands that can act on only some of the objects."""
+    func = click.option('--exclude', multiple=True, callback=check_selectors, metavar='SELECTOR',
+                        help='Leave out the objects this selector matches (repeatable).')(func)
+    return click.option('--select', '-s', multiple=True, callback=check_selectors, metavar='SELECTOR',
+                        help="Only the objects this selector matches, e.g. 'tables:emp*', 'file:views/hr/*.yaml' "
+                             "or '+view:emp_v' with what it depends on (repeatable).")(func)
+
+def run_command(ctx, command, func, **params):
     """
-    pass
+    Forwards the command to a running daemon if there is one, otherwise runs it here.
+    Exits with status 1 if the command returns False, either way.
+    """
+    if not ctx.obj["no_daemon"]:
+        import daemon
+        # Anything buffered so far must come before the daemon's output.
+        output.flush()
+        exit_code = daemon.forward(command, params)
+        if exit_code is not None:
+            ctx.exit(exit_code)
+    if func(**params) is False:
+        ctx.exit(1)
 
 @cli.command()
 @click.option('--dry-run', is_flag=True, help='Preview creation without executing any queries.')
-def apply(dry_run):
-    """Create Snowflake objects as per YAML configuration."""
-    click.secho("Starting object creation...", fg="blue", bold=True)
-    create_snowflake_objects(dry_run)
+@click.option('--jobs', '-j', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Number of objects to create concurrently, each over its own connection.')
+@click.option('--async', 'async_mode', is_flag=True, help='Submit DDL asynchronously and poll for completion on a single session.')
+@click.option('--max-in-flight', default=8, show_default=True, type=click.IntRange(min=1),
+              help='Maximum number of asynchronous queries running at once (with --async).')
+@click.option('--batch-size', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Send up to N DDL statements per multi-statement request (1 disables batching).')
+@click.option('--incremental', is_flag=True, help='Only apply definitions whose query changed since the last apply (see .sfyaml/state.json).')
+@click.option('--resume', is_flag=True,
+              help='Continue an interrupted or failed apply, skipping the objects its journal records as applied.')
+@click.option('--retries', default=4, show_default=True, type=click.IntRange(min=1),
+              help='Attempts per statement when it fails with a transient error (network, throttling, resuming warehouse).')
+@click.option('--snapshot', is_flag=True,
+              help='Take a zero-copy clone of the schema before applying, for `restore` to swap back.')
+@click.option('--snapshot-retention', type=click.IntRange(min=1),
+              help='Snapshots to keep per schema (default: snapshots.retention in the master file, or 3).')
+@click.option('--timings', is_flag=True, help='Print YAML load and parse timings.')
+@click.option('--watch', is_flag=True, help='Keep running and re-apply definitions from files as they change.')
+@click.option('--interval', default=0.5, show_default=True, type=click.FloatRange(min=0.05),
+              help='Seconds between file checks (with --watch).')
+@selection_options
+@stream_options
+@target_options
+@click.argument('plan_file', required=False, type=click.Path(exists=True, dir_okay=False))
+@click.pass_context
+def apply(ctx, dry_run, jobs, async_mode, max_in_flight, batch_size, incremental, resume, retries, snapshot,
+          snapshot_retention, timings, watch, interval, select, exclude, eager, window, targets, target_jobs, plan_file):
+    """
+    Create Snowflake objects as per YAML configuration.
+
+    With a targets: section in the master file, apply to every target (or those
+    named with --target), up to --target-jobs at once.
+
+    With PLAN_FILE (written by `plan -o`), execute that plan instead of resolving
+    the configuration again. It is refused if it is stale.
+
+    With --select/--exclude, only the chosen objects are applied, and only the
+    files defining them are read.
+    """
+    if sum([async_mode, jobs > 1, batch_size > 1]) > 1:
+        raise click.UsageError("--async, --jobs and --batch-size cannot be combined.")
+    if snapshot_retention and not snapshot:
+        raise click.UsageError("--snapshot-retention needs --snapshot.")
+    if plan_file:
+        if (async_mode or batch_size > 1 or incremental or resume or snapshot or watch or timings or targets
+                or select or exclude):
+            raise click.UsageError("A plan file can only be combined with --dry-run and --jobs.")
+        output.info(f"Applying plan {plan_file}...", fg="blue", bold=True)
+        from commands.plan import apply_plan
+        run_command(ctx, "apply_plan", apply_plan, plan_path=plan_file, jobs=jobs, dry_run=dry_run)
+        return
+    if watch:
+        if async_mode or jobs > 1 or batch_size > 1 or resume or snapshot or targets or select or exclude:
+            raise click.UsageError("--watch cannot be combined with --async, --jobs, --batch-size, --resume, --snapshot, "
+                                   "--target, --select or --exclude.")
+        output.info("Starting watch mode...", fg="blue", bold=True)
+        from commands.create import watch_snowflake_objects
+        watch_snowflake_objects(dry_run, interval)
+        return
+    output.info("Starting object creation...", fg="blue", bold=True)
+    from commands.create import create_snowflake_objects
+    run_command(ctx, "apply", create_snowflake_objects, dry_run=dry_run, jobs=jobs, async_mode=async_mode,
+                max_in_flight=max_in_flight, incremental=incremental, show_timings=timings, batch_size=batch_size,
+                resume=resume, retries=retries, snapshot=snapshot, snapshot_retention_override=snapshot_retention,
+                eager=eager, window=window, select=select, exclude=exclude, targets=targets, target_jobs=target_jobs)
+
+@cli.command()
+@click.option('--output', '-o', 'output_path', type=click.Path(dir_okay=False),
+              help='Save the plan to this file, to run it later with `apply PLAN_FILE`.')
+@click.pass_context
+def plan(ctx, output_path):
+    """
+    Resolve the configuration, check Snowflake once and list the objects apply would
+    create, in order. The saved plan records a hash of the configuration files and a
+    fingerprint of the objects it checked, so `apply` can tell when it went stale.
+    """
+    output.info("Planning...", fg="blue", bold=True)
+    from commands.plan import make_plan
+    run_command(ctx, "plan", make_plan, output_path=output_path)
 
 @cli.command()
-def validate():
-    """Validate configuration files for required fields and proper formatting."""
-    click.secho("Validating configuration files...", fg="blue", bold=True)
-    validate_config()
+@click.option('--timings', is_flag=True, help='Print YAML load and parse timings.')
+@click.option('--strict', is_flag=True, help='Treat references to tables and stages not defined in the configuration as errors.')
+@selection_options
+@click.pass_context
+def validate(ctx, timings, strict, select, exclude):
+    """Validate configuration files, including an offline parse of every query."""
+    output.info("Validating configuration files...", fg="blue", bold=True)
+    from commands.validate import validate as validate_config
+    run_command(ctx, "validate", validate_config, show_timings=timings, strict=strict, select=select, exclude=exclude)
 
 @cli.command()
 @click.option('--dry-run', is_flag=True, help='Show DROP statements without executing them.')
 @click.option('--confirm', is_flag=True, help='Execute DROP statements to rollback objects.')
-def rollback(dry_run, confirm):
+@click.option('--jobs', '-j', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Number of objects to drop concurrently, each over its own connection.')
+@click.option('--async', 'async_mode', is_flag=True, help='Submit DROP statements asynchronously and poll for completion.')
+@click.option('--max-in-flight', default=8, show_default=True, type=click.IntRange(min=1),
+              help='Maximum number of asynchronous queries running at once (with --async).')
+@click.option('--batch-size', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Send up to N DROP statements per multi-statement request (1 disables batching).')
+@click.option('--managed-only', is_flag=True, help='Only drop objects the state manifest records as created by this tool.')
+@selection_options
+@stream_options
+@target_options
+@click.pass_context
+def rollback(ctx, dry_run, confirm, jobs, async_mode, max_in_flight, batch_size, managed_only, select, exclude, eager,
+             window, targets, target_jobs):
     """
     Rollback changes by dropping all objects defined in the configuration.
     
     WARNING: This command will drop objects from your Snowflake environment.
     Use --dry-run to preview and --confirm to execute.
     """
-    click.secho("Starting rollback...", fg="blue", bold=True)
-    rollback_config(dry_run, confirm)
+    if sum([async_mode, jobs > 1, batch_size > 1]) > 1:
+        raise click.UsageError("--async, --jobs and --batch-size cannot be combined.")
+    output.info("Starting rollback...", fg="blue", bold=True)
+    from commands.rollback import rollback as rollback_config
+    run_command(ctx, "rollback", rollback_config, dry_run=dry_run, confirm=confirm, async_mode=async_mode,
+                max_in_flight=max_in_flight, managed_only=managed_only, batch_size=batch_size, jobs=jobs,
+                eager=eager, window=window, select=select, exclude=exclude, targets=targets, target_jobs=target_jobs)
 
 @cli.command()
-def dbt_run():
-    """Run DBT transformations as specified in the configuration."""
-    click.secho("Starting DBT transformation...", fg="blue", bold=True)
-    run_dbt_command()
+@click.option('--dry-run', is_flag=True, help='Show which snapshot would be swapped in without doing it.')
+@click.option('--confirm', is_flag=True, help='Swap the schema with the snapshot.')
+@click.option('--list', 'list_only', is_flag=True, help='List the schema\'s snapshots, newest first.')
+@target_options
+@click.argument('snapshot', required=False)
+@click.pass_context
+def restore(ctx, dry_run, confirm, list_only, targets, target_jobs, snapshot):
+    """
+    Swap the schema back to a snapshot taken by `apply --snapshot`.
+
+    SNAPSHOT defaults to the newest one. The swap is a single metadata operation,
+    however many objects changed since. Use --dry-run to preview and --confirm to
+    execute.
+    """
+    output.info("Starting restore...", fg="blue", bold=True)
+    from commands.restore import restore as restore_snapshot
+    run_command(ctx, "restore", restore_snapshot, snapshot=snapshot, list_only=list_only, dry_run=dry_run,
+                confirm=confirm, targets=targets, target_jobs=target_jobs)
+
+@cli.command()
+@click.option('--jobs', '-j', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Number of GET_DDL calls to run concurrently, each over its own connection.')
+@click.option('--fetch', type=click.Choice(['auto', 'object', 'schema']), default='auto', show_default=True,
+              help='Fetch live DDL per object, with one schema-level GET_DDL per schema, or pick by count.')
+@target_options
+@click.pass_context
+def diff(ctx, jobs, fetch, targets, target_jobs):
+    """
+    Report drift between the configuration and Snowflake: objects that are
+    configured but missing, present but not configured, or defined differently.
+    Use -v to see the differences.
+    """
+    output.info("Comparing configuration with Snowflake...", fg="blue", bold=True)
+    from commands.diff import diff as diff_config
+    run_command(ctx, "diff", diff_config, jobs=jobs, fetch=fetch, targets=targets, target_jobs=target_jobs)
+
+@cli.command()
+@click.option('--jobs', '-j', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Number of connections to run dbt for concurrently, each in its own worktree.')
+@click.option('--models-only', is_flag=True, help="Only run the models listed under each connection's dbt.models.")
+@click.option('--dbt-executable', default='dbt', show_default=True, envvar='SFYAML_DBT',
+              help='dbt command to run (e.g. a path inside a virtualenv).')
+@click.pass_context
+def dbt_run(ctx, jobs, models_only, dbt_executable):
+    """
+    Run DBT transformations as specified in the configuration.
+
+    Repositories are cloned once into .sfyaml/dbt/ and only fetched afterwards.
+    """
+    output.info("Starting DBT transformation...", fg="blue", bold=True)
+    from commands.dbt import run_dbt_command
+    if not run_dbt_command(jobs, models_only, dbt_executable):
+        ctx.exit(1)
+
+@cli.command()
+@click.option('--bench', is_flag=True,
+              help='Measure login time, latency, warehouse resume time and throughput, and recommend apply settings.')
+@click.option('--queries', default=50, show_default=True, type=click.IntRange(min=1),
+              help='Lightweight queries per measurement (with --bench).')
+@click.option('--pool-size', 'pool_sizes', multiple=True, type=click.IntRange(min=1),
+              help='Concurrent connections to measure throughput with (repeatable, with --bench). Default: 1, 2, 4, 8.')
+@click.option('--batch-size', 'batch_sizes', multiple=True, type=click.IntRange(min=1),
+              help='Statements per multi-statement request to measure (repeatable, with --bench). Default: 1, 10, 50.')
+@click.option('--suspend-warehouse', is_flag=True,
+              help='Suspend the warehouse first so its resume time is measured (with --bench; affects its other users).')
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False), help='Also write the --bench report to this JSON file.')
+@click.pass_context
+def check(ctx, bench, queries, pool_sizes, batch_sizes, suspend_warehouse, report_path):
+    """
+    Test connectivity to Snowflake.
+
+    With --bench, measure the connection instead and recommend --jobs and
+    --batch-size for apply.
+    """
+    if not bench:
+        if pool_sizes or batch_sizes or suspend_warehouse or report_path:
+            raise click.UsageError("--pool-size, --batch-size, --suspend-warehouse and --report need --bench.")
+        output.info("Checking Snowflake connectivity...", fg="blue", bold=True)
+        from commands.check import check_connectivity
+        run_command(ctx, "check", check_connectivity)
+        return
+    output.info("Benchmarking the Snowflake connection...", fg="blue", bold=True)
+    from commands.check import benchmark_connection, DEFAULT_POOL_SIZES, DEFAULT_BATCH_SIZES
+    # Run here rather than in the daemon: its warm connections would hide the login time.
+    if not benchmark_connection(queries=queries, pool_sizes=pool_sizes or DEFAULT_POOL_SIZES,
+                                batch_sizes=batch_sizes or DEFAULT_BATCH_SIZES, suspend_warehouse=suspend_warehouse,
+                                report_path=report_path):
+        ctx.exit(1)
 
 @cli.command()
-def check():
-    """Test connectivity to Snowflake."""
-    click.secho("Checking Snowflake connectivity...", fg="blue", bold=True)
-    check_connectivity()
+@click.option('--socket', 'socket_path', default=None, help='Unix socket to listen on (default: .sfyaml/sfyaml.sock).')
+@click.option('--connections', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Number of warm Snowflake connections to keep.')
+def serve(socket_path, connections):
+    """
+    Keep warm Snowflake connections and parsed configs in memory.
+
+    While the daemon runs, apply, rollback, check and validate started from
+    the same directory are forwarded to it instead of logging in again.
+    """
+    output.info("Starting daemon...", fg="blue", bold=True)
+    import daemon
+    from config_loader import load_master_config
+    daemon.serve(load_master_config(), socket_path, connections)
 
 if __name__ == '__main__':
     cli()
@@ -1,22 +1,230 @@
-import os
-import yaml
-from snowflake_connector import create_snowflake_connection
-from utils import substitute_env_vars
+import json
+import math
+import time
+import threading
+from datetime import datetime, timezone
+import output
+from snowflake_connector import create_snowflake_connection, connection_settings
+from config_loader import load_master_config
 
-def read_yaml(file_path):
-    with open(file_path, 'r') as f:
-        data = yaml.safe_load(f)
-    return substitute_env_vars(data)
+# Connections opened at once for the throughput runs, and statements per multi-statement request for the batch runs.
+DEFAULT_POOL_SIZES = (1, 2, 4, 8)
+DEFAULT_BATCH_SIZES = (1, 10, 50)
+
+# A pool size or batch size is recommended once it reaches this share of the best throughput measured.
+GOOD_ENOUGH = 0.9
+
+LATENCY_QUERY = "SELECT 1"
+# Needs compute, so it is the query that waits for a suspended warehouse to resume.
+WAREHOUSE_QUERY = "SELECT COUNT(*) FROM TABLE(GENERATOR(ROWCOUNT => 1))"
 
 def check_connectivity():
-    master_path = os.path.join('config', 'master_sf_objects.yaml')
     try:
-        master_config = read_yaml(master_path)
+        master_config = load_master_config()
         conn = create_snowflake_connection(master_config)
         cursor = conn.cursor()
         cursor.execute('SELECT CURRENT_TIMESTAMP()')
-        print("Successfully connected to Snowflake!")
+        output.info("Successfully connected to Snowflake!", fg="green")
         cursor.close()
         conn.close()
+        return True
     except Exception as e:
-        print(f"Failed to connect to Snowflake: {e}")
+        output.error(f"Failed to connect to Snowflake: {e}")
+        return False
+
+def percentile(values, pct):
+    """Nearest-rank percentile of sorted `values`."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(pct / 100 * len(values)) - 1))]
+
+def timed(action):
+    started = time.perf_counter()
+    action()
+    return time.perf_counter() - started
+
+def measure_latency(cursor, queries):
+    """Round-trip times of `queries` lightweight queries on one session, with their distribution."""
+    times = sorted(timed(lambda: cursor.execute(LATENCY_QUERY)) for _ in range(queries))
+    return {
+        "queries": queries,
+        "min": times[0],
+        "p50": percentile(times, 50),
+        "p95": percentile(times, 95),
+        "p99": percentile(times, 99),
+        "max": times[-1],
+        "mean": sum(times) / len(times)
+    }
+
+def warehouse_state(cursor, warehouse):
+    cursor.execute(f"SHOW WAREHOUSES LIKE '{warehouse}'")
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    columns = [column[0].lower() for column in cursor.description]
+    return row[columns.index("state")] if "state" in columns else None
+
+def measure_warehouse(cursor, warehouse, round_trip, suspend):
+    """
+    Times the first query that needs the warehouse. If the warehouse was suspended
+    (or `suspend` suspended it first), that time less one round trip is its resume time.
+    """
+    result = {"name": warehouse, "state": None, "first_query_seconds": None, "resume_seconds": None}
+    if not warehouse:
+        return result
+    # A cached result would be served without the warehouse.
+    cursor.execute("ALTER SESSION SET USE_CACHED_RESULT = FALSE")
+    state = warehouse_state(cursor, warehouse)
+    if suspend and state not in ("SUSPENDED", "SUSPENDING"):
+        cursor.execute(f"ALTER WAREHOUSE {warehouse} SUSPEND")
+        state = warehouse_state(cursor, warehouse)
+    result["state"] = state
+    result["first_query_seconds"] = timed(lambda: cursor.execute(WAREHOUSE_QUERY))
+    if state in ("SUSPENDED", "SUSPENDING"):
+        result["resume_seconds"] = max(0.0, result["first_query_seconds"] - round_trip)
+    return result
+
+def measure_pool(master_config, connections, queries):
+    """Runs `queries` lightweight queries spread over `connections` sessions at once."""
+    started = time.perf_counter()
+    pool = [create_snowflake_connection(master_config) for _ in range(connections)]
+    login_seconds = time.perf_counter() - started
+    errors = []
+
+    def run(conn, count):
+        cursor = conn.cursor()
+        try:
+            for _ in range(count):
+                cursor.execute(LATENCY_QUERY)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            cursor.close()
+
+    shares = [queries // connections + (i < queries % connections) for i in range(connections)]
+    threads = [threading.Thread(target=run, args=(conn, count)) for conn, count in zip(pool, shares)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    for conn in pool:
+        conn.close()
+    if errors:
+        raise errors[0]
+    return {"connections": connections, "login_seconds": login_seconds, "queries": queries, "seconds": seconds,
+            "queries_per_second": queries / seconds if seconds else None}
+
+def measure_batches(cursor, batch_size, queries):
+    """Sends about `queries` lightweight statements in multi-statement requests of `batch_size`."""
+    requests = max(1, queries // batch_size)
+    statement = ";\n".join([LATENCY_QUERY] * batch_size)
+
+    def run():
+        for _ in range(requests):
+            if batch_size == 1:
+                cursor.execute(LATENCY_QUERY)
+            else:
+                cursor.execute(statement, num_statements=batch_size)
+
+    seconds = timed(run)
+    statements = requests * batch_size
+    return {"batch_size": batch_size, "requests": requests, "statements": statements, "seconds": seconds,
+            "statements_per_second": statements / seconds if seconds else None}
+
+def smallest_good_enough(runs, size_key, rate_key):
+    """The smallest size whose rate is within GOOD_ENOUGH of the best one, and that best rate."""
+    best = max((run[rate_key] or 0) for run in runs)
+    for run in sorted(runs, key=lambda run: run[size_key]):
+        if (run[rate_key] or 0) >= GOOD_ENOUGH * best:
+            return run[size_key], best
+    return runs[0][size_key], best
+
+def recommend(throughput, batching):
+    """
+    Picks --jobs from the throughput runs and --batch-size from the batch runs, and
+    which of the two apply should use (they cannot be combined).
+    """
+    jobs, jobs_rate = smallest_good_enough(throughput, "connections", "queries_per_second")
+    batch_size, batch_rate = smallest_good_enough(batching, "batch_size", "statements_per_second")
+    if batch_size > 1 and batch_rate > jobs_rate:
+        command = f"apply --batch-size {batch_size}"
+    elif jobs > 1:
+        command = f"apply --jobs {jobs}"
+    else:
+        command = "apply"
+    return {"jobs": jobs, "batch_size": batch_size, "apply": command}
+
+def print_report(report):
+    ms = lambda seconds: f"{seconds * 1000:.1f}ms" if seconds is not None else "-"
+    latency = report["latency"]
+    output.info(f"Login: {ms(report['login_seconds'])}")
+    output.info(f"Latency over {latency['queries']} queries: p50 {ms(latency['p50'])}, p95 {ms(latency['p95'])}, "
+                f"p99 {ms(latency['p99'])} (min {ms(latency['min'])}, max {ms(latency['max'])})")
+    warehouse = report["warehouse"]
+    if warehouse["name"]:
+        resumed = f", resume {ms(warehouse['resume_seconds'])}" if warehouse["resume_seconds"] is not None else ""
+        output.info(f"Warehouse {warehouse['name']} ({warehouse['state'] or 'unknown state'}): "
+                    f"first query {ms(warehouse['first_query_seconds'])}{resumed}")
+    output.info(f"{'CONNECTIONS':>11}  {'LOGIN':>9}  {'QUERIES/S':>9}", bold=True)
+    for run in report["throughput"]:
+        output.info(f"{run['connections']:>11}  {ms(run['login_seconds']):>9}  {run['queries_per_second'] or 0:>9.1f}")
+    output.info(f"{'BATCH SIZE':>11}  {'REQUESTS':>9}  {'STMTS/S':>9}", bold=True)
+    for run in report["batching"]:
+        output.info(f"{run['batch_size']:>11}  {run['requests']:>9}  {run['statements_per_second'] or 0:>9.1f}")
+    recommendation = report["recommendation"]
+    output.info(f"Recommended: --jobs {recommendation['jobs']} or --batch-size {recommendation['batch_size']}; "
+                f"fastest: {recommendation['apply']}", fg="green", bold=True)
+
+def benchmark_connection(queries=50, pool_sizes=DEFAULT_POOL_SIZES, batch_sizes=DEFAULT_BATCH_SIZES,
+                         suspend_warehouse=False, report_path=None):
+    """
+    Measures login time, round-trip latency, warehouse resume time, throughput over
+    several connection pool sizes and multi-statement batch sizes, and recommends
+    --jobs and --batch-size for apply. The report is printed (one "check" event in
+    JSON log format) and, with `report_path`, written there as JSON.
+    Returns True if every measurement ran.
+    """
+    try:
+        master_config = load_master_config()
+        started = time.perf_counter()
+        conn = create_snowflake_connection(master_config)
+        login_seconds = time.perf_counter() - started
+    except Exception as e:
+        output.error(f"Failed to connect to Snowflake: {e}")
+        return False
+    settings = connection_settings(master_config)
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "account": settings.get("account"),
+        "login_seconds": login_seconds
+    }
+    cursor = conn.cursor()
+    try:
+        output.info(f"Measuring round-trip latency over {queries} queries...")
+        report["latency"] = measure_latency(cursor, queries)
+        # Before anything else uses the warehouse, or it would already be running.
+        report["warehouse"] = measure_warehouse(cursor, settings.get("warehouse"), report["latency"]["p50"],
+                                                suspend_warehouse)
+        output.info(f"Measuring throughput with {', '.join(map(str, pool_sizes))} connections...")
+        report["throughput"] = [measure_pool(master_config, size, max(queries, size)) for size in sorted(set(pool_sizes))]
+        output.info(f"Measuring multi-statement batches of {', '.join(map(str, batch_sizes))}...")
+        report["batching"] = [measure_batches(cursor, size, max(queries, size)) for size in sorted(set(batch_sizes))]
+    except Exception as e:
+        output.error(f"Benchmark failed: {e}")
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+    report["recommendation"] = recommend(report["throughput"], report["batching"])
+
+    if output.settings()["log_format"] == "json":
+        output.info("Benchmark", event="check", report=report)
+    else:
+        print_report(report)
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        output.info(f"Report written to {report_path}.")
+    return True
@@ -1,102 +1,245 @@
-import os
-import yaml
-import glob
-import click
+import time
+import output
 from snowflake_connector import create_snowflake_connection
-from object_creator import create_objects, execute_query
-from utils import substitute_env_vars
+from object_creator import (create_objects, execute_query, AsyncQueryRunner, BatchExecutor, set_retry_attempts,
+                            RETRY_ATTEMPTS)
+from catalog import CatalogSnapshot
+from engine import apply_graph
+from state import STATE_PATH, load_state, save_state, changed_definitions, record_applied, definition_hash, state_key
+from config_loader import (load_master_config, get_object_definitions, iter_object_definitions, format_load_timings,
+                           entry_pattern, resolve_files, MASTER_PATH, STREAM_WINDOW)
+from watcher import snapshot, wait_for_changes
+from journal import Journal, journal_path, is_journaled
+from snapshots import current_schema, snapshot_retention, take_snapshot
+from targets import fan_out
+from selection import select_objects
 
-def read_yaml(file_path):
-    with open(file_path, 'r') as f:
-        data = yaml.safe_load(f)
-    return substitute_env_vars(data)
+OBJECT_TYPES = ['tables', 'views', 'tasks', 'snowpipes']
 
-def load_yaml_configs(path_pattern):
-    """
-    Accepts a file, directory, or glob pattern and returns a list of YAML configurations.
-    """
-    if os.path.isdir(path_pattern):
-        files = glob.glob(os.path.join(path_pattern, '*.yaml'))
-    elif '*' in path_pattern or '?' in path_pattern:
-        files = glob.glob(path_pattern)
-    else:
-        files = [path_pattern]
-    
-    configs = []
-    for file in files:
-        configs.append(read_yaml(file))
-    return configs
+@fan_out
+def create_snowflake_objects(dry_run=False, jobs=1, async_mode=False, max_in_flight=8, incremental=False,
+                             show_timings=False, batch_size=1, resume=False, retries=RETRY_ATTEMPTS, eager=False,
+                             window=STREAM_WINDOW, snapshot=False, snapshot_retention_override=None, select=(),
+                             exclude=(), target=None, master_config=None):
+    master_config = target["config"] if target else master_config or load_master_config()
+    state_path = target["state_path"] if target else STATE_PATH
+    # With --select/--exclude only the files defining the chosen objects are loaded.
+    selection = target["selection"] if target else select_objects(master_config, select, exclude)
+    state = load_state(state_path)
+    journal = Journal(journal_path(state_path))
+    completed = journal.completed() if resume else None
+    if resume and completed is None:
+        output.info("No interrupted apply to resume. Applying everything.", fg="cyan")
+    set_retry_attempts(retries)
+    sources = {}
+    failed = []
 
-def get_object_definitions(master_config, obj_type):
-    """
-    Processes one section (e.g., tables, views, tasks, snowpipes) from the master YAML.
-    Each entry can specify a file, folder, pattern or inline definitions.
-    Returns a list of object definitions (each must contain 'name' and 'query').
-    """
-    definitions = []
-    if obj_type not in master_config:
-        return definitions
-    for entry in master_config[obj_type]:
-        if "file" in entry:
-            pattern = os.path.join("config", entry["file"])
-            configs = load_yaml_configs(pattern)
-            for config in configs:
-                if obj_type in config:
-                    definitions.extend(config[obj_type])
-                else:
-                    click.secho(f"Warning: No '{obj_type}' key found in file {pattern}.", fg="yellow")
-        elif "folder" in entry:
-            folder = os.path.join("config", entry["folder"])
-            pattern = os.path.join(folder, "*.yaml")
-            configs = load_yaml_configs(pattern)
-            for config in configs:
-                if obj_type in config:
-                    definitions.extend(config[obj_type])
-                else:
-                    click.secho(f"Warning: No '{obj_type}' key found in files in folder {folder}.", fg="yellow")
-        elif "pattern" in entry:
-            pattern = os.path.join("config", entry["pattern"])
-            configs = load_yaml_configs(pattern)
-            for config in configs:
-                if obj_type in config:
-                    definitions.extend(config[obj_type])
-                else:
-                    click.secho(f"Warning: No '{obj_type}' key found in file matching pattern {pattern}.", fg="yellow")
-        elif obj_type in entry:
-            # Inline definitions provided directly in master YAML.
-            definitions.extend(entry[obj_type])
+    def resolve_definitions(obj_type):
+        """
+        Yields the definitions of a type to apply. Unless eager, files are read and
+        parsed while the definitions before them are being applied.
+        """
+        if target:
+            pairs = target["definitions"][obj_type]
+        elif eager:
+            pairs = get_object_definitions(master_config, obj_type, with_sources=True, strict=True, selection=selection)
         else:
-            click.secho(f"Error: Unrecognized {obj_type} configuration: {entry}", fg="red")
-    return definitions
+            pairs = iter_object_definitions(master_config, obj_type, strict=True, window=window, selection=selection)
+        total = changed = resumed = 0
+        for obj, source in pairs:
+            total += 1
+            # Only definitions whose query changed since the last apply are processed.
+            if incremental and not changed_definitions(state, obj_type[:-1], [(obj, source)]):
+                continue
+            changed += 1
+            # Objects the interrupted run completed, unchanged since, are not looked at again.
+            if is_journaled(completed, obj_type[:-1], obj):
+                output.result(obj_type[:-1], obj["name"], "resumed",
+                              f"[{obj_type[:-1].upper()}] '{obj['name']}' was applied by the interrupted run. Skipping.",
+                              "debug", source=source)
+                resumed += 1
+                continue
+            sources[id(obj)] = (obj_type[:-1], source)
+            yield obj
+        if not total:
+            output.info(f"No {obj_type} definitions found.", fg="cyan")
+            return
+        if incremental:
+            output.info(f"{changed} of {total} {obj_type} changed since the last apply.", fg="cyan")
+        if completed:
+            output.info(f"Resuming: {resumed} of {changed} {obj_type} already applied.", fg="cyan")
+
+    def on_result(obj, status):
+        # Dropped once settled, so streamed definitions do not pile up here.
+        obj_type, source = sources.pop(id(obj), (None, None))
+        if status == "failed":
+            failed.append(obj.get("name"))
+        if dry_run or status not in ("created", "exists") or "name" not in obj:
+            return
+        record_applied(state, obj_type, obj, source, created=status == "created")
+        journal.record(obj_type, obj, status)
 
-def create_snowflake_objects(dry_run=False):
-    master_path = os.path.join('config', 'master_sf_objects.yaml')
-    master_config = read_yaml(master_path)
-    
     # Create Snowflake connection using credentials from master config or env variables.
     conn = create_snowflake_connection(master_config)
     
     # Disable autocommit so we can rollback on error.
     conn.autocommit = False
     cursor = conn.cursor()
+    succeeded = finished = False
+    snapshot_name = None
+    if snapshot:
+        # DDL cannot be rolled back, so the schema is cloned before anything changes it.
+        try:
+            database, schema = current_schema(cursor)
+            if dry_run:
+                output.info(f"[DRY RUN] {database}.{schema} would be snapshotted first.", fg="green")
+            else:
+                snapshot_name = take_snapshot(cursor, database, schema,
+                                              snapshot_retention(master_config, snapshot_retention_override), state_path)
+        except Exception as e:
+            output.error(f"ERR: Snapshot failed, nothing was applied: {e}")
+            cursor.close()
+            conn.close()
+            return False
+    if not dry_run:
+        journal.start(resume=completed is not None)
     
     try:
-        for obj_type in ['tables', 'views', 'tasks', 'snowpipes']:
-            definitions = get_object_definitions(master_config, obj_type)
-            if definitions:
-                create_objects(cursor, definitions, obj_type[:-1], dry_run)
-            else:
-                click.secho(f"No {obj_type} definitions found.", fg="cyan")
+        # One bulk SHOW per object type instead of one SHOW ... LIKE per object.
+        catalog = CatalogSnapshot(cursor)
+        catalog.load(['table', 'view', 'task', 'snowpipe', 'stage'])
+        succeeded = True
+        if jobs > 1:
+            # Independent objects run concurrently; dependents wait for what they reference.
+            definitions = {}
+            for obj_type in OBJECT_TYPES:
+                definitions[obj_type[:-1]] = list(resolve_definitions(obj_type))
+            succeeded = apply_graph(master_config, conn, definitions, catalog, jobs, dry_run, on_result)
+        else:
+            # In async mode DDLs of one type are kept in flight together on this session;
+            # in batch mode they are sent as multi-statement requests.
+            runner = None
+            if async_mode and not dry_run:
+                runner = AsyncQueryRunner(cursor, max_in_flight)
+            elif batch_size > 1 and not dry_run:
+                runner = BatchExecutor(cursor, batch_size, refresh=catalog.reload)
+            for obj_type in OBJECT_TYPES:
+                definitions = resolve_definitions(obj_type)
+                if eager:
+                    definitions = list(definitions)
+                create_objects(cursor, definitions, obj_type[:-1], dry_run, catalog, runner, on_result)
+                if runner:
+                    runner.wait_all()
+        succeeded = succeeded and not failed
+        finished = True
         # Commit if not a dry run.
         if not dry_run:
             conn.commit()
-            click.secho("All objects created successfully. Transaction committed.", fg="green", bold=True)
+            if succeeded:
+                output.info("All objects created successfully. Transaction committed.", fg="green", bold=True)
+            else:
+                output.warn("Object creation finished with failures. See the summary below.")
+                if snapshot_name:
+                    output.warn(f"Run restore to swap {database}.{schema} back to snapshot {snapshot_name}.")
         else:
-            click.secho("[DRY RUN] No changes were made.", fg="green", bold=True)
+            output.info("[DRY RUN] No changes were made.", fg="green", bold=True)
     except Exception as e:
-        click.secho(f"ERR: Error during object creation: {e}", fg="red", bold=True)
+        output.error(f"ERR: Error during object creation: {e}")
         conn.rollback()
-        click.secho("Automatic rollback executed due to error.", fg="red", bold=True)
+        output.error("Automatic rollback executed due to error.")
+        if not dry_run:
+            # DDL commits on its own, so what ran before the error stays; the journal knows what.
+            output.error("Run apply --resume to continue after the objects already applied.")
+            if snapshot_name:
+                output.error(f"Or run restore to swap {database}.{schema} back to snapshot {snapshot_name}.")
+    finally:
+        if not dry_run:
+            save_state(state, state_path)
+            journal.finish(finished and succeeded)
+        cursor.close()
+        conn.close()
+        if show_timings:
+            output.info(format_load_timings(), fg="blue")
+    return finished and succeeded
+
+def watched_files(master_config):
+    """Returns the master file plus every file its file/folder/pattern entries resolve to."""
+    files = [MASTER_PATH]
+    for obj_type in OBJECT_TYPES:
+        for entry in master_config.get(obj_type) or []:
+            pattern = entry_pattern(entry)
+            if pattern:
+                files.extend(resolve_files(pattern))
+    return files
+
+def watch_snowflake_objects(dry_run=False, interval=0.5, debounce=0.3):
+    """
+    Applies the definitions changed since the last apply, then watches the configuration
+    and re-applies only the definitions of files that change, over one open connection.
+    """
+    master_config = load_master_config()
+    state = load_state()
+    conn = create_snowflake_connection(master_config)
+    cursor = conn.cursor()
+    catalog = CatalogSnapshot(cursor)
+    catalog.load(['table', 'view', 'task', 'snowpipe', 'stage'])
+    known = {}
+
+    def on_result(obj_type, source):
+        def record(obj, status):
+            if not dry_run and status in ("created", "exists") and "name" in obj:
+                record_applied(state, obj_type, obj, source(obj), created=status == "created")
+        return record
+
+    def apply_cycle(changed_files):
+        started = time.perf_counter()
+        applied = 0
+        if changed_files is not None:
+            # Objects may have been created or dropped outside sfyaml since the last cycle.
+            catalog.reload()
+        for obj_type in OBJECT_TYPES:
+            # After the initial apply only the changed files are read again.
+            pairs = get_object_definitions(master_config, obj_type, with_sources=True, only=changed_files)
+            if changed_files is None:
+                affected = changed_definitions(state, obj_type[:-1], pairs)
+            else:
+                affected = [
+                    (obj, source) for obj, source in pairs
+                    if source in changed_files and known.get(state_key(obj_type[:-1], obj.get("name", ""))) != definition_hash(obj)
+                ]
+            for obj, _ in pairs:
+                known[state_key(obj_type[:-1], obj.get("name", ""))] = definition_hash(obj)
+            if affected:
+                sources = {id(obj): source for obj, source in affected}
+                create_objects(cursor, [obj for obj, _ in affected], obj_type[:-1], dry_run, catalog,
+                               on_result=on_result(obj_type[:-1], lambda obj: sources[id(obj)]))
+                applied += len(affected)
+        if not dry_run:
+            save_state(state)
+        return applied, time.perf_counter() - started
+
+    try:
+        applied, elapsed = apply_cycle(None)
+        output.info(f"Initial apply: {applied} definitions in {elapsed:.2f}s.", fg="blue", bold=True)
+        # Summarize each cycle and write it out before blocking on the next change.
+        output.finish()
+        files = snapshot(watched_files(master_config))
+        output.info(f"Watching {len(files)} files for changes. Press Ctrl+C to stop.", fg="blue")
+        while True:
+            changed, files = wait_for_changes(lambda: watched_files(master_config), files, interval, debounce)
+            output.info(f"Changed: {', '.join(changed)}", fg="cyan")
+            if MASTER_PATH in changed:
+                try:
+                    master_config = load_master_config()
+                except Exception as e:
+                    output.error(f"ERR: Failed to reload master configuration: {e}")
+                    continue
+                files = snapshot(watched_files(master_config))
+            applied, elapsed = apply_cycle(set(changed))
+            output.info(f"Cycle done: {applied} definitions from {len(changed)} changed files in {elapsed:.2f}s.", fg="blue", bold=True)
+            output.finish()
+    except KeyboardInterrupt:
+        output.info("Stopped watching.", fg="blue")
     finally:
         cursor.close()
         conn.close()
@@ -1,46 +1,173 @@
 import os
-import yaml
+import re
+import hashlib
+import shutil
+import threading
 import subprocess
-from utils import substitute_env_vars
-
-def read_yaml(file_path):
-    with open(file_path, 'r') as f:
-        data = yaml.safe_load(f)
-    return substitute_env_vars(data)
-
-def run_dbt_command():
-    master_path = os.path.join('config', 'master_sf_objects.yaml')
-    master_config = read_yaml(master_path)
-    
-    # Process DBT configurations if present (this example will run for each DBT block found)
-    if "airbyte_connections" in master_config:
-        for connection in master_config["airbyte_connections"]:
-            print(f"Processing DBT for connection: {connection.get('name')}")
-            dbt_config = connection.get("dbt")
-            if dbt_config:
-                git_url = dbt_config.get("git_url")
-                branch = dbt_config.get("branch", "main")
-                if not git_url:
-                    print(f"Error: DBT configuration for {connection.get('name')} is missing 'git_url'. Skipping...")
-                    continue
-                
-                temp_dir = '/tmp/dbt_repo'
-                # Remove any previous clone
-                subprocess.run(['rm', '-rf', temp_dir])
-                
-                print(f"Cloning DBT repository from {git_url} (branch: {branch}) to {temp_dir}")
-                result = subprocess.run(['git', 'clone', '-b', branch, git_url, temp_dir])
-                if result.returncode != 0:
-                    print("Error cloning DBT repository.")
-                    continue
-                
-                print("Running 'dbt run' in the cloned repository...")
-                result = subprocess.run(['dbt', 'run'], cwd=temp_dir)
-                if result.returncode != 0:
-                    print("DBT run failed.")
-                else:
-                    print("DBT run completed successfully.")
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import output
+from config_loader import load_master_config
+
+DBT_DIR = os.path.join(".sfyaml", "dbt")
+
+def _git(args, cwd=None):
+    """Runs a git command and returns its stdout; raises RuntimeError with git's message on failure."""
+    result = subprocess.run(["git"] + args, cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        message = result.stderr.strip().splitlines()
+        raise RuntimeError(message[0] if message else f"git {' '.join(args)} failed")
+    return result.stdout
+
+def cache_name(value):
+    """A directory name for a repository URL or connection name that stays readable and unique."""
+    readable = re.sub(r"[^\w.-]+", "_", value).strip("_")[-40:]
+    return f"{readable}-{hashlib.sha1(value.encode('utf-8')).hexdigest()[:10]}"
+
+class RepoCache:
+    """
+    One mirror clone per repository under `root`/repos, fetched at most once per run,
+    with a worktree per connection, branch and repository under `root`/worktrees. Later runs only fetch what
+    changed and check the branch out again instead of cloning from scratch.
+    """
+
+    def __init__(self, root=DBT_DIR):
+        self.root = root
+        self._locks = {}
+        self._fetched = set()
+        self._worktree_locks = {}
+        self._lock = threading.Lock()
+
+    def _repo_lock(self, git_url):
+        with self._lock:
+            return self._locks.setdefault(git_url, threading.Lock())
+
+    def mirror(self, git_url):
+        """Returns the path of the repository's mirror, cloning or fetching it first."""
+        path = os.path.join(self.root, "repos", cache_name(git_url))
+        with self._repo_lock(git_url):
+            if git_url in self._fetched:
+                return path
+            if os.path.isdir(path):
+                output.info(f"Fetching {git_url}...")
+                _git(["fetch", "--prune", "--quiet", "origin"], cwd=path)
             else:
-                print(f"No DBT configuration found for connection {connection.get('name')}.")
-    else:
-        print("No DBT configuration found in master file.")
+                output.info(f"Cloning {git_url} into {path}...")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _git(["clone", "--mirror", "--quiet", git_url, path])
+            self._fetched.add(git_url)
+        return path
+
+    def worktree_path(self, git_url, branch, name):
+        """The worktree for a connection's repository and branch; another URL or branch gets another one."""
+        return os.path.abspath(os.path.join(self.root, "worktrees", cache_name(f"{git_url}\0{name}@{branch}")))
+
+    def worktree(self, git_url, branch, name):
+        """Checks `branch` out in the connection's own worktree and returns its path."""
+        mirror = self.mirror(git_url)
+        path = self.worktree_path(git_url, branch, name)
+        # Worktrees of one repository share its metadata, so they are set up one at a time.
+        with self._repo_lock(git_url):
+            if os.path.exists(os.path.join(path, ".git")) and not self._belongs_to(path, mirror):
+                output.info(f"Worktree {path} is not one of {git_url}'s. Checking it out again.")
+                shutil.rmtree(path)
+            if os.path.exists(os.path.join(path, ".git")):
+                _git(["checkout", "--force", "--quiet", "--detach", branch], cwd=path)
+                # Untracked files go, ignored ones (dbt's target/ and dbt_packages/) are kept.
+                _git(["clean", "-fdq"], cwd=path)
+            else:
+                _git(["worktree", "prune"], cwd=mirror)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _git(["worktree", "add", "--force", "--detach", "--quiet", path, branch], cwd=mirror)
+        return path
+
+    @staticmethod
+    def _belongs_to(path, mirror):
+        try:
+            common = _git(["rev-parse", "--path-format=absolute", "--git-common-dir"], cwd=path).strip()
+        except RuntimeError:
+            return False
+        return os.path.realpath(common) == os.path.realpath(mirror)
+
+    @contextmanager
+    def checkout(self, git_url, branch, name):
+        """
+        Like worktree(), but holds the worktree until the block ends, so connections
+        that share one (same name, branch and repository) run one after the other.
+        """
+        path = self.worktree_path(git_url, branch, name)
+        with self._lock:
+            lock = self._worktree_locks.setdefault(path, threading.Lock())
+        with lock:
+            yield self.worktree(git_url, branch, name)
+
+def model_names(dbt_config):
+    """The model names listed under a connection's dbt.models, as plain strings or {name: ...} entries."""
+    names = []
+    for model in dbt_config.get("models") or []:
+        name = model.get("name") if isinstance(model, dict) else model
+        if name:
+            names.append(str(name))
+    return names
+
+def run_connection(cache, connection, dbt_executable, models_only):
+    """Prepares the connection's worktree and runs dbt in it. Returns 'succeeded', 'failed' or 'skipped'."""
+    name = connection.get("name") or "unnamed"
+    dbt_config = connection.get("dbt")
+    if not dbt_config:
+        output.info(f"No DBT configuration found for connection {name}.")
+        return "skipped"
+    git_url = dbt_config.get("git_url")
+    branch = dbt_config.get("branch", "main")
+    if not git_url:
+        output.result("dbt", name, "failed", f"Error: DBT configuration for {name} is missing 'git_url'. Skipping...",
+                      "error", "red")
+        return "failed"
+    command = [dbt_executable, "run"]
+    if models_only:
+        models = model_names(dbt_config)
+        if not models:
+            output.result("dbt", name, "skipped", f"[DBT] WARN: {name} lists no dbt.models to select. Skipping.",
+                          "warn", "yellow")
+            return "skipped"
+        command += ["--select"] + models
+    try:
+        with cache.checkout(git_url, branch, name) as path:
+            output.info(f"[DBT] {name}: running '{' '.join(command)}' on {branch} in {path}")
+            try:
+                # Output is captured so parallel runs do not interleave; each run's lines are printed together.
+                result = subprocess.run(command, cwd=path, capture_output=True, text=True)
+            except OSError as e:
+                output.result("dbt", name, "failed", f"[DBT] ERR: Could not start {dbt_executable}: {e}", "error", "red",
+                              error=str(e))
+                return "failed"
+    except RuntimeError as e:
+        output.result("dbt", name, "failed", f"[DBT] ERR: Checking out {git_url} (branch: {branch}) for {name} failed: {e}",
+                      "error", "red", error=str(e))
+        return "failed"
+    for line in (result.stdout + result.stderr).splitlines():
+        output.info(f"[DBT] {name} | {line}")
+    if result.returncode != 0:
+        output.result("dbt", name, "failed", f"[DBT] ERR: dbt run for {name} failed with exit code {result.returncode}.",
+                      "error", "red", exit_code=result.returncode)
+        return "failed"
+    output.result("dbt", name, "succeeded", f"[DBT] OK: dbt run for {name} completed successfully.", fg="green")
+    return "succeeded"
+
+def run_dbt_command(jobs=1, models_only=False, dbt_executable="dbt", cache_dir=DBT_DIR):
+    """
+    Runs dbt for every airbyte_connections entry with a dbt block, up to `jobs` at once,
+    each in its own worktree of a cached clone of its repository. With models_only,
+    only the models listed under the connection's dbt.models are run.
+    Returns True if no run failed.
+    """
+    master_config = load_master_config()
+    connections = master_config.get("airbyte_connections") or []
+    if not connections:
+        output.info("No DBT configuration found in master file.")
+        return True
+    cache = RepoCache(cache_dir)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        statuses = list(executor.map(lambda connection: run_connection(cache, connection, dbt_executable, models_only),
+                                     connections))
+    return "failed" not in statuses
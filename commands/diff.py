@@ -0,0 +1,90 @@
+import time
+import difflib
+import output
+from snowflake_connector import create_snowflake_connection
+from catalog import CatalogSnapshot
+from config_loader import load_master_config, get_object_definitions
+from drift import live_objects, fetch_live_ddl, normalize_ddl
+from targets import fan_out
+
+OBJECT_TYPES = ['tables', 'views', 'tasks', 'snowpipes']
+
+def ddl_lines(query):
+    """Normalized lines of a DDL statement, so the shown differences are the ones that count."""
+    return [normalize_ddl(line) for line in query.strip().splitlines() if normalize_ddl(line)]
+
+@fan_out
+def diff(jobs=1, fetch="auto", target=None, master_config=None):
+    """
+    Compares the configured definitions with what exists in Snowflake and reports
+    every object as added (configured, not in Snowflake), removed (in Snowflake,
+    not configured), changed (live DDL differs from its query) or unchanged.
+    Returns True if nothing differs.
+    """
+    try:
+        master_config = target["config"] if target else master_config or load_master_config()
+    except Exception as e:
+        output.error(f"ERR: Failed to load master configuration: {e}")
+        return False
+    started = time.perf_counter()
+    conn = create_snowflake_connection(master_config)
+    cursor = conn.cursor()
+    try:
+        catalog = CatalogSnapshot(cursor)
+        configured = {}
+        for obj_type in OBJECT_TYPES:
+            if target:
+                pairs = target["definitions"][obj_type]
+            else:
+                pairs = get_object_definitions(master_config, obj_type, with_sources=True)
+            for obj, source in pairs:
+                if "name" in obj and "query" in obj:
+                    configured[(obj_type[:-1],) + catalog.key(obj["name"])] = (obj, source)
+
+        # Every schema the configuration names, plus the session's.
+        scopes = {(catalog.database, catalog.schema)} | {(key[1], key[2]) for key in configured}
+        live = {}
+        for database, schema in sorted(scopes):
+            live.update(live_objects(cursor, database, schema))
+        both = {key: altered for key, altered in live.items() if key in configured}
+        live_ddl, cache_hits = fetch_live_ddl(master_config, conn, both, jobs, fetch)
+
+        in_sync = True
+        for key, (obj, source) in configured.items():
+            obj_type, name = key[0], obj["name"]
+            label = f"[{obj_type.upper()}] '{name}' ({source})"
+            if key not in live:
+                output.result(obj_type, name, "added", f"+ {label}: not in Snowflake.", fg="green", source=source)
+                in_sync = False
+            elif key not in live_ddl:
+                output.result(obj_type, name, "failed", f"ERR: {label}: live DDL unavailable.", "error", "red")
+                in_sync = False
+            elif normalize_ddl(live_ddl[key]) != normalize_ddl(obj["query"]):
+                output.result(obj_type, name, "changed", f"~ {label}: live definition differs.", "warn", "yellow",
+                              source=source)
+                lines = difflib.unified_diff(ddl_lines(live_ddl[key]), ddl_lines(obj["query"]),
+                                             "snowflake", source, lineterm="")
+                output.debug("\n".join(lines))
+                in_sync = False
+            else:
+                output.result(obj_type, name, "unchanged", f"= {label}: in sync.", "debug", source=source)
+        for key in live:
+            if key not in configured:
+                obj_type, database, schema, name = key
+                output.result(obj_type, name, "removed", f"- [{obj_type.upper()}] {database}.{schema}.{name}: "
+                              "in Snowflake, not in the configuration.", fg="red")
+                in_sync = False
+    finally:
+        cursor.close()
+        conn.close()
+
+    output.info(
+        f"Compared {len(configured)} configured objects with {len(live)} live objects "
+        f"({cache_hits} DDL from cache) in {time.perf_counter() - started:.2f}s.",
+        fg="blue"
+    )
+    if in_sync:
+        output.info("No drift. Snowflake matches the configuration.", fg="green", bold=True)
+    else:
+        output.warn("Snowflake differs from the configuration. See the summary below.")
+    return in_sync
@@ -0,0 +1,247 @@
+import json
+import zlib
+import hashlib
+from datetime import datetime, timezone
+import output
+import tracing
+from snowflake_connector import create_snowflake_connection
+from object_creator import execute_query, extract_stage_from_query
+from catalog import CatalogSnapshot
+from engine import build_dependency_graph, run_graph, execute_graph, report_skipped
+from state import load_state, save_state, record_applied
+from config_loader import load_master_config, get_object_definitions
+from commands.create import OBJECT_TYPES, watched_files
+
+PLAN_VERSION = 1
+
+# Outcomes after which dependents can still be planned.
+PLAN_STATUSES = ("planned", "exists")
+
+def config_hash(files):
+    """
+    Hash of the master file and every file it resolves to, read as bytes.
+    Cheap enough to recompute before applying a plan without parsing any YAML.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(set(files)):
+        with open(path, "rb") as f:
+            content = f.read()
+        digest.update(f"{path}\0{len(content)}\0".encode("utf-8"))
+        digest.update(content)
+    return digest.hexdigest()
+
+def catalog_fingerprint(catalog, checks):
+    """
+    Hash of whether each (obj_type, name) in `checks` exists. Only the objects a plan
+    looked at count, so unrelated changes in the schema do not make it stale.
+    """
+    seen = sorted([obj_type, *catalog.key(name), catalog.check(obj_type, name)] for obj_type, name in checks)
+    return hashlib.sha256(json.dumps(seen).encode("utf-8")).hexdigest()
+
+def write_plan(path, plan):
+    """Writes the plan as zlib-compressed JSON."""
+    with open(path, "wb") as f:
+        f.write(zlib.compress(json.dumps(plan, separators=(",", ":")).encode("utf-8"), 9))
+
+def read_plan(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        plan = json.loads(zlib.decompress(data))
+    except (zlib.error, ValueError) as e:
+        raise ValueError(f"{path} is not an sfyaml plan: {e}")
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"{path} is a version {plan.get('version')} plan; this sfyaml reads version {PLAN_VERSION}.")
+    return plan
+
+def plannable(master_config):
+    """Plans cover the session schema only; a targets: section would silently be ignored."""
+    if master_config.get("targets"):
+        output.error("ERR: Plans do not support a targets: section. Use apply (with --target) instead.")
+        return False
+    return True
+
+def make_plan(output_path=None):
+    """
+    Resolves the configuration, takes one catalog snapshot and works out which objects
+    apply would create, in dependency order. With output_path the plan is saved there
+    together with the configuration hash and the catalog fingerprint it was made from.
+    Returns the plan, or False if the configuration cannot be planned or any object
+    failed to plan (the plan is then not saved).
+    """
+    master_config = load_master_config()
+    if not plannable(master_config):
+        return False
+    files = watched_files(master_config)
+    definitions = {}
+    sources = {}
+    for obj_type in OBJECT_TYPES:
+        pairs = get_object_definitions(master_config, obj_type, with_sources=True, strict=True)
+        definitions[obj_type[:-1]] = [obj for obj, _ in pairs]
+        for obj, source in pairs:
+            sources[id(obj)] = source
+
+    conn = create_snowflake_connection(master_config)
+    cursor = conn.cursor()
+    try:
+        catalog = CatalogSnapshot(cursor)
+        catalog.load(['table', 'view', 'task', 'snowpipe', 'stage'])
+        nodes = build_dependency_graph(definitions, catalog.database, catalog.schema)
+        checks = []
+        actions = []
+        action_index = {}
+
+        def plan_node(node):
+            obj, obj_type, name = node["definition"], node["obj_type"], node["name"]
+            if "name" not in obj or "query" not in obj:
+                output.result(obj_type, obj.get("name"), "failed",
+                              f"[{obj_type.upper()}] ERR: '{obj.get('name', 'unknown')}' needs a 'name' and a 'query'.",
+                              "error", "red")
+                return "failed"
+            checks.append((obj_type, name))
+            if catalog.check(obj_type, name):
+                output.result(obj_type, name, "exists", f"[{obj_type.upper()}] '{name}' already exists. No action.", fg="cyan")
+                return "exists"
+            stage = None
+            if obj_type == "snowpipe":
+                stage = obj.get("stage") or extract_stage_from_query(obj["query"])
+                if not stage:
+                    output.result(obj_type, name, "skipped",
+                                  f"[SNOWPIPE] WARN: No stage specified or found in query for '{name}'. Skipping.",
+                                  "warn", "yellow")
+                    return "skipped"
+                checks.append(("stage", stage))
+                if not catalog.check("stage", stage):
+                    output.result(obj_type, name, "skipped",
+                                  f"[SNOWPIPE] WARN: Stage '{stage}' does not exist. Skipping '{name}'.",
+                                  "warn", "yellow", stage=stage)
+                    return "skipped"
+            action_index[node["index"]] = len(actions)
+            actions.append({
+                "obj_type": obj_type,
+                "name": name,
+                "query": obj["query"],
+                "source": sources.get(id(obj)),
+                "after": sorted(action_index[dep] for dep in node["deps"] if dep in action_index)
+            })
+            output.result(obj_type, name, "planned", f"[PLAN] [{obj_type.upper()}] '{name}' will be created.\nDDL: {obj['query']}",
+                          fg="green", source=sources.get(id(obj)))
+            return "planned"
+
+        # One worker runs the nodes in dependency order, the order the actions are listed in.
+        statuses, skipped = run_graph(nodes, plan_node, 1, PLAN_STATUSES)
+        planned = report_skipped(statuses, skipped)
+        plan = {
+            "version": PLAN_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "database": catalog.database,
+            "schema": catalog.schema,
+            "config_hash": config_hash(files),
+            "catalog_fingerprint": catalog_fingerprint(catalog, checks),
+            "checks": checks,
+            "actions": actions
+        }
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not planned:
+        # An incomplete plan would apply without the objects that failed, so it is not saved.
+        output.error(f"ERR: Planning failed for some objects (see above); "
+                     f"{'no plan was written' if output_path else 'the plan is incomplete'}.")
+        return False
+    if output_path:
+        write_plan(output_path, plan)
+        output.info(f"Wrote a plan with {len(actions)} actions to {output_path}.", fg="green", bold=True)
+    else:
+        output.info(f"Plan: {len(actions)} objects to create. Use -o to save it for apply.", fg="green", bold=True)
+    return plan
+
+def run_action(cursor, node, catalog, dry_run=False):
+    """Executes one planned CREATE; the plan already settled that it is needed."""
+    action = node["definition"]
+    obj_type, name = action["obj_type"], action["name"]
+    if dry_run:
+        output.result(obj_type, name, "created", f"[DRY RUN] [{obj_type.upper()}] '{name}' will be created.\nDDL: {action['query']}",
+                      fg="green", dry_run=True)
+        return "created"
+    with tracing.context(obj_type=obj_type, name=name, source=action["source"]):
+        try:
+            execute_query(cursor, action["query"])
+        except Exception as e:
+            output.result(obj_type, name, "failed", f"[{obj_type.upper()}] ERR: Failed to create '{name}': {e}",
+                          "error", "red", error=str(e))
+            return "failed"
+    catalog.add(obj_type, name)
+    output.result(obj_type, name, "created", f"[{obj_type.upper()}] OK: '{name}' created.", fg="green")
+    return "created"
+
+def apply_plan(plan_path, jobs=1, dry_run=False):
+    """
+    Executes a plan saved by make_plan without resolving the configuration again.
+    The plan is refused if any configuration file changed, or if any object it
+    looked at appeared or disappeared in Snowflake, since it was made.
+    """
+    try:
+        plan = read_plan(plan_path)
+    except (OSError, ValueError) as e:
+        output.error(f"ERR: {e}")
+        return False
+    master_config = load_master_config()
+    if not plannable(master_config):
+        return False
+    if config_hash(watched_files(master_config)) != plan["config_hash"]:
+        output.error(f"ERR: The configuration changed since {plan_path} was made. Run plan again.")
+        return False
+
+    conn = create_snowflake_connection(master_config)
+    conn.autocommit = False
+    cursor = conn.cursor()
+    state = load_state()
+    try:
+        catalog = CatalogSnapshot(cursor)
+        if (catalog.database, catalog.schema) != (plan["database"], plan["schema"]):
+            output.error(f"ERR: {plan_path} was made for {plan['database']}.{plan['schema']}, "
+                         f"not {catalog.database}.{catalog.schema}.")
+            return False
+        catalog.load({obj_type for obj_type, _ in plan["checks"]})
+        if catalog_fingerprint(catalog, plan["checks"]) != plan["catalog_fingerprint"]:
+            output.error(f"ERR: Objects in {catalog.database}.{catalog.schema} changed since {plan_path} was made. Run plan again.")
+            return False
+        output.info(f"Applying {len(plan['actions'])} actions planned at {plan['created_at']}.", fg="blue")
+
+        nodes = [
+            {"index": i, "obj_type": action["obj_type"], "name": action["name"], "definition": action,
+             "deps": set(action["after"]), "dependents": set()}
+            for i, action in enumerate(plan["actions"])
+        ]
+        for node in nodes:
+            for dep in node["deps"]:
+                nodes[dep]["dependents"].add(node["index"])
+
+        def work(node_cursor, node):
+            return run_action(node_cursor, node, catalog, dry_run)
+
+        statuses, skipped = execute_graph(master_config, conn, nodes, jobs, work, dry_run)
+        succeeded = report_skipped(statuses, skipped)
+        if not dry_run:
+            for node in nodes:
+                if statuses[node["index"]] == "created":
+                    action = node["definition"]
+                    record_applied(state, action["obj_type"], action, action["source"], created=True)
+            conn.commit()
+            save_state(state)
+            if succeeded:
+                output.info("Plan applied successfully. Transaction committed.", fg="green", bold=True)
+            else:
+                output.warn("Plan applied with failures. See the summary below.")
+        else:
+            output.info("[DRY RUN] No changes were made.", fg="green", bold=True)
+        return succeeded
+    except Exception as e:
+        output.error(f"ERR: Error while applying {plan_path}: {e}")
+        conn.rollback()
+        return False
+    finally:
+        cursor.close()
+        conn.close()
@@ -0,0 +1,72 @@
+import os
+import output
+from snowflake_connector import create_snowflake_connection
+from config_loader import load_master_config
+from catalog import normalize_identifier
+from state import STATE_PATH
+from journal import journal_path
+from snapshots import current_schema, list_snapshots, is_snapshot_of, restore_snapshot
+from targets import fan_out
+
+@fan_out
+def restore(snapshot=None, list_only=False, dry_run=False, confirm=False, target=None, master_config=None):
+    """
+    Swaps the session schema back to a snapshot taken by `apply --snapshot` (the
+    newest unless `snapshot` names one). With list_only, only lists the snapshots.
+    Returns True if the schema was restored or nothing was asked to change.
+    """
+    try:
+        master_config = target["config"] if target else master_config or load_master_config()
+    except Exception as e:
+        output.error(f"ERR: Failed to load master configuration: {e}")
+        return False
+    state_path = target["state_path"] if target else STATE_PATH
+
+    conn = create_snowflake_connection(master_config)
+    cursor = conn.cursor()
+    try:
+        database, schema = current_schema(cursor)
+        snapshots = list_snapshots(cursor, database, schema)
+        if list_only:
+            if not snapshots:
+                output.info(f"No snapshots of {database}.{schema}.", fg="cyan")
+            for name in snapshots:
+                output.info(f"{database}.{name}")
+            return True
+        if snapshot:
+            name = normalize_identifier(snapshot.split(".")[-1])
+            if not is_snapshot_of(name, schema):
+                output.error(f"ERR: {name} is not a snapshot of {database}.{schema}.")
+                return False
+            if name not in snapshots:
+                output.error(f"ERR: Snapshot {database}.{name} does not exist.")
+                return False
+        elif snapshots:
+            name = snapshots[0]
+        else:
+            output.error(f"ERR: No snapshots of {database}.{schema} to restore. Take one with apply --snapshot.")
+            return False
+
+        if dry_run:
+            output.info(f"[DRY RUN] {database}.{schema} would be swapped with snapshot {name}.", fg="green")
+            return True
+        if not confirm:
+            output.warn(f"This command will replace {database}.{schema} with snapshot {name}. Use --confirm to proceed.")
+            return True
+        try:
+            restore_snapshot(cursor, database, schema, name, state_path)
+        except Exception as e:
+            output.error(f"ERR: Restoring {database}.{schema} from {name} failed: {e}")
+            return False
+        # The journal describes the schema that was just swapped out.
+        try:
+            os.remove(journal_path(state_path))
+        except FileNotFoundError:
+            pass
+        output.info(f"OK: {database}.{schema} restored from snapshot {name}. What it held until now is kept as {name}; "
+                    "restore it again to undo.", fg="green", bold=True)
+        output.warn("Tasks in a cloned schema are suspended; resume the ones that should run.")
+        return True
+    finally:
+        cursor.close()
+        conn.close()
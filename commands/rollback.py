@@ -1,59 +1,17 @@
-import os
-import yaml
-import glob
-import click
-from utils import substitute_env_vars
+import time
+import output
+import tracing
+from catalog import CatalogSnapshot
+from engine import build_dependency_graph, reverse_graph, execute_graph, report_skipped
+from config_loader import load_master_config, get_object_definitions, iter_object_definitions, STREAM_WINDOW
 from snowflake_connector import create_snowflake_connection
+from object_creator import AsyncQueryRunner, BatchExecutor, run_with_retries
+from state import STATE_PATH, load_state, save_state, managed_objects, forget
+from targets import fan_out
+from selection import select_objects
 
-def read_yaml(file_path):
-    with open(file_path, 'r') as f:
-        data = yaml.safe_load(f)
-    return substitute_env_vars(data)
-
-def load_yaml_configs(path_pattern):
-    if os.path.isdir(path_pattern):
-        files = glob.glob(os.path.join(path_pattern, '*.yaml'))
-    elif '*' in path_pattern or '?' in path_pattern:
-        files = glob.glob(path_pattern)
-    else:
-        files = [path_pattern]
-    configs = []
-    for file in files:
-        try:
-            configs.append(read_yaml(file))
-        except Exception as e:
-            click.secho(f"ERR: Failed to load YAML file {file}: {e}", fg="red")
-    return configs
-
-def get_object_definitions(master_config, obj_type):
-    definitions = []
-    if obj_type not in master_config:
-        return definitions
-    for entry in master_config[obj_type]:
-        if "file" in entry:
-            pattern = os.path.join("config", entry["file"])
-            configs = load_yaml_configs(pattern)
-            for config in configs:
-                if obj_type in config:
-                    definitions.extend(config[obj_type])
-        elif "folder" in entry:
-            folder = os.path.join("config", entry["folder"])
-            pattern = os.path.join(folder, "*.yaml")
-            configs = load_yaml_configs(pattern)
-            for config in configs:
-                if obj_type in config:
-                    definitions.extend(config[obj_type])
-        elif "pattern" in entry:
-            pattern = os.path.join("config", entry["pattern"])
-            configs = load_yaml_configs(pattern)
-            for config in configs:
-                if obj_type in config:
-                    definitions.extend(config[obj_type])
-        elif obj_type in entry:
-            definitions.extend(entry[obj_type])
-        else:
-            click.secho(f"ERR: Unrecognized {obj_type} configuration entry: {entry}", fg="red")
-    return definitions
+# A failed DROP stops the objects behind it; one that was never there does not.
+DROP_SUCCESS_STATUSES = ("dropped", "absent")
 
 def drop_statement(obj_type, name):
     statements = {
@@ -64,67 +22,206 @@ def drop_statement(obj_type, name):
     }
     return statements.get(obj_type.lower(), None)
 
-def drop_objects(cursor, definitions, obj_type, dry_run=False):
+def drop_object(cursor, obj, obj_type, dry_run=False, catalog=None):
+    """
+    Drops one object and reports how long the DROP took.
+    Objects the catalog does not list are skipped without a query; if their type's
+    listing is unavailable the DROP ... IF EXISTS runs anyway.
+    Returns 'dropped', 'absent' or 'failed'.
+    """
+    name = obj.get("name")
+    if not name:
+        output.result(obj_type, None, "failed", f"ERR: {obj_type} definition missing 'name'.", "error", "red")
+        return "failed"
+    stmt = drop_statement(obj_type, name)
+    if not stmt:
+        output.result(obj_type, name, "failed", f"ERR: Unsupported object type: {obj_type}", "error", "red")
+        return "failed"
+    if catalog is not None and catalog.exists(obj_type, name) is False:
+        output.result(obj_type, name, "absent", f"[{obj_type.upper()}] '{name}' does not exist. Skipping.", fg="cyan")
+        return "absent"
+    if dry_run:
+        output.result(obj_type, name, "dropped", f"[DRY RUN] {obj_type.upper()} '{name}' would be dropped with: {stmt}",
+                      fg="green", dry_run=True)
+        return "dropped"
+    started = time.perf_counter()
+    try:
+        with tracing.span("execute", "ddl", obj_type=obj_type, name=name, source=tracing.source_of(obj)) as span:
+            # DROP ... IF EXISTS can simply run again after a transient error.
+            run_with_retries(lambda: cursor.execute(stmt), stmt)
+            span["query_id"] = cursor.sfqid
+    except Exception as e:
+        output.result(obj_type, name, "failed", f"ERR: Failed to drop {obj_type.upper()} '{name}': {e}",
+                      "error", "red", error=str(e))
+        return "failed"
+    if catalog is not None:
+        catalog.remove(obj_type, name)
+    took = time.perf_counter() - started
+    output.result(obj_type, name, "dropped", f"OK: {obj_type.upper()} '{name}' dropped in {took:.2f}s.", fg="green",
+                  seconds=round(took, 3))
+    return "dropped"
+
+def drop_objects(cursor, definitions, obj_type, dry_run=False, runner=None, on_result=None, catalog=None):
+    """
+    Drops the given objects. With a runner (AsyncQueryRunner or BatchExecutor) the DROP
+    statements are submitted without waiting and reported as they finish.
+    `on_result(obj, status)` receives 'dropped', 'absent' or 'failed' for every object.
+    """
     for obj in definitions:
         name = obj.get("name")
-        if not name:
-            click.secho(f"ERR: {obj_type} definition missing 'name'.", fg="red")
-            continue
-        stmt = drop_statement(obj_type, name)
-        if not stmt:
-            click.secho(f"ERR: Unsupported object type: {obj_type}", fg="red")
+        if runner is None or dry_run or not name or not drop_statement(obj_type, name) \
+                or (catalog is not None and catalog.exists(obj_type, name) is False):
+            status = drop_object(cursor, obj, obj_type, dry_run, catalog)
+            if on_result and name:
+                on_result(obj, status)
             continue
-        if dry_run:
-            click.secho(f"[DRY RUN] {obj_type.upper()} '{name}' would be dropped with: {stmt}", fg="green", bold=True)
-        else:
-            try:
-                cursor.execute(stmt)
-                click.secho(f"OK: {obj_type.upper()} '{name}' dropped.", fg="green")
-            except Exception as e:
-                click.secho(f"ERR: Failed to drop {obj_type.upper()} '{name}': {e}", fg="red")
-
-@click.command()
-@click.option('--dry-run', is_flag=True, help='Preview DROP statements without executing them.')
-@click.option('--confirm', is_flag=True, help='Confirm dropping the objects.')
-def rollback(dry_run, confirm):
+
+        def on_done(error, obj=obj, name=name, started=time.perf_counter()):
+            took = time.perf_counter() - started
+            if error:
+                output.result(obj_type, name, "failed", f"ERR: Failed to drop {obj_type.upper()} '{name}': {error}",
+                              "error", "red", error=str(error))
+            else:
+                if catalog is not None:
+                    catalog.remove(obj_type, name)
+                output.result(obj_type, name, "dropped", f"OK: {obj_type.upper()} '{name}' dropped in {took:.2f}s.",
+                              fg="green", seconds=round(took, 3))
+            if on_result:
+                on_result(obj, "failed" if error else "dropped")
+
+        try:
+            with tracing.context(obj_type=obj_type, name=name, source=tracing.source_of(obj)):
+                runner.submit(drop_statement(obj_type, name), on_done)
+        except Exception as e:
+            output.result(obj_type, name, "failed", f"ERR: Failed to drop {obj_type.upper()} '{name}': {e}",
+                          "error", "red", error=str(e))
+            if on_result:
+                on_result(obj, "failed")
+
+def with_configured_queries(managed, configured):
+    """
+    Fills managed-only entries with their configured definition when there is one,
+    so their queries still contribute dependency edges.
+    """
+    by_name = {obj["name"].strip().upper(): obj for obj in configured if obj.get("name")}
+    return [by_name.get(obj["name"].strip().upper(), obj) for obj in managed]
+
+@fan_out
+def rollback(dry_run, confirm, async_mode=False, max_in_flight=8, managed_only=False, batch_size=1, jobs=1,
+             eager=False, window=STREAM_WINDOW, select=(), exclude=(), target=None, master_config=None):
     """
     Drop all objects defined in the configuration.
+    With managed_only, drop only the objects the state manifest records as created by this tool.
+
+    Objects are dropped in reverse dependency order (tasks and pipes before the tables
+    they touch), objects missing from a single bulk catalog listing are skipped, and
+    independent objects are dropped concurrently over up to `jobs` connections.
+    With async_mode or batch_size the DROPs go over one session, type by type in reverse order,
+    and unless eager each type's files are only read when its turn comes, while its DROPs run.
+    With select/exclude only the chosen objects are dropped (see selection.py).
 
     WARNING: This will permanently remove objects from your Snowflake environment.
     Use --dry-run to preview and --confirm to execute.
     """
-    master_path = os.path.join("config", "master_sf_objects.yaml")
     try:
-        with open(master_path, 'r') as f:
-            master_config = yaml.safe_load(f)
-        master_config = substitute_env_vars(master_config)
+        master_config = target["config"] if target else master_config or load_master_config()
     except Exception as e:
-        click.secho(f"ERR: Failed to load master configuration: {e}", fg="red")
-        return
+        output.error(f"ERR: Failed to load master configuration: {e}")
+        return False
+    try:
+        selection = target["selection"] if target else select_objects(master_config, select, exclude)
+    except ValueError as e:
+        output.error(f"ERR: {e}")
+        return False
 
     object_types = ["tables", "views", "tasks", "snowpipes"]
+    state_path = target["state_path"] if target else STATE_PATH
+    state = load_state(state_path)
+    # Without a dependency graph to build, nothing needs every definition at once.
+    streaming = (async_mode or batch_size > 1) and not (eager or managed_only or target)
     all_definitions = {}
-    for obj_type in object_types:
-        definitions = get_object_definitions(master_config, obj_type)
-        all_definitions[obj_type] = definitions
-        click.secho(f"Found {len(definitions)} {obj_type}.", fg="blue")
+    if not streaming:
+        for obj_type in object_types:
+            if target:
+                definitions = [obj for obj, _ in target["definitions"][obj_type]]
+            else:
+                definitions = get_object_definitions(master_config, obj_type, selection=selection)
+            if managed_only:
+                managed = managed_objects(state, obj_type[:-1])
+                if selection is not None:
+                    # Only managed objects among the chosen definitions.
+                    chosen = {obj["name"].strip().upper() for obj in definitions if obj.get("name")}
+                    managed = [obj for obj in managed if obj["name"].strip().upper() in chosen]
+                definitions = with_configured_queries(managed, definitions)
+            all_definitions[obj_type] = definitions
+            output.info(f"Found {len(definitions)} {obj_type}.", fg="blue")
 
     if not confirm:
-        click.secho("This command will drop all objects defined in the configuration. Use --confirm to proceed.", fg="yellow", bold=True)
+        output.warn("This command will drop all objects defined in the configuration. Use --confirm to proceed.")
         return
 
     conn = create_snowflake_connection(master_config)
     cursor = conn.cursor()
+    failed = []
+    succeeded = False
 
     try:
-        for obj_type in object_types:
-            drop_objects(cursor, all_definitions[obj_type], obj_type[:-1], dry_run)
+        catalog = CatalogSnapshot(cursor)
+        catalog.load([obj_type[:-1] for obj_type in object_types])
+        if async_mode or batch_size > 1:
+            runner = None
+            if async_mode and not dry_run:
+                runner = AsyncQueryRunner(cursor, max_in_flight)
+            elif batch_size > 1 and not dry_run:
+                # DROP ... IF EXISTS is idempotent, so a failed batch is simply re-run one by one.
+                runner = BatchExecutor(cursor, batch_size)
+            for obj_type in reversed(object_types):
+                def on_result(obj, status, obj_type=obj_type[:-1]):
+                    if status == "dropped":
+                        forget(state, obj_type, obj["name"])
+                    elif status == "failed":
+                        failed.append(obj["name"])
+
+                if streaming:
+                    definitions = (obj for obj, _ in iter_object_definitions(master_config, obj_type, window=window,
+                                                                            selection=selection))
+                else:
+                    definitions = all_definitions.pop(obj_type)
+                drop_objects(cursor, definitions, obj_type[:-1], dry_run, runner, on_result, catalog)
+                if runner:
+                    runner.wait_all()
+        else:
+            definitions = {obj_type[:-1]: all_definitions[obj_type] for obj_type in object_types}
+            nodes = reverse_graph(build_dependency_graph(definitions, catalog.database, catalog.schema))
+
+            def precheck(node):
+                # None (listing unavailable) is not evidence of absence; the DROP ... IF EXISTS settles it.
+                if catalog.exists(node["obj_type"], node["name"]) is False:
+                    output.result(node["obj_type"], node["name"], "absent",
+                                  f"[{node['obj_type'].upper()}] '{node['name']}' does not exist. Skipping.", fg="cyan")
+                    return "absent"
+                return None
+
+            def work(node_cursor, node):
+                return drop_object(node_cursor, node["definition"], node["obj_type"], dry_run, catalog)
+
+            statuses, skipped = execute_graph(master_config, conn, nodes, jobs, work, dry_run,
+                                              DROP_SUCCESS_STATUSES, precheck)
+            for node in nodes:
+                if statuses[node["index"]] == "dropped" and not dry_run:
+                    forget(state, node["obj_type"], node["name"])
+            if not report_skipped(statuses, skipped):
+                failed.append(None)
+        succeeded = not failed
     except Exception as e:
-        click.secho(f"ERR: Rollback encountered an error: {e}", fg="red")
+        output.error(f"ERR: Rollback encountered an error: {e}")
     finally:
+        if not dry_run:
+            save_state(state, state_path)
         cursor.close()
         conn.close()
-        click.secho("Rollback complete.", fg="green", bold=True)
-
-if __name__ == '__main__':
-    rollback()
+    if succeeded:
+        output.info("Rollback complete.", fg="green", bold=True)
+    else:
+        output.error("Rollback finished with failures. See the summary below.")
+    return succeeded
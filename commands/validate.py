@@ -1,114 +1,244 @@
 import os
-import yaml
-import glob
-import click
-from utils import substitute_env_vars
-
-REQUIRED_SNOWFLAKE_KEYS = ["user", "password", "account", "warehouse", "database", "schema"]
-
-def read_yaml(file_path):
-    with open(file_path, 'r') as f:
-        data = yaml.safe_load(f)
-    return substitute_env_vars(data)
-
-def load_yaml_configs(path_pattern):
-    if os.path.isdir(path_pattern):
-        files = glob.glob(os.path.join(path_pattern, '*.yaml'))
-    elif '*' in path_pattern or '?' in path_pattern:
-        files = glob.glob(path_pattern)
-    else:
-        files = [path_pattern]
-    configs = []
-    for file in files:
-        try:
-            configs.append(read_yaml(file))
-        except Exception as e:
-            click.secho(f"ERR: Failed to load YAML file {file}: {e}", fg="red")
-    return configs
+import time
+import output
+from config_loader import load_master_config, load_yaml_files, entry_pattern, resolve_files, format_load_timings, MASTER_PATH
+from catalog import split_object_name, normalize_identifier
+from sql_validator import check_queries, parser_name
+from targets import load_targets
+from snapshots import snapshot_retention
+from snowflake_connector import missing_credentials
+from selection import select_objects
 
 def validate_master_config(master_config):
     valid = True
     if "snowflake" not in master_config:
-        click.secho("ERR: 'snowflake' key is missing in master configuration.", fg="red")
+        output.error("ERR: 'snowflake' key is missing in master configuration.")
         valid = False
     else:
         creds = master_config["snowflake"]
-        for key in REQUIRED_SNOWFLAKE_KEYS:
-            if key not in creds:
-                click.secho(f"ERR: Snowflake credential '{key}' is missing.", fg="red")
+        for key in missing_credentials(creds):
+            output.error(f"ERR: Snowflake credential '{key}' is missing.")
+            valid = False
+        for key in ("login_timeout", "network_timeout"):
+            value = creds.get(key)
+            # ${env:...} values arrive as strings.
+            if value is not None and (not str(value).isdigit() or int(value) < 1):
+                output.error(f"ERR: Snowflake setting '{key}' must be a whole number of seconds, not {value!r}.")
                 valid = False
+        if creds.get("private_key_path") and not os.path.isfile(os.path.expanduser(str(creds["private_key_path"]))):
+            output.error(f"ERR: Snowflake private key {creds['private_key_path']} does not exist.")
+            valid = False
+    try:
+        load_targets(master_config)
+        snapshot_retention(master_config)
+        declared_stages(master_config)
+    except ValueError as e:
+        output.error(f"ERR: {e}")
+        valid = False
     return valid
 
-def validate_object_definitions(master_config, obj_type):
+def validate_object_definitions(master_config, obj_type, collected=None, selection=None):
+    """
+    Checks that every definition of a type has 'name' and 'query'.
+    Complete definitions are appended to `collected` as (obj, source) pairs.
+    With a selection only the selected definitions are checked, and only their files read.
+    """
     valid = True
+    only = selection.files if selection is not None else None
+
+    def check(obj, source):
+        if selection is not None and not selection.includes(obj_type, obj, source):
+            return True
+        complete = True
+        if "name" not in obj:
+            output.error(f"ERR: {obj_type} definition missing 'name': {obj}")
+            complete = False
+        if "query" not in obj:
+            output.error(f"ERR: {obj_type} definition for '{obj.get('name', 'unknown')}' missing 'query'.")
+            complete = False
+        if complete and collected is not None:
+            collected.append((obj, source))
+        return complete
+
     if obj_type not in master_config:
         return valid
     for entry in master_config[obj_type]:
         # Inline definitions
         if obj_type in entry:
             for obj in entry[obj_type]:
-                if "name" not in obj:
-                    click.secho(f"ERR: {obj_type} definition missing 'name': {obj}", fg="red")
-                    valid = False
-                if "query" not in obj:
-                    click.secho(f"ERR: {obj_type} definition for '{obj.get('name', 'unknown')}' missing 'query'.", fg="red")
+                if not check(obj, MASTER_PATH):
                     valid = False
         # File/folder/pattern reference
-        elif "file" in entry or "folder" in entry or "pattern" in entry:
-            if "file" in entry:
-                pattern = os.path.join("config", entry["file"])
-            elif "folder" in entry:
-                pattern = os.path.join("config", entry["folder"], "*.yaml")
-            elif "pattern" in entry:
-                pattern = os.path.join("config", entry["pattern"])
-            configs = load_yaml_configs(pattern)
-            if not configs:
-                click.secho(f"ERR: No YAML files loaded for {obj_type} using pattern '{pattern}'.", fg="red")
+        elif entry_pattern(entry):
+            pattern = entry_pattern(entry)
+            loaded = load_yaml_files(pattern, only=only)
+            # With a selection, files without selected definitions are not loaded on purpose.
+            if not loaded and (selection is None or not resolve_files(pattern)):
+                output.error(f"ERR: No YAML files loaded for {obj_type} using pattern '{pattern}'.")
                 valid = False
             else:
-                for cfg in configs:
-                    if obj_type not in cfg:
-                        click.secho(f"ERR: YAML file {pattern} missing key '{obj_type}'.", fg="red")
+                for file, cfg in loaded:
+                    if not cfg or obj_type not in cfg:
+                        output.error(f"ERR: YAML file {file} missing key '{obj_type}'.")
                         valid = False
                     else:
                         for obj in cfg[obj_type]:
-                            if "name" not in obj:
-                                click.secho(f"ERR: {obj_type} definition missing 'name': {obj}", fg="red")
-                                valid = False
-                            if "query" not in obj:
-                                click.secho(f"ERR: {obj_type} definition for '{obj.get('name', 'unknown')}' missing 'query'.", fg="red")
+                            if not check(obj, file):
                                 valid = False
         else:
-            click.secho(f"ERR: Unrecognized {obj_type} configuration entry: {entry}", fg="red")
+            output.error(f"ERR: Unrecognized {obj_type} configuration entry: {entry}")
             valid = False
     return valid
 
-@click.command()
-def validate():
-    """Validate master configuration and object definitions."""
-    master_path = os.path.join("config", "master_sf_objects.yaml")
+# CREATE keyword each section is expected to use.
+CREATED_KINDS = {"tables": "TABLE", "views": "VIEW", "tasks": "TASK", "snowpipes": "PIPE"}
+
+def name_parts(name):
+    return tuple(normalize_identifier(part) for part in split_object_name(name))
+
+def names_match(left, right):
+    """Compares two possibly qualified names on the parts both of them spell out."""
+    left, right = name_parts(left), name_parts(right)
+    common = min(len(left), len(right))
+    return left[-common:] == right[-common:]
+
+class DefinedObjects:
+    """Index of the objects the configuration creates, for offline reference checks."""
+
+    def __init__(self):
+        self._by_name = {}
+
+    def add(self, kind, name):
+        parts = name_parts(name)
+        self._by_name.setdefault(parts[-1], []).append((kind, parts))
+
+    def defines(self, name, kinds=None):
+        parts = name_parts(name)
+        for kind, defined in self._by_name.get(parts[-1], []):
+            common = min(len(parts), len(defined))
+            if defined[-common:] == parts[-common:] and (kinds is None or kind in kinds):
+                return True
+        return False
+
+def declared_stages(master_config):
+    """
+    The stage names listed under the master file's `stages:` section, or None without
+    one. Stages are created outside sfyaml, so only a `stages:` list makes stage
+    references checkable. Raises ValueError if the section is not a list of names.
+    """
+    stages = master_config.get("stages")
+    if stages is None:
+        return None
+    if not isinstance(stages, list) or not all(isinstance(stage, str) and stage.strip() for stage in stages):
+        raise ValueError(f"stages must be a list of stage names, not {stages!r}.")
+    return stages
+
+def validate_queries(definitions, strict=False, indexed=(), stages=None):
+    """
+    Parses every query offline and checks it against the rest of the configuration:
+    the DDL must parse, create an object of the section's kind named like its 'name',
+    and the tables referenced by views, tasks and pipes should be defined in the
+    configuration. Stage references are checked only when `stages` lists the known
+    stages. Unknown references are warnings unless strict is set.
+    `definitions` is a list of (obj_type, obj, source) tuples; `indexed` holds the
+    object index records (see selection.py) of definitions that were not loaded.
+    """
+    started = time.perf_counter()
+    results, cache_hits = check_queries([obj["query"] for _, obj, _ in definitions])
+    valid = True
+    defined = DefinedObjects()
+    for stage in stages or ():
+        defined.add("STAGE", stage)
+    for obj_type, record, _ in indexed:
+        if record["created"]:
+            defined.add(*record["created"])
+        if record["name"]:
+            defined.add(CREATED_KINDS[obj_type], record["name"])
+    for (obj_type, obj, _), result in zip(definitions, results):
+        if result["created"]:
+            defined.add(result["created"][0], result["created"][1])
+        defined.add(CREATED_KINDS[obj_type], obj["name"])
+
+    for (obj_type, obj, source), result in zip(definitions, results):
+        label = f"[{obj_type[:-1].upper()}] '{obj['name']}' ({source})"
+        fields = {"obj_type": obj_type[:-1], "name": obj["name"], "source": source}
+        for error in result["errors"]:
+            output.error(f"ERR: {label}: {error.rstrip('.')}.", **fields)
+            valid = False
+        created = result["created"]
+        if created and created[0] != CREATED_KINDS[obj_type]:
+            output.error(f"ERR: {label}: creates a {created[0]}, expected a {CREATED_KINDS[obj_type]}.", **fields)
+            valid = False
+        elif created and not names_match(obj["name"], created[1]):
+            output.error(f"ERR: {label}: name does not match the created object '{created[1]}'.", **fields)
+            valid = False
+        if obj_type == "tables":
+            continue
+        for kind, name in result["references"]:
+            if kind == "stage":
+                known = defined.defines(name, ("STAGE",))
+                if not known and stages is None:
+                    output.debug(f"{label}: stage '{name}' not checked; list it under stages: to check it.")
+                    continue
+            else:
+                known = defined.defines(name, ("TABLE", "VIEW", "TASK", "PIPE"))
+            if known:
+                continue
+            message = f"{label}: references {kind} '{name}', which is not defined in the configuration."
+            if strict:
+                output.error(f"ERR: {message}", **fields)
+                valid = False
+            else:
+                output.warn(f"WARN: {message}", **fields)
+    output.info(
+        f"Checked {len(definitions)} queries with the {parser_name()} parser "
+        f"({cache_hits} from cache) in {time.perf_counter() - started:.2f}s.",
+        fg="blue"
+    )
+    return valid
+
+def validate(show_timings=False, strict=False, select=(), exclude=()):
+    """
+    Validate master configuration and object definitions (with select/exclude, only
+    the chosen ones). Returns True if everything is valid.
+    """
     try:
-        with open(master_path, 'r') as f:
-            master_config = yaml.safe_load(f)
-        master_config = substitute_env_vars(master_config)
+        master_config = load_master_config()
     except Exception as e:
-        click.secho(f"ERR: Failed to load master configuration: {e}", fg="red")
-        return
+        output.error(f"ERR: Failed to load master configuration: {e}")
+        return False
+    try:
+        selection = select_objects(master_config, select, exclude)
+    except ValueError as e:
+        output.error(f"ERR: {e}")
+        return False
 
     valid = True
-    click.secho("Validating master configuration...", fg="blue", bold=True)
+    output.info("Validating master configuration...", fg="blue", bold=True)
     if not validate_master_config(master_config):
         valid = False
 
+    definitions = []
     for obj_type in ["tables", "views", "tasks", "snowpipes"]:
-        click.secho(f"Validating {obj_type} definitions...", fg="blue")
-        if not validate_object_definitions(master_config, obj_type):
+        output.info(f"Validating {obj_type} definitions...", fg="blue")
+        collected = []
+        if not validate_object_definitions(master_config, obj_type, collected, selection):
             valid = False
+        definitions.extend((obj_type, obj, source) for obj, source in collected)
+
+    output.info("Validating queries...", fg="blue")
+    try:
+        stages = declared_stages(master_config)
+    except ValueError:
+        # Reported by validate_master_config.
+        stages = None
+    if not validate_queries(definitions, strict, selection.records if selection is not None else (), stages):
+        valid = False
 
     if valid:
-        click.secho("Validation passed. All configurations are valid.", fg="green", bold=True)
+        output.info("Validation passed. All configurations are valid.", fg="green", bold=True)
     else:
-        click.secho("Validation failed. Please review the errors above.", fg="red", bold=True)
-
-if __name__ == '__main__':
-    validate()
+        output.error("Validation failed. Please review the errors above.")
+    if show_timings:
+        output.info(format_load_timings(), fg="blue")
+    return valid
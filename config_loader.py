@@ -0,0 +1,442 @@
+import os
+import re
+import glob
+import json
+import time
+import pickle
+import atexit
+import hashlib
+from collections import deque
+import yaml
+import output
+import tracing
+from utils import substitute_env_vars
+
+MASTER_PATH = os.path.join("config", "master_sf_objects.yaml")
+CACHE_DIR = os.path.join(".sfyaml", "cache")
+# The index holds only each file's mtime, size and env fingerprint; parsed data is kept
+# in one pickle per file under DATA_DIR and read when that file is asked for.
+CACHE_PATH = os.path.join(CACHE_DIR, "yaml.json")
+DATA_DIR = os.path.join(CACHE_DIR, "yaml")
+CACHE_VERSION = 2
+# Version 1 kept every file's data in one pickle, loaded whole before anything was read.
+LEGACY_CACHE_PATH = os.path.join(CACHE_DIR, "yaml.pickle")
+
+# libyaml's C loader is several times faster than the pure-Python one when available.
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Below this many files to parse, a process pool costs more to start than it saves.
+PARALLEL_PARSE_THRESHOLD = 64
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Files parsed ahead of the definition being executed when definitions are streamed.
+STREAM_WINDOW = 16
+
+ENV_REFERENCE = re.compile(r"\${env:([^}]+)}")
+
+LOAD_TIMINGS = {
+    "files": 0,
+    "cache_hits": 0,
+    "read_seconds": 0.0,
+    "parse_seconds": 0.0,
+    "substitute_seconds": 0.0,
+    "cache_seconds": 0.0
+}
+
+_cache = None
+_cache_dirty = False
+_parse_pool = None
+
+class _CacheUnpickler(pickle.Unpickler):
+    """Only allows the types yaml.safe_load can produce besides builtins."""
+    ALLOWED = {
+        ("datetime", "datetime"),
+        ("datetime", "date"),
+        ("datetime", "timedelta"),
+        ("datetime", "timezone"),
+        ("builtins", "set")
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"Unexpected type in YAML cache: {module}.{name}")
+        return super().find_class(module, name)
+
+def _load_cache():
+    """The cache index: absolute path -> mtime, size and env fingerprint of its cached data."""
+    global _cache
+    if _cache is not None:
+        return _cache
+    started = time.perf_counter()
+    _cache = {}
+    try:
+        with open(CACHE_PATH, "r") as f:
+            cached = json.load(f)
+        if cached.get("version") == CACHE_VERSION:
+            _cache = cached["files"]
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        output.warn(f"WARN: Ignoring unreadable YAML cache {CACHE_PATH}: {e}")
+    LOAD_TIMINGS["cache_seconds"] += time.perf_counter() - started
+    return _cache
+
+def save_cache():
+    """Writes the cache index if anything changed. Registered to run at exit."""
+    global _cache_dirty
+    if not _cache_dirty:
+        return
+    started = time.perf_counter()
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        tmp_path = CACHE_PATH + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": CACHE_VERSION, "files": _cache}, f)
+        os.replace(tmp_path, CACHE_PATH)
+        _cache_dirty = False
+        if os.path.exists(LEGACY_CACHE_PATH):
+            os.remove(LEGACY_CACHE_PATH)
+    except Exception as e:
+        output.warn(f"WARN: Failed to write YAML cache {CACHE_PATH}: {e}")
+    LOAD_TIMINGS["cache_seconds"] += time.perf_counter() - started
+
+atexit.register(save_cache)
+
+def env_fingerprint(names):
+    """A hash of the values of the given environment variables."""
+    values = {name: os.environ.get(name) for name in names}
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _data_path(abs_path):
+    return os.path.join(DATA_DIR, hashlib.sha256(abs_path.encode("utf-8")).hexdigest() + ".pickle")
+
+def _fresh_entry(file_path):
+    """The index entry of a file unchanged since it was cached, or None. Reads no data."""
+    entry = _load_cache().get(os.path.abspath(file_path))
+    if not entry:
+        return None
+    stat = os.stat(file_path)
+    if (entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size
+            or entry["env"] != env_fingerprint(entry["env_names"])):
+        return None
+    return entry
+
+def _cached_entry(file_path):
+    """
+    Returns {"data": ...} for an unchanged file, read from its own pickle, or None on a
+    cache miss. Only this file's data is loaded.
+    """
+    abs_path = os.path.abspath(file_path)
+    entry = _fresh_entry(file_path)
+    if not entry:
+        return None
+    started = time.perf_counter()
+    try:
+        with open(_data_path(abs_path), "rb") as f:
+            cached = _CacheUnpickler(f).load()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        output.warn(f"WARN: Ignoring unreadable YAML cache entry for {file_path}: {e}")
+        return None
+    finally:
+        LOAD_TIMINGS["cache_seconds"] += time.perf_counter() - started
+    # Another process may have rewritten the pickle for a newer version of the file.
+    if (cached.get("mtime"), cached.get("size"), cached.get("env")) != (entry["mtime"], entry["size"], entry["env"]):
+        return None
+    return cached
+
+def _write_entry(abs_path, entry, data):
+    """Writes one file's parsed data to its own pickle. Returns False if it could not be written."""
+    started = time.perf_counter()
+    try:
+        # Entries hold env-substituted values, so keep the cache private to the user.
+        os.makedirs(DATA_DIR, mode=0o700, exist_ok=True)
+        path = _data_path(abs_path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(dict(entry, data=data), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        output.warn(f"WARN: Failed to write YAML cache entry for {abs_path}: {e}")
+        return False
+    finally:
+        LOAD_TIMINGS["cache_seconds"] += time.perf_counter() - started
+
+def _parse_file(file_path):
+    """
+    Reads, parses and env-substitutes one file. Returns (data, env_names, stat, timings)
+    where timings is (start time, read, parse and substitution seconds, process id).
+    Runs in worker processes too, so it only touches its arguments and the environment.
+    """
+    stat = os.stat(file_path)
+    wall_started = time.time()
+    started = time.perf_counter()
+    with open(file_path, "r") as f:
+        text = f.read()
+    parsing = time.perf_counter()
+    data = yaml.load(text, Loader=YamlLoader)
+    substituting = time.perf_counter()
+    data = substitute_env_vars(data)
+    finished = time.perf_counter()
+    timings = (wall_started, parsing - started, substituting - parsing, finished - substituting, os.getpid())
+    env_names = sorted(set(ENV_REFERENCE.findall(text)))
+    return data, env_names, (stat.st_mtime_ns, stat.st_size), timings
+
+def _store_parsed(file_path, parsed, use_cache=True):
+    global _cache_dirty
+    data, env_names, (mtime, size), (started, read_seconds, parse_seconds, substitute_seconds, pid) = parsed
+    tracing.record("read", "yaml", started, read_seconds, source=file_path, pid=pid)
+    tracing.record("parse", "yaml", started + read_seconds, parse_seconds, source=file_path, pid=pid)
+    tracing.record("substitute_env", "yaml", started + read_seconds + parse_seconds, substitute_seconds,
+                   source=file_path, pid=pid)
+    LOAD_TIMINGS["read_seconds"] += read_seconds
+    LOAD_TIMINGS["parse_seconds"] += parse_seconds
+    LOAD_TIMINGS["substitute_seconds"] += substitute_seconds
+    if use_cache:
+        # The data goes straight to disk; only the metadata stays in memory.
+        abs_path = os.path.abspath(file_path)
+        entry = {"mtime": mtime, "size": size, "env_names": env_names, "env": env_fingerprint(env_names)}
+        if _write_entry(abs_path, entry, data):
+            _load_cache()[abs_path] = entry
+        else:
+            _load_cache().pop(abs_path, None)
+        _cache_dirty = True
+    return data
+
+def read_yaml(file_path, use_cache=True):
+    """
+    Parses a YAML file and substitutes ${env:VAR} references.
+
+    Results are cached on disk keyed by path, mtime and size, together with a
+    fingerprint of the environment variables the file references, so an unchanged
+    file is never re-parsed. Pass use_cache=False for files holding credentials.
+    """
+    LOAD_TIMINGS["files"] += 1
+    if use_cache:
+        entry = _cached_entry(file_path)
+        if entry:
+            LOAD_TIMINGS["cache_hits"] += 1
+            return entry["data"]
+    return _store_parsed(file_path, _parse_file(file_path), use_cache)
+
+def load_master_config(master_path=MASTER_PATH):
+    """Loads the master configuration. It holds credentials, so it is never cached on disk."""
+    with tracing.span("load_master_config", "config", source=master_path):
+        return read_yaml(master_path, use_cache=False)
+
+def resolve_files(path_pattern):
+    """Expands a file, directory, or glob pattern into a sorted list of files."""
+    if os.path.isdir(path_pattern):
+        return sorted(glob.glob(os.path.join(path_pattern, '*.yaml')))
+    if '*' in path_pattern or '?' in path_pattern:
+        return sorted(glob.glob(path_pattern))
+    return [path_pattern]
+
+def _parse_file_safely(file_path):
+    try:
+        return True, _parse_file(file_path)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+def _get_parse_pool():
+    global _parse_pool
+    if _parse_pool is None:
+        # Imported here: loading multiprocessing costs more than a small config takes to parse.
+        from concurrent.futures import ProcessPoolExecutor
+        _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        atexit.register(_parse_pool.shutdown)
+    return _parse_pool
+
+def load_yaml_files(path_pattern, strict=False, only=None):
+    """
+    Accepts a file, directory, or glob pattern and returns a list of (file, configuration) pairs.
+    Files that fail to load are reported and skipped, or re-raised if strict is set.
+    With `only`, a set of paths, the pattern's other files are left alone.
+
+    When more than PARALLEL_PARSE_THRESHOLD files need parsing (cache misses), they are
+    parsed in a process pool. Results and errors are still reported in file order, and
+    the definitions are identical to the serial path.
+    """
+    with tracing.span("load_yaml_files", "config", pattern=path_pattern) as span:
+        loaded = _load_yaml_files(path_pattern, strict, only)
+        span["files"] = len(loaded)
+        return loaded
+
+def _load_yaml_files(path_pattern, strict, only):
+    files = [file for file in resolve_files(path_pattern) if only is None or file in only]
+    results = {}
+    misses = []
+    for file in files:
+        LOAD_TIMINGS["files"] += 1
+        try:
+            entry = _cached_entry(file)
+        except Exception:
+            entry = None
+        if entry:
+            LOAD_TIMINGS["cache_hits"] += 1
+            results[file] = (True, entry["data"])
+        else:
+            misses.append(file)
+
+    if len(misses) > PARALLEL_PARSE_THRESHOLD and PARSE_WORKERS > 1:
+        chunksize = max(1, len(misses) // (PARSE_WORKERS * 4))
+        parsed = _get_parse_pool().map(_parse_file_safely, misses, chunksize=chunksize)
+    else:
+        parsed = map(_parse_file_safely, misses)
+    for file, (ok, outcome) in zip(misses, parsed):
+        results[file] = (True, _store_parsed(file, outcome)) if ok else (False, outcome)
+
+    loaded = []
+    for file in files:
+        ok, outcome = results[file]
+        if ok:
+            loaded.append((file, outcome))
+            continue
+        output.error(f"ERR: Failed to load YAML file {file}: {outcome}")
+        if strict:
+            raise ValueError(f"Failed to load YAML file {file}: {outcome}")
+    return loaded
+
+def iter_yaml_files(path_pattern, strict=False, window=STREAM_WINDOW, only=None):
+    """
+    Like load_yaml_files, but yields each (file, configuration) pair as soon as that
+    file is loaded instead of returning them all at the end. With the process pool at
+    most `window` files are parsed ahead of the consumer; without it each file is only
+    parsed when the consumer asks for it. Cached files are also read one at a time, as
+    the consumer reaches them, so memory follows the window and not the configuration.
+    """
+    with tracing.span("iter_yaml_files", "config", pattern=path_pattern) as span:
+        files = [file for file in resolve_files(path_pattern) if only is None or file in only]
+        span["files"] = len(files)
+        fresh = set()
+        misses = []
+        for file in files:
+            LOAD_TIMINGS["files"] += 1
+            try:
+                entry = _fresh_entry(file)
+            except Exception:
+                entry = None
+            if entry:
+                fresh.add(file)
+            else:
+                misses.append(file)
+    pool = _get_parse_pool() if len(misses) > PARALLEL_PARSE_THRESHOLD and PARSE_WORKERS > 1 else None
+    upcoming = iter(misses)
+    parsing = deque()
+
+    for file in files:
+        entry = None
+        if file in fresh:
+            try:
+                entry = _cached_entry(file)
+            except Exception:
+                entry = None
+        if entry:
+            LOAD_TIMINGS["cache_hits"] += 1
+            ok, outcome = True, entry["data"]
+        elif file in fresh:
+            # Its pickle went missing since the index was checked; parse it here.
+            ok, outcome = _parse_file_safely(file)
+            if ok:
+                outcome = _store_parsed(file, outcome)
+        else:
+            if pool is not None:
+                # Keep the pool busy with the next misses, but never more than `window` ahead.
+                while len(parsing) < max(1, window):
+                    miss = next(upcoming, None)
+                    if miss is None:
+                        break
+                    parsing.append(pool.submit(_parse_file_safely, miss))
+                ok, outcome = parsing.popleft().result()
+            else:
+                ok, outcome = _parse_file_safely(file)
+            if ok:
+                outcome = _store_parsed(file, outcome)
+        if ok:
+            yield file, outcome
+            continue
+        output.error(f"ERR: Failed to load YAML file {file}: {outcome}")
+        if strict:
+            raise ValueError(f"Failed to load YAML file {file}: {outcome}")
+
+def load_yaml_configs(path_pattern, strict=False):
+    """
+    Accepts a file, directory, or glob pattern and returns a list of YAML configurations.
+    """
+    return [config for _, config in load_yaml_files(path_pattern, strict)]
+
+def entry_pattern(entry):
+    """Returns the path pattern of a file/folder/pattern entry, or None for inline entries."""
+    if "file" in entry:
+        return os.path.join("config", entry["file"])
+    if "folder" in entry:
+        return os.path.join("config", entry["folder"], "*.yaml")
+    if "pattern" in entry:
+        return os.path.join("config", entry["pattern"])
+    return None
+
+def get_object_definitions(master_config, obj_type, with_sources=False, strict=False, selection=None, only=None):
+    """
+    Processes one section (e.g., tables, views, tasks, snowpipes) from the master YAML.
+    Each entry can specify a file, folder, pattern or inline definitions.
+    Returns a list of object definitions (each must contain 'name' and 'query'),
+    or of (definition, source file) pairs if with_sources is set.
+    With a selection (see selection.py) only the files defining selected objects are
+    loaded, and only the selected definitions returned. With `only`, a set of paths,
+    the entries' other files are not read (inline definitions are always returned).
+    """
+    if selection is not None:
+        only = selection.files
+    definitions = _definitions(master_config, obj_type, lambda pattern: load_yaml_files(pattern, strict, only),
+                               selection)
+    if with_sources:
+        return list(definitions)
+    return [obj for obj, _ in definitions]
+
+def iter_object_definitions(master_config, obj_type, strict=False, window=STREAM_WINDOW, selection=None):
+    """
+    Yields the (definition, source file) pairs get_object_definitions returns, loading
+    each file only as the definitions before it are consumed (see iter_yaml_files).
+    """
+    only = selection.files if selection is not None else None
+    return _definitions(master_config, obj_type, lambda pattern: iter_yaml_files(pattern, strict, window, only),
+                        selection)
+
+def _definitions(master_config, obj_type, load, selection=None):
+    for entry in master_config.get(obj_type) or []:
+        pattern = entry_pattern(entry)
+        if pattern:
+            for file, config in load(pattern):
+                if config and obj_type in config:
+                    for obj in config[obj_type]:
+                        if selection is not None and not selection.includes(obj_type, obj, file):
+                            continue
+                        tracing.register_source(obj, file)
+                        yield obj, file
+                else:
+                    output.warn(f"Warning: No '{obj_type}' key found in file {file}.")
+        elif obj_type in entry:
+            # Inline definitions provided directly in master YAML.
+            for obj in entry[obj_type]:
+                if selection is not None and not selection.includes(obj_type, obj, MASTER_PATH):
+                    continue
+                tracing.register_source(obj, MASTER_PATH)
+                yield obj, MASTER_PATH
+        else:
+            output.error(f"Error: Unrecognized {obj_type} configuration: {entry}")
+
+def get_load_timings():
+    """Returns a copy of the counters and timings collected while loading YAML."""
+    return dict(LOAD_TIMINGS)
+
+def format_load_timings():
+    timings = get_load_timings()
+    return (
+        f"YAML: {timings['files']} files ({timings['cache_hits']} from cache), "
+        f"read {timings['read_seconds']:.3f}s, parse {timings['parse_seconds']:.3f}s, "
+        f"env substitution {timings['substitute_seconds']:.3f}s, cache I/O {timings['cache_seconds']:.3f}s"
+    )
@@ -0,0 +1,271 @@
+import io
+import os
+import sys
+import json
+import signal
+import socket
+import threading
+import socketserver
+from contextlib import contextmanager, redirect_stdout, redirect_stderr
+import click
+import output
+import snowflake_connector
+from snowflake_connector import connect_snowflake, connection_settings
+
+SOCKET_PATH = os.path.join(".sfyaml", "sfyaml.sock")
+HEARTBEAT_SECONDS = 300
+
+def socket_path(path=None):
+    return os.path.abspath(path or os.environ.get("SFYAML_SOCKET") or SOCKET_PATH)
+
+def _run_command(command, params):
+    """Runs a forwarded command and returns its result (False if it failed)."""
+    # Imported here so the daemon module does not pull in every command at import time.
+    if command == "apply":
+        from commands.create import create_snowflake_objects
+        return create_snowflake_objects(**params)
+    elif command == "plan":
+        from commands.plan import make_plan
+        return make_plan(**params)
+    elif command == "apply_plan":
+        from commands.plan import apply_plan
+        return apply_plan(**params)
+    elif command == "diff":
+        from commands.diff import diff
+        return diff(**params)
+    elif command == "rollback":
+        from commands.rollback import rollback
+        return rollback(**params)
+    elif command == "restore":
+        from commands.restore import restore
+        return restore(**params)
+    elif command == "check":
+        from commands.check import check_connectivity
+        return check_connectivity(**params)
+    elif command == "validate":
+        from commands.validate import validate
+        return validate(**params)
+    else:
+        raise ValueError(f"Unsupported command: {command}")
+
+@contextmanager
+def _client_environment(env):
+    """
+    Runs a request with the client's environment variables, so ${env:...} values, the
+    SF_* fallbacks and the parse cache's fingerprints are the client's, not the daemon's.
+    """
+    saved = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+class _WarmConnection:
+    """Hands out a daemon-owned connection; close() returns it to the daemon instead of logging out."""
+
+    def __init__(self, daemon, conn):
+        self._daemon = daemon
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        self._daemon.release(self._conn)
+
+class Daemon:
+    """
+    Keeps Snowflake connections logged in between commands and runs the commands
+    forwarded by the CLI, one at a time, in this process.
+    """
+
+    def __init__(self, master_config, connections=1):
+        self.master_config = master_config
+        # Taken once: requests run with the client's environment, which the SF_* fallbacks read.
+        self.settings = connection_settings(master_config)
+        self.connections = max(1, connections)
+        self.cwd = os.getcwd()
+        self._idle = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def warm_up(self):
+        for _ in range(self.connections):
+            self._idle.append(connect_snowflake({"snowflake": self.settings}))
+
+    def _healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, config=None):
+        """Connection factory installed while serving: reuses a healthy warm connection."""
+        if connection_settings(config) != self.settings:
+            # Another target's database or schema, or other credentials: the warm connections are not for it.
+            return connect_snowflake(config)
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                return _WarmConnection(self, connect_snowflake({"snowflake": self.settings}))
+            if self._healthy(conn):
+                return _WarmConnection(self, conn)
+            click.secho("WARN: Dropping a stale warm connection.", fg="yellow")
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.connections:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def heartbeat(self):
+        """Periodically checks idle connections so they stay logged in and replaces dead ones."""
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            with self._lock:
+                idle, self._idle = self._idle, []
+            alive = [conn for conn in idle if self._healthy(conn)]
+            while len(alive) < len(idle):
+                try:
+                    alive.append(connect_snowflake({"snowflake": self.settings}))
+                except Exception as e:
+                    click.secho(f"WARN: Reconnecting warm connection failed: {e}", fg="yellow")
+                    break
+            with self._lock:
+                self._idle.extend(alive)
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+class _StreamWriter(io.TextIOBase):
+    """File-like object that streams everything written to it back to the client."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            self.wfile.write((json.dumps({"output": text}) + "\n").encode("utf-8"))
+            self.wfile.flush()
+        return len(text)
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon = self.server.daemon
+        try:
+            request = json.loads(self.rfile.readline())
+        except Exception as e:
+            self._reply({"error": f"Invalid request: {e}"})
+            return
+        if request.get("cwd") != daemon.cwd:
+            self._reply({"error": f"Daemon serves {daemon.cwd}, not {request.get('cwd')}."})
+            return
+        if request.get("command") == "ping":
+            self._reply({"exit": 0})
+            return
+        if not isinstance(request.get("env"), dict):
+            self._reply({"error": "The request does not carry the client's environment."})
+            return
+        writer = _StreamWriter(self.wfile)
+        exit_code = 0
+        # Colors follow the client's terminal, not the daemon's.
+        with click.Context(click.Command("serve"), color=request.get("color")):
+            with redirect_stdout(writer), redirect_stderr(writer), _client_environment(request["env"]):
+                output.configure(**(request.get("log") or {}))
+                try:
+                    if _run_command(request.get("command"), request.get("params") or {}) is False:
+                        exit_code = 1
+                except Exception as e:
+                    output.error(f"ERR: {e}")
+                    exit_code = 1
+                finally:
+                    output.finish()
+        self._reply({"exit": exit_code})
+
+    def _reply(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+
+def serve(master_config, path=None, connections=1):
+    """Runs the daemon on a Unix socket until interrupted."""
+    path = socket_path(path)
+    if os.path.exists(path):
+        if forward("ping", {}, path) is not None:
+            raise click.ClickException(f"A daemon is already listening on {path}.")
+        os.remove(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    daemon = Daemon(master_config, connections)
+    daemon.warm_up()
+    snowflake_connector.set_connection_factory(daemon.acquire)
+    threading.Thread(target=daemon.heartbeat, daemon=True).start()
+
+    # Created owner-only: the socket runs commands with the daemon's credentials.
+    umask = os.umask(0o177)
+    try:
+        server = socketserver.UnixStreamServer(path, _RequestHandler)
+    finally:
+        os.umask(umask)
+    server.daemon = daemon
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # Requests swap the sink and write it to their client; nothing of the daemon's own may be left in it.
+    output.flush()
+    click.secho(f"Serving on {path} with {daemon.connections} warm connection(s). Press Ctrl+C to stop.", fg="green", bold=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        snowflake_connector.set_connection_factory(None)
+        daemon.close()
+        if os.path.exists(path):
+            os.remove(path)
+        click.secho("Daemon stopped.", fg="blue")
+
+def forward(command, params, path=None):
+    """
+    Sends a command to a running daemon and streams its output.
+    Returns the command's exit code, or None if no daemon serves this directory.
+    """
+    path = socket_path(path)
+    if not os.path.exists(path):
+        return None
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+    except OSError:
+        return None
+    request = {"command": command, "params": params, "cwd": os.getcwd(), "color": click.get_text_stream("stdout").isatty(),
+               "log": output.settings(), "env": dict(os.environ)}
+    with sock, sock.makefile("rwb") as stream:
+        stream.write((json.dumps(request) + "\n").encode("utf-8"))
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if "output" in message:
+                click.echo(message["output"], nl=False, color=request["color"])
+            elif "error" in message:
+                output.warn(f"WARN: Daemon refused the command: {message['error']} Running locally.")
+                return None
+            elif "exit" in message:
+                return message["exit"]
+    return None
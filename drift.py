@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import atexit
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+import output
+import tracing
+from catalog import normalize_identifier, quote_identifier, qualify_name, show_all
+from engine import ConnectionPool
+from object_creator import extract_created_object
+from sql_validator import scan_sql
+
+CACHE_PATH = os.path.join(".sfyaml", "cache", "ddl.json")
+CACHE_VERSION = 1
+
+# GET_DDL object type for every object type the tool manages.
+DDL_TYPES = {
+    "table": "TABLE",
+    "view": "VIEW",
+    "task": "TASK",
+    "snowpipe": "PIPE"
+}
+
+# With auto fetching, a schema with more DDL to fetch than this is fetched with one
+# schema-level GET_DDL instead of one GET_DDL per object.
+SCHEMA_DDL_THRESHOLD = 20
+
+# Spellings Snowflake stores differently from how they are usually written.
+TYPE_ALIASES = {
+    "INT": "NUMBER", "INTEGER": "NUMBER", "BIGINT": "NUMBER", "SMALLINT": "NUMBER", "TINYINT": "NUMBER",
+    "BYTEINT": "NUMBER", "DECIMAL": "NUMBER", "NUMERIC": "NUMBER",
+    "STRING": "VARCHAR", "TEXT": "VARCHAR",
+    "DOUBLE": "FLOAT", "REAL": "FLOAT", "FLOAT4": "FLOAT", "FLOAT8": "FLOAT",
+    "DATETIME": "TIMESTAMP_NTZ", "TIMESTAMP": "TIMESTAMP_NTZ"
+}
+# Type parameters that are the default, e.g. VARCHAR(16777216) as GET_DDL prints a plain VARCHAR.
+DEFAULT_TYPE_PARAMETERS = {
+    "VARCHAR": ["16777216"],
+    "NUMBER": ["38", ",", "0"]
+}
+
+TOKEN_PATTERN = re.compile(
+    r"--[^\n]*|//[^\n]*|/\*.*?\*/|\$\$.*?\$\$|'(?:[^'\\]|\\.|'')*'|\"(?:[^\"]|\"\")*\"|[\w$]+|\S",
+    re.DOTALL
+)
+
+_cache = None
+_cache_dirty = False
+
+def _tokens(query):
+    """Splits a query into tokens without comments; words are upper-cased, literals kept."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(query or ""):
+        if token.startswith(("--", "//", "/*")):
+            continue
+        if token.startswith('"'):
+            identifier = normalize_identifier(token)
+            # "EMPLOYEE" and EMPLOYEE are the same identifier.
+            tokens.append(identifier if re.fullmatch(r"[A-Z_][A-Z0-9_$]*", identifier) else quote_identifier(identifier))
+        elif token.startswith(("'", "$$")):
+            tokens.append(token)
+        else:
+            tokens.append(token.upper())
+    return tokens
+
+def normalize_ddl(query):
+    """
+    Normalizes a CREATE statement so a configured query and the DDL Snowflake returns
+    for it compare equal when they define the same object: comments, whitespace, case,
+    OR REPLACE / IF NOT EXISTS, the name's database and schema qualifiers, type
+    aliases and default type parameters are ignored.
+    """
+    tokens = _tokens(query)
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    normalized = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if tokens[i:i + 2] == ["OR", "REPLACE"] and normalized[-1:] == ["CREATE"]:
+            i += 2
+            continue
+        if tokens[i:i + 3] == ["IF", "NOT", "EXISTS"]:
+            i += 3
+            continue
+        if token in ("TABLE", "VIEW", "TASK", "PIPE") and "AS" not in normalized and len(normalized) <= 4 \
+                and normalized[:1] == ["CREATE"]:
+            # Keep only the last part of the created object's name.
+            normalized.append(token)
+            i += 1
+            name_end = i + 1
+            while tokens[name_end:name_end + 1] == ["."] and name_end + 1 < len(tokens):
+                name_end += 2
+            if name_end - 1 < len(tokens):
+                normalized.append(tokens[name_end - 1])
+            i = name_end
+            continue
+        token = TYPE_ALIASES.get(token, token) if normalized and normalized[-1] not in (".", "=") else token
+        if token in DEFAULT_TYPE_PARAMETERS and tokens[i + 1:i + 2] == ["("]:
+            parameters = DEFAULT_TYPE_PARAMETERS[token]
+            if tokens[i + 2:i + 2 + len(parameters)] == parameters and tokens[i + 2 + len(parameters):i + 3 + len(parameters)] == [")"]:
+                normalized.append(token)
+                i += 3 + len(parameters)
+                continue
+        normalized.append(token)
+        i += 1
+    return " ".join(normalized)
+
+def object_key(obj_type, database, schema, name):
+    return f"{obj_type}:{database}.{schema}.{name}"
+
+def _load_cache():
+    global _cache
+    if _cache is not None:
+        return _cache
+    _cache = {}
+    try:
+        with open(CACHE_PATH, "r") as f:
+            cached = json.load(f)
+        if cached.get("version") == CACHE_VERSION:
+            _cache = cached["objects"]
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        output.warn(f"WARN: Ignoring unreadable DDL cache {CACHE_PATH}: {e}")
+    return _cache
+
+def save_cache():
+    """Writes the DDL cache if anything changed. Registered to run at exit."""
+    global _cache_dirty
+    if not _cache_dirty:
+        return
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), mode=0o700, exist_ok=True)
+        tmp_path = CACHE_PATH + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "objects": _cache}, f)
+        os.replace(tmp_path, CACHE_PATH)
+        _cache_dirty = False
+    except Exception as e:
+        output.warn(f"WARN: Failed to write DDL cache {CACHE_PATH}: {e}")
+
+atexit.register(save_cache)
+
+def _store(key, altered, ddl):
+    global _cache_dirty
+    _load_cache()[key] = {"altered": altered, "ddl": ddl}
+    _cache_dirty = True
+
+def _rows(cursor):
+    columns = [col[0].lower() for col in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def live_objects(cursor, database, schema):
+    """
+    Lists the tables, views, tasks and pipes of a schema with their last change time,
+    in three queries (more for schemas past SHOW_PAGE_SIZE tasks or pipes). Returns {(obj_type, database, schema, name): last altered}.
+    """
+    objects = {}
+    scope = f"{quote_identifier(database)}.{quote_identifier(schema)}"
+    with tracing.span("list objects", "drift", schema=f"{database}.{schema}"):
+        literal = schema.replace("'", "''")
+        cursor.execute(
+            f"SELECT TABLE_NAME, TABLE_TYPE, LAST_ALTERED FROM {quote_identifier(database)}.INFORMATION_SCHEMA.TABLES "
+            f"WHERE TABLE_SCHEMA = '{literal}'"
+        )
+        for row in _rows(cursor):
+            obj_type = "view" if row["table_type"] == "VIEW" else "table"
+            objects[(obj_type, database, schema, row["table_name"])] = str(row["last_altered"])
+        for row in show_all(cursor, f"SHOW TASKS IN SCHEMA {scope}")[0]:
+            altered = row.get("last_committed_on") or row["created_on"]
+            objects[("task", database, schema, row["name"])] = str(altered)
+        for row in show_all(cursor, f"SHOW PIPES IN SCHEMA {scope}")[0]:
+            # A pipe's COPY statement cannot be altered, only replaced.
+            objects[("snowpipe", database, schema, row["name"])] = str(row["created_on"])
+    return objects
+
+def _object_ddl(cursor, obj_type, database, schema, name):
+    qualified = f"{quote_identifier(database)}.{quote_identifier(schema)}.{quote_identifier(name)}".replace("'", "''")
+    with tracing.span("get_ddl", "drift", obj_type=obj_type, name=name) as span:
+        cursor.execute(f"SELECT GET_DDL('{DDL_TYPES[obj_type]}', '{qualified}')")
+        span["query_id"] = cursor.sfqid
+        return cursor.fetchone()[0]
+
+def _schema_ddl(cursor, database, schema):
+    """Fetches the DDL of a whole schema in one query and splits it by created object."""
+    qualified = f"{quote_identifier(database)}.{quote_identifier(schema)}".replace("'", "''")
+    with tracing.span("get_ddl schema", "drift", schema=f"{database}.{schema}") as span:
+        cursor.execute(f"SELECT GET_DDL('SCHEMA', '{qualified}')")
+        span["query_id"] = cursor.sfqid
+        ddl = cursor.fetchone()[0]
+    kinds = {kind: obj_type for obj_type, kind in DDL_TYPES.items()}
+    found = {}
+    for statement in scan_sql(ddl)[1]:
+        created = extract_created_object(statement)
+        if created and created[0] in kinds:
+            found[(kinds[created[0]],) + qualify_name(created[1], database, schema)] = statement.strip() + ";"
+    return found
+
+def fetch_live_ddl(master_config, conn, objects, jobs=1, mode="auto"):
+    """
+    Returns {(obj_type, database, schema, name): DDL} for the given live objects, a
+    mapping of object to last altered time as live_objects returns it. DDL fetched
+    before for the same last altered time comes from the cache; the rest is fetched
+    with one GET_DDL per object over up to `jobs` connections, or with one
+    schema-level GET_DDL per schema (mode 'schema', or 'auto' above
+    SCHEMA_DDL_THRESHOLD objects in a schema). Returns (ddl, cache hits).
+    """
+    cache = _load_cache()
+    ddl = {}
+    misses = {}
+    for obj, altered in objects.items():
+        entry = cache.get(object_key(*obj))
+        if entry and entry["altered"] == altered:
+            ddl[obj] = entry["ddl"]
+        else:
+            misses.setdefault((obj[1], obj[2]), []).append(obj)
+    cache_hits = len(ddl)
+
+    per_object = []
+    cursor = conn.cursor()
+    try:
+        for (database, schema), missing in misses.items():
+            if mode == "schema" or (mode == "auto" and len(missing) > SCHEMA_DDL_THRESHOLD):
+                for obj, statement in _schema_ddl(cursor, database, schema).items():
+                    if obj in objects:
+                        _store(object_key(*obj), objects[obj], statement)
+                        ddl[obj] = statement
+                # Anything the schema DDL did not cover is still fetched on its own.
+                per_object.extend(obj for obj in missing if obj not in ddl)
+            else:
+                per_object.extend(missing)
+    finally:
+        cursor.close()
+
+    pool = ConnectionPool(master_config, jobs, [conn])
+
+    def fetch(obj):
+        with pool.connection() as pooled:
+            pooled_cursor = pooled.cursor()
+            try:
+                return obj, _object_ddl(pooled_cursor, *obj)
+            except Exception as e:
+                output.error(f"[{obj[0].upper()}] ERR: GET_DDL for '{obj[3]}' failed: {e}")
+                return obj, None
+            finally:
+                pooled_cursor.close()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, fetch, obj) for obj in per_object]
+            for obj, statement in (future.result() for future in futures):
+                if statement is not None:
+                    _store(object_key(*obj), objects[obj], statement)
+                    ddl[obj] = statement
+    finally:
+        pool.close(keep=[conn])
+    return ddl, cache_hits
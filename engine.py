@@ -0,0 +1,263 @@
+import queue
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import output
+from catalog import qualify_name
+from object_creator import create_object, extract_created_object, extract_references, known_to_exist, report_exists
+from snowflake_connector import create_snowflake_connection
+
+# Statuses after which dependents may run; anything else stops the downstream nodes.
+SUCCESS_STATUSES = ("created", "exists")
+
+class ConnectionPool:
+    """
+    Bounded pool of Snowflake connections. Connections are opened lazily,
+    at most `size` of them, and handed out one per worker.
+    """
+
+    def __init__(self, master_config, size, connections=None):
+        self.master_config = master_config
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._opened = []
+        self._lock = threading.Lock()
+        for conn in connections or []:
+            self._opened.append(conn)
+            self._idle.put(conn)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = len(self._opened) < self.size
+            if can_open:
+                # Reserve the slot before the (slow) login so concurrent callers respect the bound.
+                self._opened.append(None)
+        if not can_open:
+            return self._idle.get()
+        try:
+            conn = create_snowflake_connection(self.master_config)
+        except Exception:
+            with self._lock:
+                self._opened.remove(None)
+            raise
+        with self._lock:
+            self._opened[self._opened.index(None)] = conn
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self, keep=()):
+        """Closes every pooled connection except the ones listed in `keep`."""
+        for conn in self._opened:
+            if conn is not None and conn not in keep:
+                try:
+                    conn.close()
+                except Exception as e:
+                    output.warn(f"WARN: Failed to close pooled connection: {e}")
+
+def node_label(node):
+    return f"{node['obj_type'].upper()} '{node['name']}'"
+
+def build_dependency_graph(definitions, database, schema):
+    """
+    Builds a DAG from object definitions.
+
+    `definitions` maps an object type ('table', 'view', ...) to its list of definitions.
+    Edges come from explicit `depends_on` entries ('name' or 'type:name') and from
+    the objects each query references (FROM/JOIN/INTO targets, task AFTER clauses, stages).
+    Returns a list of nodes; `deps` and `dependents` hold indexes into that list.
+    """
+    nodes = []
+    by_key = {}
+    for obj_type, objects in definitions.items():
+        for obj in objects:
+            node = {
+                "index": len(nodes),
+                "obj_type": obj_type,
+                "name": obj.get("name", "unknown"),
+                "definition": obj,
+                "deps": set(),
+                "dependents": set()
+            }
+            nodes.append(node)
+            keys = set()
+            if "name" in obj:
+                keys.add(qualify_name(obj["name"], database, schema))
+            created = extract_created_object(obj.get("query", ""))
+            if created:
+                keys.add(qualify_name(created[1], database, schema))
+            for key in keys:
+                by_key.setdefault(key, []).append(node)
+
+    def lookup(name, obj_type=None):
+        matches = by_key.get(qualify_name(name, database, schema), [])
+        if obj_type:
+            matches = [n for n in matches if n["obj_type"] == obj_type]
+        return matches
+
+    for node in nodes:
+        obj = node["definition"]
+        depends_on = obj.get("depends_on") or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        for dep in depends_on:
+            dep_type = None
+            dep_name = dep
+            if ":" in dep:
+                dep_type, dep_name = dep.split(":", 1)
+                dep_type = dep_type.strip().lower().rstrip("s")
+            matches = lookup(dep_name.strip(), dep_type)
+            if not matches:
+                output.warn(f"[{node['obj_type'].upper()}] WARN: '{node['name']}' depends on unknown object '{dep}'.")
+            for match in matches:
+                node["deps"].add(match["index"])
+        for kind, ref in extract_references(obj.get("query", "")):
+            for match in lookup(ref, "stage" if kind == "stage" else None):
+                node["deps"].add(match["index"])
+        node["deps"].discard(node["index"])
+        for dep in node["deps"]:
+            nodes[dep]["dependents"].add(node["index"])
+    return nodes
+
+def reverse_graph(nodes):
+    """
+    Returns a copy of the graph with every edge reversed, so an object runs only
+    after everything that depends on it (the order objects must be dropped in).
+    """
+    return [
+        dict(node, deps=set(node["dependents"]), dependents=set(node["deps"]))
+        for node in nodes
+    ]
+
+def run_graph(nodes, run_node, jobs, success_statuses=SUCCESS_STATUSES):
+    """
+    Runs `run_node(node)` for every node with at most `jobs` running concurrently,
+    starting a node only once all of its dependencies finished with one of `success_statuses`.
+    When a node fails, its downstream nodes are skipped; unrelated nodes keep running.
+    Returns (statuses, skipped) where statuses maps node index to its outcome and
+    skipped lists (node, reason) for nodes that were never started.
+    """
+    statuses = {}
+    skipped = []
+    pending = {node["index"]: len(node["deps"]) for node in nodes}
+    ready = [node["index"] for node in nodes if not node["deps"]]
+
+    def skip_downstream(index, reason):
+        stack = list(nodes[index]["dependents"])
+        while stack:
+            dependent = stack.pop()
+            if dependent in statuses:
+                continue
+            statuses[dependent] = "skipped"
+            skipped.append((nodes[dependent], reason))
+            stack.extend(nodes[dependent]["dependents"])
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        running = {}
+        while ready or running:
+            while ready and len(running) < jobs:
+                index = ready.pop(0)
+                # Each node runs in a copy of this context, so output stays tagged with its target.
+                running[executor.submit(contextvars.copy_context().run, run_node, nodes[index])] = index
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                try:
+                    status = future.result()
+                except Exception as e:
+                    output.result(nodes[index]["obj_type"], nodes[index]["name"], "failed",
+                                  f"ERR: {node_label(nodes[index])} failed: {e}", "error", "red", error=str(e))
+                    status = "failed"
+                statuses[index] = status
+                if status in success_statuses:
+                    for dependent in nodes[index]["dependents"]:
+                        pending[dependent] -= 1
+                        if pending[dependent] == 0 and dependent not in statuses:
+                            ready.append(dependent)
+                else:
+                    skip_downstream(index, f"upstream {node_label(nodes[index])} {status}")
+            ready.sort()
+
+    # Whatever never became ready is part of (or behind) a dependency cycle.
+    for node in nodes:
+        if node["index"] not in statuses:
+            statuses[node["index"]] = "skipped"
+            skipped.append((node, "dependency cycle"))
+    return statuses, skipped
+
+def execute_graph(master_config, conn, nodes, jobs, work, dry_run=False, success_statuses=SUCCESS_STATUSES,
+                  precheck=None):
+    """
+    Runs `work(cursor, node)` for every node over a pool of up to `jobs` connections
+    (the already open `conn` is reused as the first one). In a dry run no connection
+    is taken from the pool and `work` gets None as its cursor.
+    `precheck(node)` may return a status to settle a node without taking a connection.
+    Returns (statuses, skipped) as run_graph does.
+    """
+    pool = ConnectionPool(master_config, jobs, [conn])
+
+    def run_node(node):
+        status = precheck(node) if precheck else None
+        if status is not None:
+            return status
+        if dry_run:
+            return work(None, node)
+        with pool.connection() as pooled:
+            cursor = pooled.cursor()
+            try:
+                return work(cursor, node)
+            finally:
+                cursor.close()
+
+    try:
+        return run_graph(nodes, run_node, jobs, success_statuses)
+    finally:
+        pool.close(keep=[conn])
+
+def apply_graph(master_config, conn, definitions, catalog, jobs, dry_run=False, on_result=None):
+    """
+    Creates the given definitions concurrently over a pool of up to `jobs` connections
+    (the already open `conn` is reused as the first one) and reports skipped objects.
+    `on_result(obj, status)` is called from the worker as soon as an object is settled;
+    objects skipped because of a failure upstream are only reported.
+    Returns True if no object failed or was skipped because of a failure upstream.
+    """
+    nodes = build_dependency_graph(definitions, catalog.database, catalog.schema)
+
+    def precheck(node):
+        # Objects the snapshot already lists are settled without a pooled connection (and its login).
+        if not known_to_exist(node["definition"], node["obj_type"], catalog):
+            return None
+        status = report_exists(node["obj_type"], node["name"])
+        if on_result:
+            on_result(node["definition"], status)
+        return status
+
+    def work(cursor, node):
+        return create_object(cursor or catalog.cursor, node["definition"], node["obj_type"], dry_run, catalog,
+                             on_result=on_result)
+
+    statuses, skipped = execute_graph(master_config, conn, nodes, jobs, work, dry_run, precheck=precheck)
+    return report_skipped(statuses, skipped)
+
+def report_skipped(statuses, skipped):
+    """
+    Reports the nodes run_graph skipped, with the reason, as 'skipped' outcomes (the
+    per-type counts are part of the command's summary). Returns True if nothing
+    failed or was skipped.
+    """
+    for node, reason in skipped:
+        output.result(node["obj_type"], node["name"], "skipped", f"SKIPPED: {node_label(node)} ({reason}).",
+                      "warn", "yellow", reason=reason)
+    return not skipped and "failed" not in statuses.values()
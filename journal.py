@@ -0,0 +1,83 @@
+import os
+import json
+import threading
+from datetime import datetime, timezone
+import output
+from state import STATE_DIR, definition_hash, state_key
+
+JOURNAL_PATH = os.path.join(STATE_DIR, "journal.jsonl")
+
+def journal_path(state_path):
+    """The journal kept next to a state manifest, so every target has its own."""
+    return os.path.join(os.path.dirname(state_path) or ".", os.path.basename(JOURNAL_PATH))
+
+class Journal:
+    """
+    Append-only record of an apply: a 'start' line, one line per object as soon as it
+    is created or found to exist, and a 'finish' line. Each line is flushed when it is
+    written, so the journal survives the process being killed part-way. A resumed run
+    appends to the journal of the run it continues; a new run starts a new one.
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _records(self):
+        records = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A line cut short by a crash; everything before it still counts.
+                        continue
+        except FileNotFoundError:
+            pass
+        return records
+
+    def completed(self):
+        """
+        Returns {state key: definition hash} of the objects an unfinished or failed run
+        completed, or None if there is no such run to resume.
+        """
+        records = self._records()
+        if not records or (records[-1].get("event") == "finish" and records[-1].get("succeeded")):
+            return None
+        return {
+            state_key(record["type"], record["name"]): record["hash"]
+            for record in records if record.get("event") == "object"
+        }
+
+    def _write(self, record):
+        record = dict(record, ts=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def start(self, resume=False):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "a" if resume else "w")
+        self._write({"event": "resume" if resume else "start", "pid": os.getpid()})
+
+    def record(self, obj_type, obj, status):
+        if self._file is not None:
+            self._write({"event": "object", "type": obj_type, "name": obj["name"], "hash": definition_hash(obj),
+                         "status": status})
+
+    def finish(self, succeeded):
+        if self._file is None:
+            return
+        self._write({"event": "finish", "succeeded": succeeded})
+        try:
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            output.warn(f"WARN: Failed to sync journal {self.path}: {e}")
+        self._file.close()
+        self._file = None
+
+def is_journaled(completed, obj_type, obj):
+    """True if the resumed run completed this definition, unchanged since."""
+    return bool(completed) and completed.get(state_key(obj_type, obj.get("name", ""))) == definition_hash(obj)
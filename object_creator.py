@@ -1,16 +1,332 @@
 import re
-import snowflake.connector
-import click
+import time
+import random
+import output
+import tracing
+from catalog import CatalogSnapshot
 
-def execute_query(cursor, query, dry_run=False):
+# Attempts per statement when it fails with a transient error; anything else fails at once.
+RETRY_ATTEMPTS = 4
+# Backoff before retry n is a random delay of up to RETRY_BASE_DELAY * 2^(n-1) seconds, capped.
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 20.0
+
+# Connector errors raised for network failures, HTTP 429/5xx and timeouts talking to Snowflake.
+TRANSIENT_ERRORS = ("OperationalError", "InterfaceError", "ServiceUnavailableError", "GatewayTimeoutError",
+                    "BadGatewayError", "InternalServerError", "OtherHTTPRetryableError", "RequestTimeoutError",
+                    "TooManyRequests", "RequestExceedMaxRetryError")
+# Server-side errors worth retrying: throttling and warehouses that are still resuming.
+TRANSIENT_MESSAGES = re.compile(r"throttl|too many requests|temporarily unavailable|try again later|"
+                                r"warehouse\b.*\bresum(ing|e in progress)", re.IGNORECASE)
+
+# One query per poll for the status of every in-flight async query (see AsyncQueryRunner.poll).
+# RESULT_LIMIT is the function's maximum, so long-running queries stay listed.
+STATUS_QUERY = ("SELECT QUERY_ID, EXECUTION_STATUS FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_SESSION("
+                "RESULT_LIMIT => 10000)) WHERE QUERY_ID IN ({ids})")
+# EXECUTION_STATUS values of queries that have not finished.
+RUNNING_STATUSES = {"RUNNING", "QUEUED", "BLOCKED", "RESUMING_WAREHOUSE"}
+
+_retry_attempts = RETRY_ATTEMPTS
+
+def set_retry_attempts(attempts):
+    """Sets how many times a statement is tried in all when it keeps failing with transient errors."""
+    global _retry_attempts
+    _retry_attempts = max(1, attempts)
+
+def is_transient(error):
+    """Tells network failures, throttling and resuming warehouses apart from errors a retry cannot fix."""
+    names = [cls.__name__ for cls in type(error).__mro__]
+    if any(name.startswith("NonRetryable") for name in names):
+        return False
+    if any(name in TRANSIENT_ERRORS for name in names):
+        return True
+    return bool(TRANSIENT_MESSAGES.search(str(error)))
+
+def retry_delay(attempt):
+    """Jittered exponential backoff before retry number `attempt`."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+def should_retry(error, attempt, query, applied=None):
+    """
+    For statements whose failure is only seen after the fact (async status, a failed
+    batch): whether to run it again. Waits out the backoff first; a statement that
+    `applied()` says took effect is not retried, so `error` is then passed over.
+    Returns (retry, error).
+    """
+    if attempt >= _retry_attempts or not is_transient(error):
+        return False, error
+    delay = retry_delay(attempt)
+    statement = " ".join(query.split())[:60]
+    output.warn(f"WARN: Transient error (attempt {attempt}/{_retry_attempts}) running '{statement}': {error}. "
+                f"Retrying in {delay:.1f}s.", attempt=attempt, error=str(error))
+    time.sleep(delay)
+    if applied is not None:
+        try:
+            if applied():
+                output.debug("OK: The failed attempt took effect; not running it again.", fg="blue")
+                return False, None
+        except Exception:
+            pass
+    return True, error
+
+def run_with_retries(action, query, applied=None):
+    """
+    Runs `action()`, retrying transient errors with jittered exponential backoff up to
+    the configured number of attempts. Before a retry, `applied()` (if given) tells
+    whether the failed attempt took effect after all, e.g. a CREATE whose response got
+    lost; then it is not run again. Other errors are raised at once.
+    """
+    attempt = 1
+    while True:
+        try:
+            return action()
+        except Exception as e:
+            if attempt >= _retry_attempts or not is_transient(e):
+                raise
+            delay = retry_delay(attempt)
+            statement = " ".join(query.split())[:60]
+            output.warn(f"WARN: Transient error (attempt {attempt}/{_retry_attempts}) running '{statement}': {e}. "
+                        f"Retrying in {delay:.1f}s.", attempt=attempt, error=str(e))
+            time.sleep(delay)
+            if applied is not None:
+                try:
+                    if applied():
+                        output.debug("OK: The failed attempt took effect; not running it again.", fg="blue")
+                        return None
+                except Exception:
+                    pass
+            attempt += 1
+
+class AsyncQueryRunner:
+    """
+    Submits statements with the connector's async query support and polls the
+    returned query IDs in batches, so a single session keeps up to `max_in_flight`
+    statements running without a thread per statement.
+
+    Each poll looks up every in-flight query with one QUERY_HISTORY_BY_SESSION query.
+    Only queries it reports as failed or does not list yet are checked one by one
+    with get_query_status, which raises their error with its errno. If the history
+    cannot be queried (e.g. no usable warehouse), every poll checks each in-flight
+    query on its own: one round trip per query and poll.
+    """
+
+    def __init__(self, cursor, max_in_flight=8, poll_interval=0.1, max_poll_interval=2.0):
+        self.cursor = cursor
+        self.connection = cursor.connection
+        self.max_in_flight = max(1, max_in_flight)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.in_flight = {}
+        self._interval = poll_interval
+        self._spans = {}
+        self._status_cursor = None
+        self._history = True
+
+    def submit(self, query, on_done=None, key=None, applied=None):
+        """
+        Submits a statement, first waiting for a free slot if the cap is reached.
+        `on_done(error)` is called once the query finishes (error is None on success);
+        `key` identifies the object so dependents can wait for it with wait_for().
+        A query that ends with a transient error is submitted again unless `applied()`
+        says it took effect (see should_retry).
+        """
+        while len(self.in_flight) >= self.max_in_flight:
+            self.poll()
+        return self._submit(query, on_done, key, applied, 1)
+
+    def _submit(self, query, on_done, key, applied, attempt):
+        started, clock = time.time(), time.perf_counter()
+        result = run_with_retries(lambda: self.cursor.execute_async(query), query, applied)
+        if result is None:
+            # The submission's response was lost but the statement took effect.
+            if on_done:
+                on_done(None)
+            return None
+        query_id = result["queryId"]
+        self.in_flight[query_id] = (on_done, key, query, applied, attempt)
+        if tracing.enabled():
+            # The span runs from submission until a poll sees the query finish.
+            self._spans[query_id] = (started, clock, tracing.current_context())
+        return query_id
+
+    def _statuses(self):
+        """EXECUTION_STATUS of the in-flight queries the session's query history lists, by ID."""
+        if not self._history or not self.in_flight:
+            return {}
+        ids = ", ".join("'" + query_id.replace("'", "''") + "'" for query_id in self.in_flight)
+        try:
+            if self._status_cursor is None:
+                self._status_cursor = self.connection.cursor()
+            self._status_cursor.execute(STATUS_QUERY.format(ids=ids))
+            return {query_id: status for query_id, status in self._status_cursor.fetchall()}
+        except Exception as e:
+            if not is_transient(e):
+                self._history = False
+                output.debug(f"Query history unavailable ({e}); polling each async query's status instead.")
+            return {}
+
+    def poll(self):
+        """Checks every in-flight query once, backing off while none has finished."""
+        finished = []
+        statuses = self._statuses()
+        for query_id in list(self.in_flight):
+            status = statuses.get(query_id)
+            if status in RUNNING_STATUSES:
+                continue
+            error = None
+            if status != "SUCCESS":
+                status = self.connection.get_query_status(query_id)
+                if self.connection.is_still_running(status):
+                    continue
+                if self.connection.is_an_error(status):
+                    try:
+                        self.connection.get_query_status_throw_if_error(query_id)
+                        error = Exception(f"Query {query_id} ended with status {status}")
+                    except Exception as e:
+                        error = e
+            finished.append((self.in_flight.pop(query_id), error))
+            if query_id in self._spans:
+                started, clock, attrs = self._spans.pop(query_id)
+                tracing.record("execute_async", "ddl", started, time.perf_counter() - clock, query_id=query_id,
+                               error=str(error) if error else None, **attrs)
+        if not finished:
+            time.sleep(self._interval)
+            self._interval = min(self._interval * 2, self.max_poll_interval)
+            return
+        self._interval = self.poll_interval
+        for (on_done, key, query, applied, attempt), error in finished:
+            if error is not None:
+                retry, error = should_retry(error, attempt, query, applied)
+                if retry:
+                    try:
+                        self._submit(query, on_done, key, applied, attempt + 1)
+                        continue
+                    except Exception as e:
+                        error = e
+            if on_done:
+                on_done(error)
+
+    def wait_for(self, keys):
+        """Blocks until none of the in-flight queries belongs to one of `keys`."""
+        keys = set(keys)
+        while any(entry[1] in keys for entry in self.in_flight.values()):
+            self.poll()
+
+    def wait_all(self):
+        while self.in_flight:
+            self.poll()
+
+class BatchExecutor:
+    """
+    Groups statements into multi-statement requests (MULTI_STATEMENT_COUNT) of up to
+    `batch_size` statements, so many small DDLs cost one round trip per batch.
+
+    Statements in a batch run in order and Snowflake stops at the first failure.
+    To map that failure back to its statement, each statement may carry an
+    `applied()` check; after calling `refresh()` the first statement whose check
+    fails is the one that errored. Statements without a check are re-run one by one,
+    so only idempotent statements (e.g. DROP ... IF EXISTS) should omit it.
+    """
+
+    def __init__(self, cursor, batch_size=20, refresh=None):
+        self.cursor = cursor
+        self.batch_size = max(1, batch_size)
+        self.refresh = refresh
+        self.pending = []
+        self.requests = 0
+
+    def submit(self, query, on_done=None, key=None, applied=None):
+        self.pending.append((query.strip().rstrip(";").strip(), on_done, applied))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def wait_for(self, keys):
+        # Statements of a batch run in submission order, so dependents never need to wait.
+        pass
+
+    def wait_all(self):
+        self.flush()
+
+    def flush(self):
+        batch, self.pending = self.pending, []
+        while batch:
+            if len(batch) == 1:
+                self._run_single(batch[0])
+                return
+            try:
+                self.requests += 1
+                # The batch is not about the object whose submit() triggered the flush.
+                with tracing.span("execute_batch", "ddl", statements=len(batch), obj_type=None, name=None, source=None) as span:
+                    self.cursor.execute(";\n".join(query for query, _, _ in batch), num_statements=len(batch))
+                    span["query_id"] = self.cursor.sfqid
+            except Exception as e:
+                batch = self._settle_failed_batch(batch, e)
+                continue
+            for _, on_done, _ in batch:
+                if on_done:
+                    on_done(None)
+            return
+
+    def _run_single(self, item):
+        query, on_done, applied = item
+        self.requests += 1
+        try:
+            with tracing.span("execute", "ddl") as span:
+                run_with_retries(lambda: self.cursor.execute(query), query, applied)
+                span["query_id"] = self.cursor.sfqid
+            error = None
+        except Exception as e:
+            error = e
+        if on_done:
+            on_done(error)
+
+    def _settle_failed_batch(self, batch, error):
+        """Reports the statements around a failure and returns the ones still to run."""
+        if self.refresh is None or any(applied is None for _, _, applied in batch):
+            for item in batch:
+                self._run_single(item)
+            return []
+        self.refresh()
+        failed_index = next((i for i, (_, _, applied) in enumerate(batch) if not applied()), None)
+        if failed_index is None:
+            # Every statement took effect; only the response was lost.
+            for _, on_done, _ in batch:
+                if on_done:
+                    on_done(None)
+            return []
+        for _, on_done, _ in batch[:failed_index]:
+            if on_done:
+                on_done(None)
+        if is_transient(error):
+            # Not a problem with the statement itself: it runs again on its own, with retries.
+            self._run_single(batch[failed_index])
+        elif batch[failed_index][1]:
+            batch[failed_index][1](error)
+        return batch[failed_index + 1:]
+
+def execute_query(cursor, query, dry_run=False, runner=None, on_done=None, key=None, applied=None):
+    """
+    Executes a query, or submits it to `runner` (an AsyncQueryRunner or BatchExecutor)
+    without waiting for it; `on_done`, `key` and `applied` are then passed through
+    to runner.submit(). Transient errors are retried (see run_with_retries).
+    """
     if dry_run:
-        click.secho(f"[DRY RUN] Execute: {query}", fg="green")
+        output.info(f"[DRY RUN] Execute: {query}", fg="green")
+        return
+    if runner is not None:
+        runner.submit(query, on_done, key, applied)
         return
+    # Already loaded by whatever opened the cursor; not imported at module level so that
+    # offline commands (validate, --help) never load the connector.
+    from snowflake.connector.errors import ProgrammingError
     try:
-        cursor.execute(query)
-        click.secho("OK: Query executed.", fg="blue")
-    except snowflake.connector.errors.ProgrammingError as e:
-        click.secho(f"ERR: Query failed: {e}", fg="red")
+        with tracing.span("execute", "ddl") as span:
+            run_with_retries(lambda: cursor.execute(query), query, applied)
+            span["query_id"] = cursor.sfqid
+        output.debug("OK: Query executed.", fg="blue")
+    except ProgrammingError as e:
+        # The caller reports the failure against its object.
+        output.debug(f"ERR: Query failed: {e}", fg="red")
         cursor.connection.rollback()
         raise
 
@@ -25,11 +341,13 @@ def check_object_exists(cursor, obj_type, object_name):
     query = query_map.get(obj_type)
     if query:
         try:
-            cursor.execute(query)
-            results = cursor.fetchall()
+            with tracing.span("show_like", "exists", obj_type=obj_type, name=object_name) as span:
+                cursor.execute(query)
+                span["query_id"] = cursor.sfqid
+                results = cursor.fetchall()
             return len(results) > 0
         except Exception as e:
-            click.secho(f"[{obj_type.upper()}] ERR: Checking '{object_name}' failed: {e}", fg="red")
+            output.error(f"[{obj_type.upper()}] ERR: Checking '{object_name}' failed: {e}")
             return False
     return False
 
@@ -37,11 +355,13 @@ def check_stage_exists(cursor, stage_name):
     """Check if a stage exists in Snowflake."""
     query = f"SHOW STAGES LIKE '{stage_name.upper()}'"
     try:
-        cursor.execute(query)
-        results = cursor.fetchall()
+        with tracing.span("show_like", "exists", obj_type="stage", name=stage_name) as span:
+            cursor.execute(query)
+            span["query_id"] = cursor.sfqid
+            results = cursor.fetchall()
         return len(results) > 0
     except Exception as e:
-        click.secho(f"[STAGE] ERR: Failed to check stage '{stage_name}': {e}", fg="red")
+        output.error(f"[STAGE] ERR: Failed to check stage '{stage_name}': {e}")
         return False
 
 def extract_stage_from_query(query):
@@ -51,67 +371,182 @@ def extract_stage_from_query(query):
     """
     match = re.search(r"FROM\s+@(\S+)", query, re.IGNORECASE)
     if match:
-        stage_name = match.group(1).rstrip(";")
+        # '@stage/path/' loads from a path inside the stage; only the stage itself is looked up.
+        stage_name = match.group(1).rstrip(";").split("/")[0]
         return stage_name
     return None
 
-def create_objects(cursor, objects, obj_type, dry_run=False):
+def extract_created_object(query):
+    """
+    Extracts the object kind and name from a CREATE statement,
+    e.g. ('TABLE', 'public.employee'). Returns None if the query is not a recognizable CREATE.
+    """
+    match = re.match(
+        r"\s*CREATE\s+(?:OR\s+REPLACE\s+)?(?:(?:SECURE|MATERIALIZED|TRANSIENT|TEMPORARY|TEMP|LOCAL|GLOBAL|VOLATILE|RECURSIVE)\s+)*"
+        r"(TABLE|VIEW|TASK|PIPE|STAGE)\s+(?:IF\s+NOT\s+EXISTS\s+)?([\w\"$.]+)",
+        query,
+        re.IGNORECASE
+    )
+    if match:
+        return match.group(1).upper(), match.group(2)
+    return None
+
+def extract_references(query):
+    """
+    Extracts the names of objects a query reads from or writes to
+    (FROM/JOIN/INTO/UPDATE targets, task AFTER predecessors and '@stage' references).
+    Returns a list of (kind, name) tuples where kind is 'object' or 'stage'.
+    """
+    references = []
+    for match in re.finditer(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+(@?[\w\"$.]+)", query, re.IGNORECASE):
+        name = match.group(1).rstrip(";")
+        if name.startswith("@"):
+            references.append(("stage", name[1:].split("/")[0]))
+        else:
+            references.append(("object", name))
+    for match in re.finditer(r"\bAFTER\s+([\w\"$.]+(?:\s*,\s*[\w\"$.]+)*)", query, re.IGNORECASE):
+        for name in match.group(1).split(","):
+            references.append(("object", name.strip()))
+    return references
+
+def create_object(cursor, obj, obj_type, dry_run=False, catalog=None, runner=None, on_result=None):
+    """
+    Creates a single object definition and returns its outcome:
+    'created', 'exists', 'skipped' (not attempted) or 'failed'.
+    With a runner (AsyncQueryRunner or BatchExecutor) the DDL is only submitted and
+    'submitted' is returned; the result is logged once the query finishes.
+    `on_result(obj, status)` is called with the final outcome in both modes.
+    """
+    with tracing.context(obj_type=obj_type, name=obj.get("name"), source=tracing.source_of(obj)):
+        status = _create_object(cursor, obj, obj_type, dry_run, catalog, runner, on_result)
+    if on_result and status != "submitted":
+        on_result(obj, status)
+    return status
+
+def known_to_exist(obj, obj_type, catalog):
+    """
+    True if the catalog's listings already show the object (and a pipe's stage) exist,
+    so create_object would only report it. Runs no query beyond the bulk listings.
+    """
+    if "name" not in obj or "query" not in obj:
+        return False
+    if obj_type == "snowpipe":
+        stage = obj.get("stage") or extract_stage_from_query(obj["query"])
+        if not stage or catalog.exists("stage", stage) is not True:
+            return False
+    return catalog.exists(obj_type, obj["name"]) is True
+
+def report_exists(obj_type, name):
+    output.result(obj_type, name, "exists", f"[{obj_type.upper()}] WARN: '{name}' already exists. Skipping.", "warn", "yellow")
+    return "exists"
+
+def _create_object(cursor, obj, obj_type, dry_run, catalog, runner, on_result):
+    if catalog is None:
+        catalog = CatalogSnapshot(cursor)
+    if "name" not in obj:
+        output.result(obj_type, None, "failed", f"[{obj_type.upper()}] ERR: Missing 'name'.", "error", "red")
+        return "failed"
+    if "query" not in obj:
+        output.result(obj_type, obj["name"], "failed", f"[{obj_type.upper()}] ERR: '{obj['name']}' missing 'query'.", "error", "red")
+        return "failed"
+
+    name = obj["name"]
+    query = obj["query"]
+
+    # For snowpipe objects, ensure stage is defined or extract from query.
+    if obj_type == "snowpipe":
+        stage = obj.get("stage")
+        if not stage:
+            stage = extract_stage_from_query(query)
+            if stage:
+                output.debug(f"[SNOWPIPE] INFO: Extracted stage '{stage}' from query.", fg="blue")
+            else:
+                output.result(obj_type, name, "skipped", f"[SNOWPIPE] WARN: No stage specified or found in query for '{name}'. Skipping.",
+                              "warn", "yellow")
+                return "skipped"
+        try:
+            stage_exists = catalog.check("stage", stage)
+        except Exception as e:
+            output.result(obj_type, name, "failed", f"[SNOWPIPE] ERR: Checking stage '{stage}' failed: {e}",
+                          "error", "red", error=str(e), stage=stage)
+            return "failed"
+        if stage_exists:
+            output.debug(f"[SNOWPIPE] OK: Stage '{stage}' exists.", fg="green")
+        else:
+            output.result(obj_type, name, "skipped", f"[SNOWPIPE] WARN: Stage '{stage}' does not exist. Skipping '{name}'.",
+                          "warn", "yellow", stage=stage)
+            return "skipped"
+
+    # Check if the object already exists (one SHOW ... LIKE if its type's listing failed).
+    try:
+        exists = catalog.check(obj_type, name)
+    except Exception as e:
+        output.result(obj_type, name, "failed", f"[{obj_type.upper()}] ERR: Existence check for '{name}' failed: {e}",
+                      "error", "red", error=str(e))
+        return "failed"
+
+    if exists:
+        return report_exists(obj_type, name)
+    if dry_run:
+        output.result(obj_type, name, "created", f"[DRY RUN] [{obj_type.upper()}] '{name}' will be created.\nDDL: {query}",
+                      fg="green", dry_run=True)
+        catalog.add(obj_type, name)
+        return "created"
+    def applied():
+        # Asks about this object alone; if even that fails, the catalog keeps what it knew.
+        try:
+            return run_with_retries(lambda: catalog.lookup(obj_type, name), f"SHOW ... LIKE '{name}'")
+        except Exception as e:
+            output.debug(f"[{obj_type.upper()}] Checking whether '{name}' was created failed: {e}", fg="red")
+            return catalog.exists(obj_type, name)
+
+    if runner is not None:
+        def on_done(error):
+            if error:
+                output.result(obj_type, name, "failed", f"[{obj_type.upper()}] ERR: Failed to create '{name}': {error}",
+                              "error", "red", error=str(error))
+            else:
+                catalog.add(obj_type, name)
+                output.result(obj_type, name, "created", f"[{obj_type.upper()}] OK: '{name}' created.", fg="green")
+            if on_result:
+                on_result(obj, "failed" if error else "created")
+
+        try:
+            # Objects this query references may still be running in the same batch.
+            runner.wait_for(catalog.key(ref) for kind, ref in extract_references(query) if kind == "object")
+            execute_query(cursor, query, dry_run, runner, on_done, catalog.key(name), applied=applied)
+            return "submitted"
+        except Exception as e:
+            output.result(obj_type, name, "failed", f"[{obj_type.upper()}] ERR: Failed to submit '{name}': {e}",
+                          "error", "red", error=str(e))
+            return "failed"
+    try:
+        execute_query(cursor, query, dry_run, applied=applied)
+        catalog.add(obj_type, name)
+        output.result(obj_type, name, "created", f"[{obj_type.upper()}] OK: '{name}' created.", fg="green")
+        return "created"
+    except Exception as e:
+        output.result(obj_type, name, "failed", f"[{obj_type.upper()}] ERR: Failed to create '{name}': {e}",
+                      "error", "red", error=str(e))
+        return "failed"
+
+def create_objects(cursor, objects, obj_type, dry_run=False, catalog=None, runner=None, on_result=None):
     """
     Process object definitions:
     - Prefix log messages with [OBJTYPE].
+    - Existence checks are answered from a CatalogSnapshot (bulk-loaded once per type)
+      instead of a SHOW ... LIKE per object; pass one in to share it across types.
     - For snowpipes, check if the associated stage exists:
         * If 'stage' is not provided, extract it from the query.
     - If an object exists, log a yellow warning.
     - If not, log in green that it will be/has been created.
     - In dry-run mode, prefix messages with [DRY RUN].
     - Log any errors in red.
+    - With a runner (AsyncQueryRunner or BatchExecutor), DDLs are submitted without waiting;
+      call runner.wait_all() before relying on the objects.
+    - `on_result(obj, status)` receives each object's final outcome.
     """
+    if catalog is None:
+        catalog = CatalogSnapshot(cursor)
     for obj in objects:
-        if "name" not in obj:
-            click.secho(f"[{obj_type.upper()}] ERR: Missing 'name'.", fg="red")
-            continue
-        if "query" not in obj:
-            click.secho(f"[{obj_type.upper()}] ERR: '{obj.get('name')}' missing 'query'.", fg="red")
-            continue
-        
-        name = obj["name"]
-        query = obj["query"]
-        
-        # For snowpipe objects, ensure stage is defined or extract from query.
-        if obj_type == "snowpipe":
-            stage = obj.get("stage")
-            if not stage:
-                stage = extract_stage_from_query(query)
-                if stage:
-                    click.secho(f"[SNOWPIPE] INFO: Extracted stage '{stage}' from query.", fg="blue")
-                else:
-                    click.secho(f"[SNOWPIPE] WARN: No stage specified or found in query for '{name}'. Skipping.", fg="yellow")
-                    continue
-            if check_stage_exists(cursor, stage):
-                click.secho(f"[SNOWPIPE] OK: Stage '{stage}' exists.", fg="green")
-            else:
-                click.secho(f"[SNOWPIPE] WARN: Stage '{stage}' does not exist. Skipping '{name}'.", fg="yellow")
-                continue
-
-        # Check if the object already exists.
-        try:
-            exists = check_object_exists(cursor, obj_type, name)
-        except Exception as e:
-            click.secho(f"[{obj_type.upper()}] ERR: Existence check for '{name}' failed: {e}", fg="red")
-            continue
-        
-        if exists:
-            click.secho(f"[{obj_type.upper()}] WARN: '{name}' already exists. Skipping.", fg="yellow")
-        else:
-            if dry_run:
-                click.secho(
-                    f"[DRY RUN] [{obj_type.upper()}] '{name}' will be created.\nDDL: {query}",
-                    fg="green",
-                    bold=True
-                )
-            else:
-                try:
-                    execute_query(cursor, query, dry_run)
-                    click.secho(f"[{obj_type.upper()}] OK: '{name}' created.", fg="green")
-                except Exception as e:
-                    click.secho(f"[{obj_type.upper()}] ERR: Failed to create '{name}': {e}", fg="red")
+        create_object(cursor, obj, obj_type, dry_run, catalog, runner, on_result)
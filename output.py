@@ -0,0 +1,208 @@
+import json
+import time
+import atexit
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import click
+
+QUIET, NORMAL, VERBOSE = 0, 1, 2
+
+# Minimum verbosity at which each kind of message is shown; errors always are.
+LEVELS = {"error": QUIET, "summary": QUIET, "warn": NORMAL, "info": NORMAL, "debug": VERBOSE}
+
+# Lines are written once this many are buffered or FLUSH_INTERVAL seconds passed.
+BUFFER_LINES = 500
+FLUSH_INTERVAL = 0.2
+
+# Outcome statuses counted in the final summary, in display order.
+SUMMARY_STATUSES = ("created", "exists", "resumed", "dropped", "absent", "planned", "added", "changed", "removed", "unchanged",
+                    "succeeded", "skipped", "failed")
+
+# Deployment target of the messages reported in the current context (see target()).
+_target = contextvars.ContextVar("output_target", default=None)
+
+class Sink:
+    """
+    Buffers output lines and writes them in batches instead of one terminal write per
+    message. A buffered line is written at most FLUSH_INTERVAL seconds later, even if
+    nothing else is emitted meanwhile (e.g. while connecting or waiting on a query).
+    In JSON mode every message becomes one JSON object per line, and every object
+    outcome one event carrying its type, name and status.
+    """
+
+    def __init__(self, verbosity=NORMAL, log_format="text"):
+        self.verbosity = verbosity
+        self.log_format = log_format
+        self.started = time.perf_counter()
+        self._lines = []
+        self._last_flush = time.perf_counter()
+        self._timer = None
+        self._results = {}
+        self._last_result = self.started
+        self._targets = {}
+        self._lock = threading.RLock()
+
+    def emit(self, level, message, fg=None, bold=False, **fields):
+        if LEVELS[level] > self.verbosity:
+            return
+        target = _target.get()
+        if self.log_format == "json":
+            event = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "level": level}
+            if target:
+                event["target"] = target
+            event.update((key, value) for key, value in fields.items() if value is not None)
+            event["message"] = click.unstyle(message)
+            line = json.dumps(event, default=str)
+        else:
+            line = click.style(message, fg=fg, bold=bold) if fg or bold else message
+            if target:
+                line = f"[{target}] {line}"
+        with self._lock:
+            self._lines.append(line)
+            if len(self._lines) >= BUFFER_LINES or time.perf_counter() - self._last_flush >= FLUSH_INTERVAL:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(FLUSH_INTERVAL, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def result(self, obj_type, name, status, message, level="info", fg=None, **fields):
+        with self._lock:
+            # A type's time runs from the outcome reported before its first one to its last one.
+            counts = self._results.setdefault(obj_type, {"first": self._last_result, "statuses": {}})
+            counts["statuses"][status] = counts["statuses"].get(status, 0) + 1
+            counts["last"] = self._last_result = time.perf_counter()
+            target = _target.get()
+            if target:
+                per_target = self._targets.setdefault(target, {"first": self.started, "statuses": {}})
+                per_target["statuses"][status] = per_target["statuses"].get(status, 0) + 1
+        self.emit(level, message, fg=fg, event="object", obj_type=obj_type, name=name, status=status, **fields)
+
+    def start_target(self, target):
+        with self._lock:
+            self._targets.setdefault(target, {"first": time.perf_counter(), "statuses": {}})
+
+    def end_target(self, target):
+        with self._lock:
+            if target in self._targets:
+                self._targets[target]["last"] = time.perf_counter()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            lines, self._lines = self._lines, []
+            self._last_flush = time.perf_counter()
+            if lines:
+                click.echo("\n".join(lines))
+
+    def summary(self):
+        """
+        Writes the created/skipped/failed/... counts and elapsed time per object type,
+        and for commands run against several targets the same counts per target.
+        """
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            results = {obj_type: dict(counts) for obj_type, counts in self._results.items()}
+            targets = {target: dict(counts) for target, counts in self._targets.items()}
+        if not results and not targets:
+            return
+        if self.log_format == "json":
+            types = {}
+            for obj_type, counts in results.items():
+                types[obj_type] = dict(counts["statuses"], elapsed_seconds=round(counts["last"] - counts["first"], 3))
+            fields = {}
+            if targets:
+                fields["targets"] = {
+                    target: dict(counts["statuses"], elapsed_seconds=round(counts.get("last", counts["first"]) - counts["first"], 3))
+                    for target, counts in targets.items()
+                }
+            self.emit("summary", "Summary", event="summary", types=types, elapsed_seconds=round(elapsed, 3), **fields)
+            return
+        self.emit("summary", "Summary:", fg="blue", bold=True)
+        for obj_type, counts in results.items():
+            statuses = counts["statuses"]
+            ordered = [s for s in SUMMARY_STATUSES if s in statuses] + sorted(s for s in statuses if s not in SUMMARY_STATUSES)
+            parts = ", ".join(f"{statuses[s]} {s}" for s in ordered)
+            took = counts["last"] - counts["first"]
+            fg = "red" if "failed" in statuses else "blue"
+            self.emit("summary", f"  {obj_type.upper():<9} {parts} ({took:.2f}s)", fg=fg)
+        if targets:
+            self._target_matrix(targets)
+        self.emit("summary", f"  Elapsed: {elapsed:.2f}s", fg="blue")
+
+    def _target_matrix(self, targets):
+        """One row per target and one column per status that occurred on any of them."""
+        seen = {status for counts in targets.values() for status in counts["statuses"]}
+        columns = [s for s in SUMMARY_STATUSES if s in seen] + sorted(s for s in seen if s not in SUMMARY_STATUSES)
+        width = max(len("target"), *(len(target) for target in targets))
+        header = "  ".join([f"{'TARGET':<{width}}"] + [f"{status.upper():>9}" for status in columns] + [f"{'TIME':>8}"])
+        self.emit("summary", f"  {header}", fg="blue", bold=True)
+        for target, counts in sorted(targets.items()):
+            statuses = counts["statuses"]
+            took = counts.get("last", counts["first"]) - counts["first"]
+            cells = [f"{target:<{width}}"] + [f"{statuses.get(status, 0):>9}" for status in columns] + [f"{took:>7.2f}s"]
+            self.emit("summary", "  " + "  ".join(cells), fg="red" if "failed" in statuses else "blue")
+
+    def reset(self):
+        with self._lock:
+            self._results = {}
+            self._targets = {}
+            self.started = self._last_result = time.perf_counter()
+
+_sink = Sink()
+atexit.register(lambda: _sink.flush())
+
+def configure(verbosity=NORMAL, log_format="text"):
+    """Replaces the sink, e.g. from the CLI's --quiet, -v and --log-format options."""
+    global _sink
+    _sink.flush()
+    _sink = Sink(verbosity, log_format)
+    return _sink
+
+def settings():
+    """The current sink's options, e.g. to forward them with a command to the daemon."""
+    return {"verbosity": _sink.verbosity, "log_format": _sink.log_format}
+
+def error(message, **fields):
+    _sink.emit("error", message, fg="red", **fields)
+
+def warn(message, **fields):
+    _sink.emit("warn", message, fg="yellow", **fields)
+
+def info(message, fg=None, bold=False, **fields):
+    _sink.emit("info", message, fg=fg, bold=bold, **fields)
+
+def debug(message, fg=None, **fields):
+    _sink.emit("debug", message, fg=fg, **fields)
+
+def result(obj_type, name, status, message, level="info", fg=None, **fields):
+    """Reports the outcome of one object; counted in the summary and one event in JSON mode."""
+    _sink.result(obj_type, name, status, message, level, fg, **fields)
+
+@contextmanager
+def target(name):
+    """
+    Runs the block on behalf of a deployment target: its messages are prefixed with
+    the target's name (a field in JSON mode) and its outcomes counted per target too.
+    Worker threads started inside the block need contextvars.copy_context() to keep it.
+    """
+    _sink.start_target(name)
+    token = _target.set(name)
+    try:
+        yield
+    finally:
+        _target.reset(token)
+        _sink.end_target(name)
+
+def flush():
+    _sink.flush()
+
+def finish():
+    """Writes the per-type summary of this command's outcomes and flushes everything."""
+    _sink.summary()
+    _sink.reset()
+    _sink.flush()
@@ -0,0 +1,247 @@
+import os
+import json
+import fnmatch
+import output
+from catalog import normalize_identifier, split_object_name
+from config_loader import CACHE_DIR, MASTER_PATH, ENV_REFERENCE, entry_pattern, resolve_files, read_yaml, env_fingerprint
+from object_creator import extract_created_object, extract_references
+
+INDEX_PATH = os.path.join(CACHE_DIR, "index.json")
+INDEX_VERSION = 1
+
+OBJECT_TYPES = ['tables', 'views', 'tasks', 'snowpipes']
+
+# Spellings of each section accepted in selectors.
+TYPE_NAMES = {
+    "tables": "tables", "table": "tables",
+    "views": "views", "view": "views",
+    "tasks": "tasks", "task": "tasks",
+    "snowpipes": "snowpipes", "snowpipe": "snowpipes", "pipes": "snowpipes", "pipe": "snowpipes"
+}
+
+# file: patterns are relative to the config directory, like the master file's entries.
+CONFIG_DIR = os.path.dirname(MASTER_PATH)
+
+def parse_selector(text):
+    """
+    Parses one --select/--exclude value: `NAME`, `TYPE:NAME` or `file:PATH`, where NAME
+    and PATH may hold * and ? wildcards. A leading '+' adds what the matching objects
+    depend on, a trailing '+' what depends on them. Raises ValueError if it is malformed.
+    """
+    body = text.strip()
+    selector = {"text": text, "upstream": body.startswith("+"), "downstream": body.endswith("+") and len(body) > 1}
+    body = body[1 if selector["upstream"] else 0:len(body) - 1 if selector["downstream"] else len(body)].strip()
+    kind, pattern = None, body
+    if ":" in body:
+        kind, pattern = (part.strip() for part in body.split(":", 1))
+        kind = kind.lower()
+        if kind != "file" and kind not in TYPE_NAMES:
+            raise ValueError(f"Unknown selector type '{kind}' in '{text}'. Use file or one of {', '.join(OBJECT_TYPES)}.")
+    if not pattern:
+        raise ValueError(f"Selector '{text}' has no name or path.")
+    selector["kind"] = TYPE_NAMES.get(kind, kind)
+    selector["pattern"] = pattern
+    return selector
+
+def name_parts(name):
+    return tuple(normalize_identifier(part) for part in split_object_name(name)) if name else ()
+
+def describe(obj):
+    """What the index keeps of a definition: its name and the names it creates and references."""
+    query = obj.get("query") or ""
+    depends_on = obj.get("depends_on") or []
+    created = extract_created_object(query)
+    return {
+        "name": str(obj.get("name", "")),
+        "created": list(created) if created else None,
+        "refs": [name for kind, name in extract_references(query) if kind == "object"],
+        "depends_on": [depends_on] if isinstance(depends_on, str) else [str(dep) for dep in depends_on]
+    }
+
+class ObjectIndex:
+    """
+    Which objects every definition file defines, persisted in .sfyaml/cache/index.json
+    and keyed like the YAML cache by path, mtime, size and referenced environment
+    variables. Only files that changed since they were indexed are parsed again.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.files = {}
+        self.reindexed = 0
+        self._dirty = False
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                self.files = index["files"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            output.warn(f"WARN: Ignoring unreadable object index {self.path}: {e}")
+        return self
+
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", mode=0o700, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": INDEX_VERSION, "files": self.files}, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            output.warn(f"WARN: Failed to write object index {self.path}: {e}")
+
+    def _entry(self, file):
+        stat = os.stat(file)
+        entry = self.files.get(file)
+        if (entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size
+                and entry["env"] == env_fingerprint(entry["env_names"])):
+            return entry
+        config = read_yaml(file)
+        with open(file, "r") as f:
+            env_names = sorted(set(ENV_REFERENCE.findall(f.read())))
+        entry = {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "env_names": env_names,
+            "env": env_fingerprint(env_names),
+            "objects": {
+                obj_type: [describe(obj) for obj in config[obj_type] if isinstance(obj, dict)]
+                for obj_type in OBJECT_TYPES if isinstance(config, dict) and config.get(obj_type)
+            }
+        }
+        self.files[file] = entry
+        self.reindexed += 1
+        self._dirty = True
+        return entry
+
+    def records(self, master_config):
+        """
+        Every definition of the configuration as (obj_type, description, source file),
+        in the order the sections list them. Files that changed are re-indexed first,
+        and files no longer part of the configuration are forgotten.
+        """
+        records = []
+        seen = set()
+        for obj_type in OBJECT_TYPES:
+            for entry in master_config.get(obj_type) or []:
+                pattern = entry_pattern(entry)
+                if pattern:
+                    for file in resolve_files(pattern):
+                        seen.add(file)
+                        try:
+                            indexed = self._entry(file)
+                        except Exception as e:
+                            # Loading the file reports the error again if it is selected.
+                            output.warn(f"WARN: Could not index {file}: {e}")
+                            continue
+                        records.extend((obj_type, record, file) for record in indexed["objects"].get(obj_type, []))
+                elif obj_type in entry:
+                    records.extend((obj_type, describe(obj), MASTER_PATH) for obj in entry[obj_type]
+                                   if isinstance(obj, dict))
+        for file in set(self.files) - seen:
+            del self.files[file]
+            self._dirty = True
+        return records
+
+class Selection:
+    """
+    The definitions chosen by --select and --exclude and the files that hold them,
+    with the index records of every definition for checks that need the others.
+    """
+
+    def __init__(self, objects, records=()):
+        self.objects = objects
+        self.files = {source for _, _, source in objects}
+        self.records = records
+
+    def includes(self, obj_type, obj, source):
+        return (obj_type, str(obj.get("name", "")), source) in self.objects
+
+    def __len__(self):
+        return len(self.objects)
+
+class _Graph:
+    """Dependencies between indexed records, resolved the way the dependency graph resolves them."""
+
+    def __init__(self, records):
+        self.records = records
+        by_name = {}
+        for i, (_, record, _) in enumerate(records):
+            for name in (record["name"], record["created"] and record["created"][1]):
+                parts = name_parts(name)
+                if parts:
+                    by_name.setdefault(parts[-1], []).append((i, parts))
+        self.deps = [set() for _ in records]
+        self.dependents = [set() for _ in records]
+        for i, (_, record, _) in enumerate(records):
+            references = [(None, ref) for ref in record["refs"]]
+            for dep in record["depends_on"]:
+                dep_type, dep_name = dep.split(":", 1) if ":" in dep else (None, dep)
+                references.append((TYPE_NAMES.get(dep_type.strip().lower()) if dep_type else None, dep_name.strip()))
+            for dep_type, name in references:
+                parts = name_parts(name)
+                for j, defined in by_name.get(parts[-1], []) if parts else []:
+                    common = min(len(parts), len(defined))
+                    if j != i and defined[-common:] == parts[-common:] and dep_type in (None, records[j][0]):
+                        self.deps[i].add(j)
+                        self.dependents[j].add(i)
+
+    def matches(self, selector, i):
+        obj_type, record, source = self.records[i]
+        if selector["kind"] == "file":
+            path = os.path.relpath(source, CONFIG_DIR).replace(os.sep, "/")
+            return fnmatch.fnmatch(path, selector["pattern"]) or fnmatch.fnmatch(source.replace(os.sep, "/"),
+                                                                                selector["pattern"])
+        if selector["kind"] and selector["kind"] != obj_type:
+            return False
+        pattern = selector["pattern"].upper()
+        parts = name_parts(record["name"])
+        return bool(parts) and (fnmatch.fnmatchcase(".".join(parts).upper(), pattern)
+                                or fnmatch.fnmatchcase(parts[-1].upper(), pattern))
+
+    def expand(self, selector):
+        """The records a selector matches, with their upstream and/or downstream closure."""
+        matched = {i for i in range(len(self.records)) if self.matches(selector, i)}
+        for wanted, edges in ((selector["upstream"], self.deps), (selector["downstream"], self.dependents)):
+            if not wanted:
+                continue
+            pending = list(matched)
+            reached = set(matched)
+            while pending:
+                for j in edges[pending.pop()]:
+                    if j not in reached:
+                        reached.add(j)
+                        pending.append(j)
+            matched |= reached
+        return matched
+
+def select_objects(master_config, select=(), exclude=()):
+    """
+    Resolves --select and --exclude values against the object index. Returns a
+    Selection, or None when neither is given and everything is selected.
+    Raises ValueError for a malformed selector.
+    """
+    if not select and not exclude:
+        return None
+    selects = [parse_selector(text) for text in select]
+    excludes = [parse_selector(text) for text in exclude]
+    index = ObjectIndex().load()
+    records = index.records(master_config)
+    index.save()
+    graph = _Graph(records)
+    chosen = set(range(len(records))) if not selects else set().union(*(graph.expand(s) for s in selects))
+    for selector in excludes:
+        chosen -= graph.expand(selector)
+    selection = Selection({(records[i][0], records[i][1]["name"], records[i][2]) for i in chosen}, records)
+    output.info(f"Selected {len(selection)} of {len(records)} objects from {len(selection.files)} files "
+                f"({index.reindexed} files re-indexed).", fg="cyan")
+    if not selection.objects:
+        output.warn(f"WARN: No objects match --select {' '.join(select) or '-'} --exclude {' '.join(exclude) or '-'}.")
+    return selection
@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import time
+import fcntl
+import atexit
+import signal
+import socket
+import hashlib
+import weakref
+import threading
+from contextlib import contextmanager
+import output
+
+# Sessions kept per login; more concurrent connections than this log in and out as usual.
+MAX_CACHED_SESSIONS = 8
+
+# A session is neither handed out nor cached with less than this many seconds of validity left.
+EXPIRY_MARGIN = 300
+
+# Used when the connector does not say how long its master token is valid (its default: 4 hours).
+DEFAULT_MASTER_VALIDITY = 4 * 3600
+
+# Sessions cached and unused for longer than this are dropped from the cache.
+MAX_IDLE_SECONDS = 3600
+
+# Settings that identify a login; a cached session is only reused for exactly the same ones.
+SESSION_KEY_OPTIONS = ("account", "host", "user", "role", "authenticator", "warehouse", "database", "schema")
+
+def session_cache_path():
+    """SFYAML_SESSION_CACHE, else sfyaml/sessions.json in the user's cache directory."""
+    if os.environ.get("SFYAML_SESSION_CACHE"):
+        return os.environ["SFYAML_SESSION_CACHE"]
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "sfyaml", "sessions.json")
+
+def session_key(options):
+    identity = {key: options.get(key) for key in SESSION_KEY_OPTIONS}
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class SessionCache:
+    """
+    Session and master tokens of logged-in Snowflake sessions, shared by every sfyaml
+    process of the user. A connection claims a session (marking it with its host and
+    process) and gives it back when it is closed, so no two connections ever share one.
+    A claim whose process on this host is gone (killed before it could give the
+    session back) is released for the next connection.
+
+    The file and its directory are only readable by their owner; a cache file anyone
+    else can read, or that another user owns, is ignored.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or session_cache_path()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(os.path.dirname(self.path) or ".", mode=0o700, exist_ok=True)
+        with self._lock:
+            fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _read(self):
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return {}
+        with os.fdopen(fd, "r") as f:
+            info = os.fstat(f.fileno())
+            if info.st_uid != os.getuid() or info.st_mode & 0o077:
+                output.warn(f"WARN: Ignoring session cache {self.path}: it must be private to its owner (chmod 600).")
+                return {}
+            try:
+                sessions = json.load(f)
+            except ValueError:
+                return {}
+        return sessions if isinstance(sessions, dict) else {}
+
+    def _write(self, sessions):
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        # O_CREAT's mode does not apply to a leftover file.
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(sessions, f)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _usable(entry, now):
+        """Drops claims of dead processes; False for sessions that expire soon or sat unused too long."""
+        claim = entry.get("claimed_by")
+        if claim and claim[0] == socket.gethostname() and not _process_alive(claim[1]):
+            del entry["claimed_by"]
+            entry["cached_at"] = now
+        if entry.get("expires_at", 0) - now <= EXPIRY_MARGIN:
+            return False
+        return bool(entry.get("claimed_by")) or now - entry.get("cached_at", now) <= MAX_IDLE_SECONDS
+
+    def claim(self, key):
+        """Claims a still valid, unclaimed session for the login, or returns None."""
+        with self._locked():
+            sessions = self._read()
+            now = time.time()
+            # Expired and long idle sessions of any login are dropped on the way.
+            sessions = {login: [entry for entry in entries if self._usable(entry, now)]
+                        for login, entries in sessions.items()}
+            entry = next((entry for entry in reversed(sessions.get(key) or []) if not entry.get("claimed_by")), None)
+            if entry is not None:
+                entry["claimed_by"] = [socket.gethostname(), os.getpid()]
+            self._write({login: entries for login, entries in sessions.items() if entries})
+        return dict(entry) if entry is not None else None
+
+    def _release(self, sessions, key, master_token):
+        sessions[key] = [entry for entry in sessions.get(key) or []
+                         if not (entry.get("claimed_by") and entry.get("master_token") == master_token)]
+
+    def release(self, key, master_token):
+        """Forgets a claimed session that is not coming back (rejected or logged out)."""
+        with self._locked():
+            sessions = self._read()
+            self._release(sessions, key, master_token)
+            self._write({login: entries for login, entries in sessions.items() if entries})
+
+    def give_back(self, key, entry, claimed=None):
+        """
+        Puts a session back for the next connection, in place of its claim (`claimed`
+        is the master token it was claimed with). Returns False if it expires soon or
+        the login has enough cached.
+        """
+        with self._locked():
+            sessions = self._read()
+            if claimed:
+                self._release(sessions, key, claimed)
+            entries = sessions.setdefault(key, [])
+            cached = entry["expires_at"] - time.time() > EXPIRY_MARGIN and len(entries) < MAX_CACHED_SESSIONS
+            if cached:
+                entries.append(dict(entry, cached_at=time.time()))
+            self._write({login: entries for login, entries in sessions.items() if entries})
+        return cached
+
+# Connections handed out and not closed yet; closed at exit so their sessions are not left claimed.
+_open_connections = weakref.WeakSet()
+_cleanup_installed = False
+
+def _close_open_connections():
+    for conn in list(_open_connections):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def _exit_on_signal(signum, frame):
+    # Raising SystemExit runs finally blocks and atexit handlers, which a default SIGTERM skips.
+    sys.exit(128 + signum)
+
+def install_cleanup():
+    """Closes the open cached connections at exit, including on SIGTERM and SIGHUP."""
+    global _cleanup_installed
+    if _cleanup_installed:
+        return
+    _cleanup_installed = True
+    atexit.register(_close_open_connections)
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGTERM, signal.SIGHUP):
+            if signal.getsignal(signum) == signal.SIG_DFL:
+                signal.signal(signum, _exit_on_signal)
+
+class CachedConnection:
+    """A connection whose session goes back to the cache on close() instead of being logged out."""
+
+    def __init__(self, cache, key, conn, expires_at, claimed=None):
+        self._cache = cache
+        self._key = key
+        self._conn = conn
+        self._expires_at = expires_at
+        # The master token of the cache entry this connection claimed, if it resumed one.
+        self._claimed = claimed
+        self._closed = False
+        _open_connections.add(self)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        _open_connections.discard(self)
+        rest = getattr(self._conn, "rest", None)
+        # Tokens are read at close time: the connector renews the session token while it is used.
+        entry = {
+            "session_token": getattr(rest, "token", None),
+            "master_token": getattr(rest, "master_token", None),
+            "master_validity": getattr(rest, "master_validity_in_seconds", None),
+            "expires_at": self._expires_at
+        }
+        try:
+            if entry["session_token"] and entry["master_token"]:
+                cached = self._cache.give_back(self._key, entry, self._claimed)
+            else:
+                cached = False
+                if self._claimed:
+                    self._cache.release(self._key, self._claimed)
+        except OSError as e:
+            output.warn(f"WARN: Could not cache the Snowflake session: {e}")
+            cached = False
+        if not cached and rest is not None:
+            # Opened to outlive close(), so it has to be logged out explicitly.
+            try:
+                rest.delete_session()
+            except Exception:
+                pass
+        self._conn.close()
+
+class ConnectionFactory:
+    """
+    Opens connections with `connect(**options)` (snowflake.connector.connect, or a
+    stand-in), reusing a session from `cache` while one is valid instead of logging
+    in. Sessions it logs in are kept open on the server when closed, for reuse.
+    """
+
+    def __init__(self, connect, cache=None):
+        self.connect = connect
+        self.cache = cache or SessionCache()
+
+    def __call__(self, **options):
+        install_cleanup()
+        key = session_key(options)
+        try:
+            entry = self.cache.claim(key)
+        except OSError as e:
+            output.warn(f"WARN: Could not read the session cache: {e}")
+            entry = None
+        while entry is not None:
+            try:
+                conn = self.connect(**self.reuse_options(options, entry))
+                return CachedConnection(self.cache, key, conn, entry["expires_at"], entry["master_token"])
+            except Exception as e:
+                output.debug(f"Cached Snowflake session rejected ({e}). Trying the next one.")
+            self.cache.release(key, entry["master_token"])
+            entry = self.cache.claim(key)
+        conn = self.connect(**dict(options, server_session_keep_alive=True))
+        validity = getattr(getattr(conn, "rest", None), "master_validity_in_seconds", None) or DEFAULT_MASTER_VALIDITY
+        return CachedConnection(self.cache, key, conn, time.time() + validity)
+
+    @staticmethod
+    def reuse_options(options, entry):
+        """The options to resume a session with its tokens instead of authenticating."""
+        reused = {key: value for key, value in options.items()
+                  if key not in ("password", "private_key_file", "private_key_file_pwd", "authenticator")}
+        reused.update(session_token=entry["session_token"], master_token=entry["master_token"],
+                      server_session_keep_alive=True)
+        if entry.get("master_validity"):
+            reused["master_validity_in_seconds"] = entry["master_validity"]
+        return reused
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def shared_cache():
+    """The process's SessionCache, so its threads share one in-process lock."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SessionCache()
+        return _cache
@@ -17,6 +17,9 @@ setup(
         "airbyte-api-client",
         "click"
     ],
+    extras_require={
+        "sql": ["sqlglot"]
+    },
     entry_points={
         "console_scripts": [
             "sfyaml=sfyaml.cli:main",
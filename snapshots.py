@@ -0,0 +1,106 @@
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+import output
+from catalog import normalize_identifier, quote_identifier
+from state import load_state, save_state
+
+# Snapshots are schemas next to the one they copy, named <SCHEMA>_SFYAML_SNAPSHOT_<UTC timestamp>,
+# with a _<n> suffix if another run took that name first. Older versions stamped to the second.
+SNAPSHOT_MARKER = "_SFYAML_SNAPSHOT_"
+STAMP_FORMAT = "%Y%m%d%H%M%S%f"
+STAMP_PATTERN = r"\d{14}(?:\d{6})?(?:_\d+)?"
+
+# Snowflake's error number for CREATE of a name that is taken.
+ALREADY_EXISTS = 2002
+NAME_ATTEMPTS = 5
+
+# Snapshots kept per schema unless the master file's snapshots.retention or --snapshot-retention say otherwise.
+DEFAULT_RETENTION = 3
+
+def snapshot_retention(master_config, override=None):
+    """The number of snapshots to keep per schema: `override`, else snapshots.retention, else the default."""
+    if override is not None:
+        return override
+    retention = (master_config.get("snapshots") or {}).get("retention", DEFAULT_RETENTION)
+    if not isinstance(retention, int) or isinstance(retention, bool) or retention < 1:
+        raise ValueError(f"snapshots.retention must be a whole number of at least 1, not {retention!r}.")
+    return retention
+
+def current_schema(cursor):
+    """The session's normalized (database, schema)."""
+    cursor.execute("SELECT CURRENT_DATABASE(), CURRENT_SCHEMA()")
+    database, schema = cursor.fetchone()
+    if not database or not schema:
+        raise ValueError("The connection has no current database and schema to snapshot.")
+    return normalize_identifier(database), normalize_identifier(schema)
+
+def qualified(database, schema):
+    return f"{quote_identifier(database)}.{quote_identifier(schema)}"
+
+def is_snapshot_of(name, schema):
+    return re.fullmatch(re.escape(schema + SNAPSHOT_MARKER) + STAMP_PATTERN, name) is not None
+
+def snapshot_order(name):
+    """Sort key of a snapshot name: its timestamp to the microsecond, then its suffix."""
+    stamp, _, suffix = name.rsplit(SNAPSHOT_MARKER, 1)[1].partition("_")
+    return stamp.ljust(20, "0"), int(suffix or 0)
+
+def list_snapshots(cursor, database, schema):
+    """The names of the schema's snapshots, newest first."""
+    # '_' is a wildcard in LIKE, so this lists a few too many; the exact names are checked below.
+    like = (schema + SNAPSHOT_MARKER).replace("'", "''")
+    cursor.execute(f"SHOW SCHEMAS LIKE '{like}%' IN DATABASE {quote_identifier(database)}")
+    rows = cursor.fetchall()
+    name_idx = [column[0].lower() for column in cursor.description].index("name")
+    return sorted((row[name_idx] for row in rows if is_snapshot_of(row[name_idx], schema)), key=snapshot_order,
+                  reverse=True)
+
+def state_copy_path(state_path, name):
+    """Where the state manifest is kept as it was when snapshot `name` was taken."""
+    return os.path.join(os.path.dirname(state_path) or ".", "snapshots", f"{name}.json")
+
+def take_snapshot(cursor, database, schema, retention, state_path):
+    """
+    Clones the schema (zero-copy: storage is only used for what changes afterwards),
+    keeps a copy of the state manifest with it and drops the snapshots beyond the
+    `retention` newest. Returns the snapshot's name.
+    """
+    stamped = f"{schema}{SNAPSHOT_MARKER}{datetime.now(timezone.utc).strftime(STAMP_FORMAT)}"
+    for attempt in range(NAME_ATTEMPTS):
+        name = f"{stamped}_{attempt}" if attempt else stamped
+        try:
+            cursor.execute(f"CREATE SCHEMA {qualified(database, name)} CLONE {qualified(database, schema)}")
+            break
+        except Exception as e:
+            # Another run took the same name; take the next suffix.
+            if getattr(e, "errno", None) != ALREADY_EXISTS or attempt == NAME_ATTEMPTS - 1:
+                raise
+    save_state(load_state(state_path), state_copy_path(state_path, name))
+    output.info(f"Snapshot {database}.{name} of {database}.{schema} taken.", fg="green")
+    for old in list_snapshots(cursor, database, schema)[retention:]:
+        drop_snapshot(cursor, database, old, state_path)
+    return name
+
+def drop_snapshot(cursor, database, name, state_path):
+    cursor.execute(f"DROP SCHEMA IF EXISTS {qualified(database, name)}")
+    try:
+        os.remove(state_copy_path(state_path, name))
+    except FileNotFoundError:
+        pass
+    output.info(f"Snapshot {database}.{name} dropped (retention).")
+
+def restore_snapshot(cursor, database, schema, name, state_path):
+    """
+    Swaps the schema with its snapshot in one metadata operation, and the state
+    manifest with the snapshot's copy. What the schema held until now is left under
+    the snapshot's name, so restoring the same snapshot again undoes the restore.
+    """
+    cursor.execute(f"ALTER SCHEMA {qualified(database, schema)} SWAP WITH {qualified(database, name)}")
+    copy_path = state_copy_path(state_path, name)
+    if os.path.exists(copy_path):
+        swap_path = copy_path + ".swap"
+        shutil.copyfile(copy_path, swap_path)
+        save_state(load_state(state_path), copy_path)
+        os.replace(swap_path, state_path)
@@ -1,35 +1,81 @@
-import snowflake.connector
 import os
 
+# Optional replacement for connect_snowflake, e.g. the daemon's warm connections.
+_connection_factory = None
+
+def set_connection_factory(factory):
+    """Routes create_snowflake_connection through `factory(config)`; pass None to restore."""
+    global _connection_factory
+    _connection_factory = factory
+
 def create_snowflake_connection(config=None):
+    if _connection_factory is not None:
+        return _connection_factory(config)
+    return connect_snowflake(config)
+
+CREDENTIAL_KEYS = ["user", "password", "account", "warehouse", "database", "schema"]
+
+# Optional settings of the snowflake block (or SF_<KEY> environment variables).
+OPTION_KEYS = ["role", "authenticator", "private_key_path", "private_key_passphrase", "login_timeout", "network_timeout",
+               "keep_alive", "session_cache"]
+
+# Seconds a login may take before it fails; the connector's own default is two minutes.
+LOGIN_TIMEOUT = 60
+
+def connection_settings(config=None):
+    """The master file's snowflake block, or the SF_* environment variables if it has none."""
+    if config and "snowflake" in config:
+        return dict(config["snowflake"])
+    return {key: os.environ[f"SF_{key.upper()}"] for key in CREDENTIAL_KEYS + OPTION_KEYS
+            if os.environ.get(f"SF_{key.upper()}")}
+
+def missing_credentials(creds):
+    """Required settings not given; no password is needed with a private key or another authenticator."""
+    required = [key for key in CREDENTIAL_KEYS
+                if key != "password" or not (creds.get("private_key_path") or creds.get("authenticator"))]
+    return [key for key in required if key not in creds]
+
+def is_enabled(value):
+    """A YAML boolean or an environment variable such as 1, true or yes."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+def connect_options(creds):
+    """The keyword arguments for snowflake.connector.connect from the connection settings."""
+    options = {key: creds[key] for key in ("user", "account", "warehouse", "database", "schema")}
+    for key in ("role", "authenticator"):
+        if creds.get(key):
+            options[key] = creds[key]
+    if creds.get("private_key_path"):
+        # Key-pair authentication; the connector signs its login JWT with the key.
+        options["private_key_file"] = os.path.expanduser(str(creds["private_key_path"]))
+        if creds.get("private_key_passphrase"):
+            options["private_key_file_pwd"] = str(creds["private_key_passphrase"])
+    elif creds.get("password"):
+        options["password"] = creds["password"]
+    options["login_timeout"] = int(creds.get("login_timeout") or LOGIN_TIMEOUT)
+    if creds.get("network_timeout"):
+        options["network_timeout"] = int(creds["network_timeout"])
+    if is_enabled(creds.get("keep_alive")):
+        # Heartbeats keep the session from expiring during long runs and in the daemon.
+        options["client_session_keep_alive"] = True
+    return options
+
+def connect_snowflake(config=None):
     # If provided in the master config, use those credentials; otherwise, fallback to env variables.
+    creds = connection_settings(config)
+    missing = missing_credentials(creds)
     if config and "snowflake" in config:
-        creds = config["snowflake"]
-        required_keys = ["user", "password", "account", "warehouse", "database", "schema"]
-        missing = [k for k in required_keys if k not in creds]
         if missing:
             raise Exception(f"Missing required Snowflake credentials in master file: {missing}")
-        user = creds["user"]
-        password = creds["password"]
-        account = creds["account"]
-        warehouse = creds["warehouse"]
-        database = creds["database"]
-        schema = creds["schema"]
-    else:
-        user = os.getenv("SF_USER")
-        password = os.getenv("SF_PASSWORD")
-        account = os.getenv("SF_ACCOUNT")
-        warehouse = os.getenv("SF_WAREHOUSE")
-        database = os.getenv("SF_DATABASE")
-        schema = os.getenv("SF_SCHEMA")
-        if not all([user, password, account, warehouse, database, schema]):
-            raise Exception("Missing required Snowflake credentials. Provide them in the master YAML file or as environment variables.")
-    
-    return snowflake.connector.connect(
-        user=user,
-        password=password,
-        account=account,
-        warehouse=warehouse,
-        database=database,
-        schema=schema
-    )
+    elif missing:
+        raise Exception("Missing required Snowflake credentials. Provide them in the master YAML file or as environment variables.")
+
+    # Imported on first connect: the connector takes longer to import than validate takes to run.
+    import snowflake.connector
+    options = connect_options(creds)
+    if is_enabled(creds.get("session_cache")):
+        from sessions import ConnectionFactory, shared_cache
+        return ConnectionFactory(snowflake.connector.connect, shared_cache())(**options)
+    return snowflake.connector.connect(**options)
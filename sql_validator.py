@@ -0,0 +1,264 @@
+import os
+import re
+import json
+import logging
+import atexit
+import output
+from utils import query_digest
+from object_creator import extract_created_object, extract_references
+
+try:
+    import sqlglot
+    from sqlglot.errors import ParseError
+    # sqlglot logs a warning for every statement it cannot fully parse; those are reported here instead.
+    logging.getLogger("sqlglot").setLevel(logging.ERROR)
+except ImportError:
+    # Optional: without sqlglot, the built-in checks below are used.
+    sqlglot = None
+
+CACHE_PATH = os.path.join(".sfyaml", "cache", "sql.json")
+# 2: results are keyed by utils.query_digest, which keeps inner whitespace.
+CHECK_VERSION = 2
+
+# Below this many queries to check, a process pool costs more to start than it saves.
+PARALLEL_CHECK_THRESHOLD = 64
+CHECK_WORKERS = os.cpu_count() or 1
+
+# What the AS clause of each object kind has to start with.
+BODY_KEYWORDS = {
+    "VIEW": ("SELECT", "WITH", "("),
+    "PIPE": ("COPY",),
+    "TASK": ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "MERGE", "COPY", "CALL", "EXECUTE", "BEGIN", "TRUNCATE")
+}
+
+_cache = None
+_cache_dirty = False
+
+def parser_name():
+    """Identifies the parser in use; cached results from another parser are not reused."""
+    if sqlglot is not None:
+        return f"sqlglot-{sqlglot.__version__}"
+    return "builtin"
+
+def scan_sql(query):
+    """
+    Walks a query the way Snowflake tokenizes it, skipping comments, string literals,
+    quoted identifiers and $$ blocks. Returns (errors, statements, code) where
+    `statements` are the top-level statements and `code` is the query with literals
+    and comments blanked out, so keyword searches cannot match inside them.
+    """
+    errors = []
+    depth = 0
+    code = []
+    statements = []
+    start = 0
+    i = 0
+    length = len(query)
+    while i < length:
+        char = query[i]
+        pair = query[i:i + 2]
+        if pair == "--" or pair == "//":
+            end = query.find("\n", i)
+            end = length if end == -1 else end
+            code.append(" " * (end - i))
+            i = end
+            continue
+        if pair == "/*":
+            end = query.find("*/", i + 2)
+            if end == -1:
+                errors.append("unterminated /* comment")
+                end = length
+            else:
+                end += 2
+            code.append(" " * (end - i))
+            i = end
+            continue
+        if pair == "$$":
+            end = query.find("$$", i + 2)
+            if end == -1:
+                errors.append("unterminated $$ block")
+                end = length
+            else:
+                end += 2
+            code.append("''" + " " * (end - i - 2))
+            i = end
+            continue
+        if char in ("'", '"'):
+            end = i + 1
+            while end < length:
+                if query[end] == "\\" and char == "'":
+                    end += 2
+                    continue
+                if query[end] == char:
+                    if query[end + 1:end + 2] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            if end >= length:
+                errors.append("unterminated string literal" if char == "'" else "unterminated quoted identifier")
+                end = length - 1
+            # Quoted identifiers stay as they are; string contents are blanked out.
+            code.append(query[i:end + 1] if char == '"' else "'" + " " * (end - i - 1) + "'")
+            i = end + 1
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                errors.append("unbalanced ')'")
+                depth = 0
+        elif char == ";" and depth == 0:
+            statements.append(query[start:i])
+            start = i + 1
+        code.append(char)
+        i += 1
+    if depth > 0:
+        errors.append(f"{depth} unclosed '('")
+    statements.append(query[start:])
+    statements = [statement for statement in statements if statement.strip()]
+    return errors, statements, "".join(code)
+
+def find_body(code):
+    """Returns the offset of the statement after the top-level AS of a view, task or pipe, or None."""
+    depth = 0
+    for match in re.finditer(r"[()]|\bAS\b", code, re.IGNORECASE):
+        token = match.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0:
+            return match.end()
+    return None
+
+def _builtin_errors(query, created, code):
+    kind = created[0]
+    if kind not in BODY_KEYWORDS:
+        return []
+    offset = find_body(code)
+    if offset is None:
+        return [f"CREATE {kind} has no AS clause"]
+    body = code[offset:].strip()
+    if not body.upper().startswith(BODY_KEYWORDS[kind]):
+        first = body.split(None, 1)[0] if body else "nothing"
+        return [f"CREATE {kind} ... AS is followed by {first!r}, expected {' or '.join(BODY_KEYWORDS[kind])}"]
+    return []
+
+def _sqlglot_errors(query, created, code):
+    # sqlglot falls back to an opaque Command for CREATE TASK/PIPE/STAGE and for syntax it
+    # does not know, so view, task and pipe bodies are parsed on their own, and a Command
+    # only counts as an error for a body sqlglot fully supports (a query).
+    if created[0] == "STAGE":
+        return []
+    text = query
+    if created[0] in BODY_KEYWORDS:
+        text = query[find_body(code):]
+    try:
+        expressions = sqlglot.parse(text, read="snowflake")
+    except ParseError as e:
+        return [str(e).splitlines()[0]]
+    if created[0] in BODY_KEYWORDS and text.strip().upper().startswith(("SELECT", "WITH")):
+        if any(isinstance(expression, sqlglot.exp.Command) for expression in expressions):
+            return [f"CREATE {created[0]} body does not parse as a query"]
+    return []
+
+def _cte_names(code):
+    return {
+        name.upper()
+        for name in re.findall(r"(?:\bWITH|,)\s*([\w$]+)\s+AS\s*\(", code, re.IGNORECASE)
+    }
+
+def check_query(query):
+    """
+    Checks one query offline. Returns a dict with the parse errors, the object the
+    DDL creates as [kind, name] (or None) and the [kind, name] references it makes.
+    Runs in worker processes too, so it only touches its argument.
+    """
+    errors, statements, code = scan_sql(query or "")
+    if not statements:
+        return {"errors": ["query is empty"], "created": None, "references": []}
+    if len(statements) > 1:
+        errors.append(f"expected one statement, found {len(statements)}")
+    created = extract_created_object(code)
+    if created is None:
+        errors.append("not a CREATE TABLE, VIEW, TASK, PIPE or STAGE statement")
+    elif not errors:
+        errors.extend(_builtin_errors(query, created, code))
+        if sqlglot is not None and not errors:
+            errors.extend(_sqlglot_errors(query, created, code))
+
+    ctes = _cte_names(code)
+    references = []
+    for kind, name in extract_references(code):
+        if kind == "object" and (name.upper() in ctes or name.upper() == "TABLE"):
+            continue
+        if created and kind == "object" and name == created[1]:
+            continue
+        references.append([kind, name])
+    return {"errors": errors, "created": list(created) if created else None, "references": references}
+
+def query_hash(query):
+    # Not whitespace-normalized: where a newline falls can change what a -- comment hides.
+    return query_digest(query)
+
+def _load_cache():
+    global _cache
+    if _cache is not None:
+        return _cache
+    _cache = {}
+    try:
+        with open(CACHE_PATH, "r") as f:
+            cached = json.load(f)
+        if cached.get("version") == CHECK_VERSION and cached.get("parser") == parser_name():
+            _cache = cached["results"]
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        output.warn(f"WARN: Ignoring unreadable SQL check cache {CACHE_PATH}: {e}")
+    return _cache
+
+def save_cache():
+    """Writes the check cache if anything changed. Registered to run at exit."""
+    global _cache_dirty
+    if not _cache_dirty:
+        return
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), mode=0o700, exist_ok=True)
+        tmp_path = CACHE_PATH + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CHECK_VERSION, "parser": parser_name(), "results": _cache}, f)
+        os.replace(tmp_path, CACHE_PATH)
+        _cache_dirty = False
+    except Exception as e:
+        output.warn(f"WARN: Failed to write SQL check cache {CACHE_PATH}: {e}")
+
+atexit.register(save_cache)
+
+def check_queries(queries):
+    """
+    Checks a list of queries and returns their results in the same order.
+    Results are cached by query hash (see utils.query_digest), so only new or edited queries are
+    parsed; above PARALLEL_CHECK_THRESHOLD misses they are parsed in a process pool.
+    Returns (results, cache hits).
+    """
+    global _cache_dirty
+    cache = _load_cache()
+    hashes = [query_hash(query) for query in queries]
+    misses = {}
+    for digest, query in zip(hashes, queries):
+        if digest not in cache and digest not in misses:
+            misses[digest] = query
+    if len(misses) > PARALLEL_CHECK_THRESHOLD and CHECK_WORKERS > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(misses) // (CHECK_WORKERS * 4))
+        with ProcessPoolExecutor(max_workers=CHECK_WORKERS) as pool:
+            results = list(pool.map(check_query, misses.values(), chunksize=chunksize))
+    else:
+        results = [check_query(query) for query in misses.values()]
+    for digest, result in zip(misses, results):
+        cache[digest] = result
+    if misses:
+        _cache_dirty = True
+    return [cache[digest] for digest in hashes], len(queries) - len(misses)
@@ -0,0 +1,77 @@
+import os
+import json
+from datetime import datetime, timezone
+import output
+from utils import query_digest
+
+STATE_DIR = ".sfyaml"
+STATE_PATH = os.path.join(STATE_DIR, "state.json")
+STATE_VERSION = 1
+
+def definition_hash(obj):
+    """Hash of a definition's query (see utils.query_digest); any edit inside it changes the hash."""
+    return query_digest(obj.get("query", ""))
+
+def state_key(obj_type, name):
+    return f"{obj_type}:{name.strip().upper()}"
+
+def load_state(path=STATE_PATH):
+    """
+    Loads the state manifest recording what each apply did, or an empty one.
+    Each entry holds the definition hash, its source file, when it was last applied
+    and whether this tool created the object.
+    """
+    if not os.path.exists(path):
+        return {"version": STATE_VERSION, "objects": {}}
+    try:
+        with open(path, 'r') as f:
+            state = json.load(f)
+    except Exception as e:
+        output.warn(f"WARN: Ignoring unreadable state manifest {path}: {e}")
+        return {"version": STATE_VERSION, "objects": {}}
+    state.setdefault("objects", {})
+    return state
+
+def save_state(state, path=STATE_PATH):
+    """Writes the manifest atomically so an interrupted run never leaves it half-written."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def changed_definitions(state, obj_type, definitions):
+    """
+    Returns the (definition, source) pairs whose query hash differs from the
+    one recorded at the last apply, including definitions never applied before.
+    """
+    changed = []
+    for obj, source in definitions:
+        entry = state["objects"].get(state_key(obj_type, obj.get("name", "")))
+        if entry is None or entry.get("hash") != definition_hash(obj):
+            changed.append((obj, source))
+    return changed
+
+def record_applied(state, obj_type, obj, source, created):
+    """Records a definition as applied; `created` marks objects this tool created."""
+    key = state_key(obj_type, obj["name"])
+    previous = state["objects"].get(key, {})
+    state["objects"][key] = {
+        "type": obj_type,
+        "name": obj["name"],
+        "hash": definition_hash(obj),
+        "source": source,
+        "applied_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "created_by_tool": created or previous.get("created_by_tool", False)
+    }
+
+def forget(state, obj_type, name):
+    state["objects"].pop(state_key(obj_type, name), None)
+
+def managed_objects(state, obj_type):
+    """Returns minimal definitions for the objects of a type this tool created."""
+    return [
+        {"name": entry["name"]}
+        for entry in state["objects"].values()
+        if entry.get("type") == obj_type and entry.get("created_by_tool")
+    ]
@@ -0,0 +1,134 @@
+import os
+import re
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import output
+import tracing
+from utils import substitute_target_vars
+from state import STATE_DIR
+from config_loader import load_master_config, get_object_definitions
+from snowflake_connector import connection_settings
+from selection import select_objects
+
+OBJECT_TYPES = ['tables', 'views', 'tasks', 'snowpipes']
+
+TARGETS_DIR = os.path.join(STATE_DIR, "targets")
+
+# Targets run at once unless --target-jobs says otherwise.
+DEFAULT_TARGET_JOBS = 4
+
+# Connection settings a target can override; any other key is only a ${target:KEY} value.
+TARGET_SETTINGS = ("database", "schema", "warehouse")
+
+TARGET_NAME = re.compile(r"[A-Za-z0-9_.-]+")
+
+def load_targets(master_config, names=()):
+    """
+    Returns the entries of the master file's `targets:` section, each with its
+    database, schema and warehouse filled in from the connection settings where it
+    does not set them. With `names` only those targets, in the order given.
+    """
+    settings = connection_settings(master_config)
+    targets = []
+    seen = set()
+    for entry in master_config.get("targets") or []:
+        if not isinstance(entry, dict) or not entry.get("name"):
+            raise ValueError(f"Every target needs a name: {entry}")
+        name = str(entry["name"])
+        if not TARGET_NAME.fullmatch(name):
+            raise ValueError(f"Target name '{name}' may only contain letters, digits, '_', '.' and '-'.")
+        if name in seen:
+            raise ValueError(f"Target '{name}' is listed twice.")
+        seen.add(name)
+        target = {key: settings.get(key) for key in TARGET_SETTINGS}
+        target.update((key, value) for key, value in entry.items() if value is not None)
+        target["name"] = name
+        targets.append(target)
+    if not names:
+        return targets
+    by_name = {target["name"]: target for target in targets}
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown target(s): {', '.join(unknown)}. Defined: {', '.join(by_name) or 'none'}.")
+    return [by_name[name] for name in dict.fromkeys(names)]
+
+def target_config(master_config, target):
+    """The master config with the target's database, schema and warehouse as its connection settings."""
+    settings = connection_settings(master_config)
+    settings.update((key, target[key]) for key in TARGET_SETTINGS if target.get(key))
+    return dict(master_config, snowflake=settings)
+
+def render_definitions(definitions, target):
+    """Copies of the (definition, source) pairs with ${target:KEY} replaced by the target's values."""
+    rendered = []
+    for obj, source in definitions:
+        copy = substitute_target_vars(obj, target)
+        tracing.register_source(copy, source)
+        rendered.append((copy, source))
+    return rendered
+
+def resolve_targets(master_config, names=(), selection=None):
+    """
+    Everything a command needs to run against each target: its name, its config,
+    its own state manifest path and its rendered definitions per object type. The
+    definition files are loaded once; only the rendering is repeated per target.
+    With a selection (see selection.py) only the selected definitions are loaded.
+    """
+    selected = load_targets(master_config, names)
+    definitions = {
+        obj_type: get_object_definitions(master_config, obj_type, with_sources=True, strict=True, selection=selection)
+        for obj_type in OBJECT_TYPES
+    }
+    return [
+        {
+            "name": target["name"],
+            "config": target_config(master_config, target),
+            "state_path": os.path.join(TARGETS_DIR, target["name"], "state.json"),
+            "definitions": {obj_type: render_definitions(pairs, target) for obj_type, pairs in definitions.items()},
+            "selection": selection
+        }
+        for target in selected
+    ]
+
+def fan_out(command):
+    """
+    Lets `command` run against every target of the master file's `targets:` section
+    (or those named in `targets`), up to `target_jobs` at once, each call getting its
+    target as `target=`. Without a targets section the command runs once as before,
+    given the master config already loaded here as `master_config=`.
+    Its `select`/`exclude` parameters, if any, are resolved once for all targets.
+    """
+    @functools.wraps(command)
+    def run(targets=(), target_jobs=DEFAULT_TARGET_JOBS, **params):
+        try:
+            master_config = load_master_config()
+        except Exception:
+            # The command reports the unreadable master file itself.
+            return command(**params)
+        if not master_config.get("targets"):
+            if targets:
+                output.error("ERR: --target needs a targets: section in the master file.")
+                return False
+            return command(master_config=master_config, **params)
+        try:
+            selection = select_objects(master_config, params.get("select"), params.get("exclude"))
+            selected = resolve_targets(master_config, targets, selection)
+        except ValueError as e:
+            output.error(f"ERR: {e}")
+            return False
+        output.info(f"Targets: {', '.join(target['name'] for target in selected)} ({target_jobs} at a time).",
+                    fg="blue")
+
+        def run_target(target):
+            with output.target(target["name"]):
+                try:
+                    return command(target=target, **params)
+                except Exception as e:
+                    output.result("target", target["name"], "failed", f"ERR: Target '{target['name']}' failed: {e}",
+                                  "error", "red", error=str(e))
+                    return False
+
+        with ThreadPoolExecutor(max_workers=max(1, target_jobs)) as executor:
+            results = list(executor.map(run_target, selected))
+        return all(result is not False for result in results)
+    return run
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+import click
+
+# Set by enable(); while it is None every helper below is a no-op.
+_tracer = None
+_local = threading.local()
+
+class Tracer:
+    """Collects finished spans from every thread."""
+
+    def __init__(self):
+        self.spans = []
+        self.sources = {}
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+def enable():
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+def disable():
+    global _tracer
+    _tracer = None
+
+def enabled():
+    return _tracer is not None
+
+def register_source(obj, source):
+    """Remembers which file a definition came from, so spans about it can name the file."""
+    if _tracer is not None:
+        _tracer.sources[id(obj)] = source
+
+def source_of(obj):
+    if _tracer is None:
+        return None
+    return _tracer.sources.get(id(obj))
+
+def current_context():
+    if _tracer is None:
+        return {}
+    return dict(getattr(_local, "context", {}))
+
+@contextmanager
+def context(**attrs):
+    """Adds attributes (object type, name, source...) to every span opened inside, on this thread."""
+    if _tracer is None:
+        yield
+        return
+    previous = getattr(_local, "context", {})
+    _local.context = dict(previous, **attrs)
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+def record(span_name, category, started, duration, **attrs):
+    """Adds a span measured elsewhere, e.g. in a worker process or across async polls."""
+    if _tracer is None:
+        return
+    _tracer.add({
+        "name": span_name,
+        "category": category,
+        "start": started,
+        "duration": duration,
+        "pid": attrs.pop("pid", os.getpid()),
+        "thread": attrs.pop("thread", threading.current_thread().name),
+        "attrs": {key: value for key, value in attrs.items() if value is not None}
+    })
+
+@contextmanager
+def span(span_name, category, **attrs):
+    """
+    Times the enclosed block as a span. Yields the span's attributes so the block
+    can add what it learns, e.g. attrs["query_id"] = cursor.sfqid.
+    """
+    if _tracer is None:
+        yield {}
+        return
+    attrs = dict(current_context(), **attrs)
+    started = time.time()
+    clock = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = str(e)
+        raise
+    finally:
+        record(span_name, category, started, time.perf_counter() - clock, **attrs)
+
+def print_profile(top=20):
+    """Prints the `top` slowest spans and the total time per category."""
+    if _tracer is None:
+        return
+    spans = sorted(_tracer.spans, key=lambda s: s["duration"], reverse=True)
+    click.secho(f"Slowest {min(top, len(spans))} of {len(spans)} spans:", fg="blue", bold=True)
+    click.secho(f"{'ms':>10}  {'category':<8}  {'span':<22}  {'object':<40}  {'query id':<36}  source", bold=True)
+    for s in spans[:top]:
+        attrs = s["attrs"]
+        obj = f"{attrs['obj_type'].upper()} {attrs['name']}" if "obj_type" in attrs and "name" in attrs else ""
+        click.echo(
+            f"{s['duration'] * 1000:>10.1f}  {s['category']:<8}  {s['name'][:22]:<22}  {obj[:40]:<40}  "
+            f"{attrs.get('query_id', ''):<36}  {attrs.get('source') or attrs.get('pattern', '')}"
+        )
+    totals = {}
+    for s in _tracer.spans:
+        count, duration = totals.get(s["category"], (0, 0.0))
+        totals[s["category"]] = (count + 1, duration + s["duration"])
+    for category, (count, duration) in sorted(totals.items(), key=lambda item: item[1][1], reverse=True):
+        click.secho(f"{category}: {count} spans, {duration:.3f}s in total.", fg="blue")
+
+def write_trace(path, trace_format="chrome"):
+    """
+    Writes the spans to `path`, either as a JSON list of spans or in the Chrome trace
+    event format (load it in chrome://tracing or Perfetto).
+    """
+    if _tracer is None:
+        return
+    spans = sorted(_tracer.spans, key=lambda s: s["start"])
+    if trace_format == "json":
+        payload = spans
+    else:
+        origin = spans[0]["start"] if spans else 0
+        threads = {}
+        payload = {"traceEvents": [], "displayTimeUnit": "ms"}
+        for s in spans:
+            tid = threads.setdefault((s["pid"], s["thread"]), len(threads) + 1)
+            payload["traceEvents"].append({
+                "name": s["name"],
+                "cat": s["category"],
+                "ph": "X",
+                "ts": round((s["start"] - origin) * 1e6, 1),
+                "dur": round(s["duration"] * 1e6, 1),
+                "pid": s["pid"],
+                "tid": tid,
+                "args": s["attrs"]
+            })
+        for (pid, thread), tid in threads.items():
+            payload["traceEvents"].append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread}})
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=1, default=str)
+    click.secho(f"Wrote {len(spans)} spans to {path}.", fg="blue")
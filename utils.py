@@ -1,19 +1,54 @@
 import re
 import os
+import hashlib
+
+ENV_PATTERN = re.compile(r"\${env:([^}]+)}")
 
 def substitute_env_vars(value):
     """
     Recursively replace ${env:VAR_NAME} in strings with the corresponding environment variable.
+    Lists and dicts are updated in place rather than copied, so a freshly parsed document
+    is never duplicated; strings without a reference are returned as they are.
     """
     if isinstance(value, str):
-        pattern = re.compile(r"\${env:([^}]+)}")
+        if "${env:" not in value:
+            return value
         def replacer(match):
             env_var = match.group(1)
             return os.environ.get(env_var, match.group(0))
+        return ENV_PATTERN.sub(replacer, value)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            value[i] = substitute_env_vars(item)
+        return value
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            value[k] = substitute_env_vars(v)
+        return value
+    else:
+        return value
+
+def substitute_target_vars(value, variables):
+    """
+    Recursively replace ${target:KEY} in strings with the deployment target's value for KEY.
+    References to keys the target does not have are left as they are.
+    """
+    if isinstance(value, str):
+        pattern = re.compile(r"\${target:([^}]+)}")
+        def replacer(match):
+            key = match.group(1)
+            return str(variables[key]) if key in variables else match.group(0)
         return pattern.sub(replacer, value)
     elif isinstance(value, list):
-        return [substitute_env_vars(item) for item in value]
+        return [substitute_target_vars(item, variables) for item in value]
     elif isinstance(value, dict):
-        return {k: substitute_env_vars(v) for k, v in value.items()}
+        return {k: substitute_target_vars(v, variables) for k, v in value.items()}
     else:
         return value
+
+def query_digest(query):
+    """
+    Hash of a query with only surrounding whitespace and trailing semicolons removed.
+    Inner whitespace is kept: a newline can end a -- comment, and spaces can sit in a literal.
+    """
+    return hashlib.sha256(re.sub(r"[\s;]+$", "", (query or "").strip()).encode("utf-8")).hexdigest()
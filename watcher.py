@@ -0,0 +1,33 @@
+import os
+import time
+
+def file_signature(path):
+    """Returns (mtime, size) for a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def snapshot(paths):
+    return {path: file_signature(path) for path in paths}
+
+def wait_for_changes(resolve_paths, previous, interval=0.5, debounce=0.3):
+    """
+    Polls the files returned by `resolve_paths()` until one is added, removed or modified,
+    then keeps waiting until nothing changed for `debounce` seconds so a burst of saves
+    is handled as one change. Returns (changed paths, new snapshot).
+    """
+    while True:
+        time.sleep(interval)
+        current = snapshot(resolve_paths())
+        if current != previous:
+            break
+    while True:
+        time.sleep(debounce)
+        latest = snapshot(resolve_paths())
+        if latest == current:
+            break
+        current = latest
+    changed = sorted(path for path in set(previous) | set(current) if previous.get(path) != current.get(path))
+    return changed, current